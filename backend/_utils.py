@@ -1,10 +1,11 @@
 # import this
+import asyncio
 import logging
 from datetime import timedelta, timezone
 import json
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import yfinance as yf
 
 from sqlalchemy import create_engine
@@ -109,19 +110,24 @@ class DatabaseUtils:
             cls._setup()
         return cls._instance
 
+    @staticmethod
+    def get_db_path():
+        """数据库文件路径, 可通过环境变量 TRADE_DB_PATH 指定, 用于基准测试等不写入正式库的场景"""
+        env_path = os.getenv('TRADE_DB_PATH')
+        if env_path:
+            return Path(env_path)
+        return DatabaseUtils.get_project_root() / 'backend' / 'data_center' / 'trade_db.db'
+
     @staticmethod
     def get_engine():
-        project_root = DatabaseUtils.get_project_root()
-        db_absolute_path = project_root / 'backend' / 'data_center' / 'trade_db.db'
+        db_absolute_path = DatabaseUtils.get_db_path()
         return create_engine(f'sqlite:///{db_absolute_path}')
 
     @classmethod
     def _setup(cls):
         try:
-            # 获取项目根目录的绝对路径
-            project_root = cls.get_project_root()
             # 构建数据库文件的绝对路径
-            db_absolute_path = project_root / 'backend' / 'data_center' / 'trade_db.db'
+            db_absolute_path = cls.get_db_path()
             print(db_absolute_path)
             # 创建数据库连接引擎
             cls._engine = create_engine(f'sqlite:///{db_absolute_path}')
@@ -269,6 +275,58 @@ class FormatUtils:
         return value
 
 
+class SSEManager:
+    """SSE 通道管理，每个通道对应一个 asyncio.Queue，消息格式为 {"event": ..., "data": ...}"""
+    _channels: Dict[str, asyncio.Queue] = {}
+    _loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+    @classmethod
+    def create_channel(cls, cid: Optional[str] = None) -> Tuple[str, asyncio.Queue]:
+        cid = cid or uuid.uuid4().hex
+        queue = asyncio.Queue()
+        cls._channels[cid] = queue
+        try:
+            # 记录通道所属事件循环，供其他线程推送消息
+            cls._loops[cid] = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        return cid, queue
+
+    @classmethod
+    def get_queue(cls, cid: str) -> Optional[asyncio.Queue]:
+        return cls._channels.get(cid)
+
+    @classmethod
+    def publish_threadsafe(cls, cid: str, event: str, data: str = "") -> bool:
+        """从非事件循环线程推送消息"""
+        queue = cls._channels.get(cid)
+        loop = cls._loops.get(cid)
+        if queue is None or loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(queue.put_nowait, {"event": event, "data": data})
+        return True
+
+    @classmethod
+    def close_channel(cls, cid: str) -> None:
+        cls._channels.pop(cid, None)
+        cls._loops.pop(cid, None)
+
+    @classmethod
+    async def generator(cls, cid: str):
+        """逐条产出通道消息，收到 end 事件后关闭通道"""
+        queue = cls.get_queue(cid)
+        if queue is None:
+            return
+        try:
+            while True:
+                msg = await queue.get()
+                yield msg
+                if msg.get("event") == "end":
+                    break
+        finally:
+            cls.close_channel(cid)
+
+
 # 示例用法
 if __name__ == "__main__":
     print(DatabaseUtils.get_db_session())
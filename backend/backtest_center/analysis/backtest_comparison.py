@@ -0,0 +1,248 @@
+"""
+多个回测结果对比
+
+数据只来自 backtest_result 汇总表与 result_store 中缓存的权益曲线文件(equity.npz), 不扫描逐笔交易记录:
+
+- 权益曲线按所有回测K线时间的并集对齐, 各曲线向前填充, 在自身首根K线之前与末根K线之后为空
+- 指标取汇总表中的值, 汇总表没有的回测(如组合回测)由缓存的曲线与交易文件计算, 差值相对基准回测
+- 重叠统计基于曲线中的持仓列: 持仓时间重叠率(按时长加权的Jaccard)、与另一回测持仓重叠的交易占比、
+  逐K线收益相关系数
+
+曲线文件读取后按文件修改时间缓存在进程内, 同一批回测重复对比时不再读盘。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.backtest_center.analysis.performance_metrics import build_backtest_results
+from backend.backtest_center.backtest_core.result_store import BacktestResultStore, EQUITY_FILE, \
+    backtest_result_store
+
+# 对比的指标, 与 backtest_result 表列一致
+COMPARE_METRICS = (
+    'transaction_count', 'final_value', 'total_return', 'annual_return', 'cagr', 'volatility', 'sharpe_ratio',
+    'sortino_ratio', 'calmar_ratio', 'max_drawdown', 'max_drawdown_amount', 'max_drawdown_duration', 'win_rate',
+    'profit_factor', 'expectancy', 'exposure',
+)
+DEFAULT_MAX_POINTS = 1000
+MAX_CACHED_CURVES = 256
+
+
+class CurveCache:
+    """进程内权益曲线缓存, 只保留对比需要的列, 文件被覆盖(修改时间变化)后重新读取"""
+
+    def __init__(self, store: BacktestResultStore, max_entries: int = MAX_CACHED_CURVES):
+        self.store = store
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _mtime(self, key: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(os.path.join(self.store.key_dir(key), EQUITY_FILE))
+        except OSError:
+            return None
+
+    def _lookup(self, key: str, mtime: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def _put(self, key: str, mtime: float, data: dict) -> None:
+        with self._lock:
+            self._entries[key] = (mtime, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        mtime = self._mtime(key)
+        if mtime is None:
+            return None
+        cached = self._lookup(key, mtime)
+        if cached is not None:
+            return cached
+        curve = self.store.load_equity_curve(key)
+        if curve is None or curve['equity'].shape[0] == 0:
+            return None
+        compact = {
+            'datetime': curve['datetime'].astype('datetime64[s]').astype(np.int64),
+            'equity': curve['equity'].astype(np.float64),
+            'in_position': curve['position'] != 0,
+        }
+        self._put(key, mtime, compact)
+        return compact
+
+    def get_metrics(self, key: str) -> Optional[dict]:
+        """没有汇总记录时由曲线与交易文件计算的指标, 与曲线一起按修改时间缓存"""
+        compact = self.get(key)
+        if compact is None:
+            return None
+        if 'metrics' not in compact:
+            compact['metrics'] = _metrics_from_files(key, self.store)
+        return compact['metrics']
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _metrics_from_files(key: str, store: BacktestResultStore) -> Optional[dict]:
+    """没有汇总记录的回测由曲线与交易文件计算指标, 初始资金取曲线首个权益"""
+    curve = store.load_equity_curve(key)
+    if curve is None or curve['equity'].shape[0] == 0:
+        return None
+    trades = store.load_trades(key) or {}
+    results = build_backtest_results(curve, trades, float(curve['equity'][0]), key=key)
+    metrics = {name: getattr(results, name, None) for name in COMPARE_METRICS}
+    metrics['transaction_count'] = results.total_trades
+    return metrics
+
+
+def _to_json_list(values: np.ndarray) -> list:
+    """NaN 转为 None"""
+    nan = np.isnan(values)
+    if not nan.any():
+        return values.tolist()
+    values = values.astype(object)
+    values[nan] = None
+    return values.tolist()
+
+
+def _matrix_to_list(matrix: np.ndarray) -> List[list]:
+    return [_to_json_list(row) for row in matrix]
+
+
+def _pairwise_correlation(values: np.ndarray) -> np.ndarray:
+    """行之间的相关系数, 每对只使用两行都有值的列, 与 DataFrame.corr 的成对口径一致"""
+    mask = (~np.isnan(values)).astype(np.float64)
+    x = np.where(mask > 0, values, 0.0)
+    count = mask @ mask.T
+    sum_x = x @ mask.T
+    sum_xx = (x * x) @ mask.T
+    sum_xy = x @ x.T
+    cov = count * sum_xy - sum_x * sum_x.T
+    var = (count * sum_xx - sum_x ** 2) * (count * sum_xx - sum_x ** 2).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = cov / np.sqrt(var)
+    corr[(count < 2) | ~(var > 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def _position_runs(in_position: np.ndarray):
+    """持仓区间 [start, end) 在对齐网格上的下标"""
+    padded = np.concatenate(([False], in_position, [False])).astype(np.int8)
+    change = np.diff(padded)
+    return np.flatnonzero(change == 1), np.flatnonzero(change == -1)
+
+
+def compare_backtests(keys: Sequence[str], summaries: Optional[Dict[str, dict]] = None,
+                      baseline: Optional[str] = None, max_points: Optional[int] = DEFAULT_MAX_POINTS,
+                      cache: Optional[CurveCache] = None) -> dict:
+    """
+    对比多个回测
+
+    Args:
+        keys: 回测key列表
+        summaries: key -> backtest_result 汇总记录(to_dict), 为空的key由缓存文件计算
+        baseline: 指标差值的基准key, 默认第一个
+        max_points: 返回曲线的最大点数, 为空时返回全部对齐点
+        cache: 曲线缓存, 默认使用模块级缓存
+
+    Returns:
+        dict: datetime/equity/normalized 为对齐后的曲线, metrics/deltas 为指标与相对基准的差值,
+              overlap 中各矩阵行列顺序与 keys 一致, missing 为没有曲线文件的key
+    """
+    cache = cache or curve_cache
+    summaries = summaries or {}
+    keys = list(dict.fromkeys(keys))
+    curves = {key: cache.get(key) for key in keys}
+    missing = [key for key in keys if curves[key] is None]
+    keys = [key for key in keys if curves[key] is not None]
+    if not keys:
+        raise KeyError(f"No equity curve found for {missing}")
+    if baseline is None or baseline not in keys:
+        baseline = keys[0]
+
+    # 对齐: 并集时间网格上向前填充, 超出自身区间的位置为空
+    grid = np.sort(np.concatenate([curves[key]['datetime'] for key in keys]))
+    grid = grid[np.concatenate(([True], grid[1:] != grid[:-1]))]
+    k, n = len(keys), grid.shape[0]
+    equity = np.full((k, n), np.nan)
+    in_position = np.zeros((k, n), dtype=bool)
+    for row, key in enumerate(keys):
+        curve = curves[key]
+        idx = np.searchsorted(curve['datetime'], grid, side='right') - 1
+        valid = (idx >= 0) & (grid <= curve['datetime'][-1])
+        equity[row, valid] = curve['equity'][idx[valid]]
+        in_position[row, valid] = curve['in_position'][idx[valid]]
+
+    # 持仓时间重叠: 每个网格点的持续时间加权, 末点按中位间隔计
+    duration = np.diff(grid).astype(np.float64)
+    duration = np.append(duration, np.median(duration) if duration.shape[0] else 1.0)
+    weighted = in_position * duration
+    held = weighted.sum(axis=1)
+    both = weighted @ in_position.T.astype(np.float64)
+    either = held[:, None] + held[None, :] - both
+    jaccard = np.divide(both, either, out=np.full_like(both, np.nan), where=either > 0)
+
+    # 交易重叠: A 的每段持仓中 B 是否也持仓过
+    cumulative = np.concatenate((np.zeros((k, 1), dtype=np.int64), np.cumsum(in_position, axis=1)), axis=1)
+    trade_overlap = np.full((k, k), np.nan)
+    trade_counts = []
+    for row in range(k):
+        starts, ends = _position_runs(in_position[row])
+        trade_counts.append(int(starts.shape[0]))
+        if starts.shape[0]:
+            overlapped = (cumulative[:, ends] - cumulative[:, starts]) > 0
+            trade_overlap[row] = overlapped.mean(axis=1)
+
+    returns = np.full_like(equity, np.nan)
+    returns[:, 1:] = equity[:, 1:] / equity[:, :-1] - 1
+    correlation = _pairwise_correlation(returns)
+
+    metrics = {}
+    for key in keys:
+        summary = summaries.get(key)
+        metrics[key] = {name: summary.get(name) for name in COMPARE_METRICS} if summary \
+            else cache.get_metrics(key)
+    deltas = {}
+    for key in keys:
+        deltas[key] = {}
+        for name in COMPARE_METRICS:
+            value, base = metrics[key].get(name), metrics[baseline].get(name)
+            deltas[key][name] = value - base if value is not None and base is not None else None
+
+    # 各曲线以自身首个有效权益归一
+    first_index = np.argmax(~np.isnan(equity), axis=1)
+    start_equity = equity[np.arange(k), first_index]
+    normalized = equity / start_equity[:, None]
+
+    index = np.arange(n)
+    if max_points and 2 <= max_points < n:
+        index = np.unique(np.linspace(0, n - 1, max_points).astype(np.int64))
+    return {
+        'keys': keys,
+        'baseline': baseline,
+        'missing': missing,
+        'datetime': np.datetime_as_string(grid[index].astype('datetime64[s]'), unit='s').tolist(),
+        'equity': {key: _to_json_list(equity[row, index]) for row, key in enumerate(keys)},
+        'normalized': {key: _to_json_list(normalized[row, index]) for row, key in enumerate(keys)},
+        'metrics': metrics,
+        'deltas': deltas,
+        'overlap': {
+            'position_runs': dict(zip(keys, trade_counts)),
+            'exposure_jaccard': _matrix_to_list(jaccard),
+            'trade_overlap_ratio': _matrix_to_list(trade_overlap),
+            'return_correlation': _matrix_to_list(correlation),
+        },
+    }
+
+
+curve_cache = CurveCache(backtest_result_store)
@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# 重采样方式
+METHOD_BOOTSTRAP = 'bootstrap'  # 有放回抽样
+METHOD_SHUFFLE = 'shuffle'  # 打乱交易顺序
+METHOD_SKIP = 'skip'  # 随机跳过部分交易
+MONTE_CARLO_METHODS = (METHOD_BOOTSTRAP, METHOD_SHUFFLE, METHOD_SKIP)
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# 收益矩阵为 模拟次数×交易数, 限制模拟次数并按行分块计算, 避免单个请求占满内存
+MAX_SIMULATIONS = 100000
+# 每块收益矩阵的最大元素数(float64约16MB)
+CHUNK_CELLS = 2_000_000
+
+
+@dataclass
+class MonteCarloResult:
+    """蒙特卡洛稳健性分析结果"""
+    method: str
+    simulations: int
+    trade_count: int
+    initial_value: float
+    # 原始交易序列的结果
+    original_return: float
+    original_max_drawdown: float
+    # 各分位数 -> 数值
+    return_percentiles: Dict[str, float] = field(default_factory=dict)
+    max_drawdown_percentiles: Dict[str, float] = field(default_factory=dict)
+    max_drawdown_amount_percentiles: Dict[str, float] = field(default_factory=dict)
+    mean_return: float = 0.0
+    mean_max_drawdown: float = 0.0
+    loss_probability: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "simulations": self.simulations,
+            "trade_count": self.trade_count,
+            "initial_value": self.initial_value,
+            "original_return": self.original_return,
+            "original_max_drawdown": self.original_max_drawdown,
+            "return_percentiles": self.return_percentiles,
+            "max_drawdown_percentiles": self.max_drawdown_percentiles,
+            "max_drawdown_amount_percentiles": self.max_drawdown_amount_percentiles,
+            "mean_return": self.mean_return,
+            "mean_max_drawdown": self.mean_max_drawdown,
+            "loss_probability": self.loss_probability,
+        }
+
+
+def resample_pnl(pnl: np.ndarray, simulations: int, method: str, skip_prob: float,
+                 rng: np.random.Generator) -> np.ndarray:
+    """
+    生成 (simulations × trades) 的收益矩阵
+
+    Args:
+        pnl: 原始交易收益序列
+        simulations: 模拟次数
+        method: 重采样方式
+        skip_prob: skip 方式下每笔交易被跳过的概率
+        rng: 随机数生成器
+
+    Returns:
+        np.ndarray: 收益矩阵
+    """
+    n = pnl.shape[0]
+    if method == METHOD_BOOTSTRAP:
+        return pnl[rng.integers(0, n, size=(simulations, n))]
+    if method == METHOD_SHUFFLE:
+        return pnl[np.argsort(rng.random((simulations, n)), axis=1)]
+    if method == METHOD_SKIP:
+        return pnl * (rng.random((simulations, n)) >= skip_prob)
+    raise ValueError(f"Unsupported monte carlo method: {method}")
+
+
+def equity_drawdown(paths: np.ndarray, initial_value: float):
+    """
+    按行计算权益曲线的最终收益率与最大回撤
+
+    Returns:
+        tuple: (总收益率, 最大回撤比例, 最大回撤金额)，均为长度为行数的数组
+    """
+    equity = initial_value + np.cumsum(paths, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), initial_value)
+    drawdown_amount = peak - equity
+    max_drawdown_amount = drawdown_amount.max(axis=1)
+    max_drawdown = (drawdown_amount / peak).max(axis=1)
+    total_return = equity[:, -1] / initial_value - 1
+    return total_return, max_drawdown, max_drawdown_amount
+
+
+def run_monte_carlo(pnl: Sequence[float], initial_value: float, simulations: int = 10000,
+                    method: str = METHOD_BOOTSTRAP, skip_prob: float = 0.1,
+                    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                    seed: Optional[int] = None) -> MonteCarloResult:
+    """
+    对交易收益序列做蒙特卡洛重采样，给出收益率与回撤的置信区间
+
+    Args:
+        pnl: 每笔交易收益
+        initial_value: 初始资金
+        simulations: 模拟次数, 1 ~ MAX_SIMULATIONS
+        method: bootstrap / shuffle / skip
+        skip_prob: skip 方式下每笔交易被跳过的概率, 0 <= skip_prob < 1
+        percentiles: 输出的分位数
+        seed: 随机种子
+
+    Returns:
+        MonteCarloResult: 分析结果
+    """
+    if method not in MONTE_CARLO_METHODS:
+        raise ValueError(f"Unsupported monte carlo method: {method}")
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"simulations must be between 1 and {MAX_SIMULATIONS}, got {simulations}")
+    if not 0 <= skip_prob < 1:
+        raise ValueError(f"skip_prob must be in [0, 1), got {skip_prob}")
+    pnl = np.asarray(pnl, dtype=np.float64)
+    if pnl.size == 0:
+        raise ValueError("No trades to simulate")
+
+    rng = np.random.default_rng(seed)
+    # 每块最多 CHUNK_CELLS 个元素, 峰值内存与模拟次数无关
+    chunk = max(1, CHUNK_CELLS // pnl.size)
+    parts = [equity_drawdown(resample_pnl(pnl, min(chunk, simulations - start), method, skip_prob, rng),
+                             initial_value)
+             for start in range(0, simulations, chunk)]
+    total_return, max_drawdown, max_drawdown_amount = (np.concatenate(values) for values in zip(*parts))
+    original_return, original_max_drawdown, _ = equity_drawdown(pnl[np.newaxis, :], initial_value)
+
+    labels = [f"p{p:g}" for p in percentiles]
+    return MonteCarloResult(
+        method=method,
+        simulations=simulations,
+        trade_count=int(pnl.size),
+        initial_value=initial_value,
+        original_return=float(original_return[0]),
+        original_max_drawdown=float(original_max_drawdown[0]),
+        return_percentiles=dict(zip(labels, np.percentile(total_return, percentiles).tolist())),
+        max_drawdown_percentiles=dict(zip(labels, np.percentile(max_drawdown, percentiles).tolist())),
+        max_drawdown_amount_percentiles=dict(zip(labels, np.percentile(max_drawdown_amount, percentiles).tolist())),
+        mean_return=float(total_return.mean()),
+        mean_max_drawdown=float(max_drawdown.mean()),
+        loss_probability=float((total_return < 0).mean()),
+    )
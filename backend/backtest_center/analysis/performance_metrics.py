@@ -0,0 +1,307 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from backend.backtest_center.backtest_core.result_store import ACTION_SELL
+from backend.backtest_center.models.backtest_result import BacktestResults
+
+# 加密货币全天交易, 年化按自然日计算
+DAYS_PER_YEAR = 365
+# backtrader Returns 分析器的年化天数
+TRADING_DAYS_PER_YEAR = 252
+SECONDS_PER_DAY = 86400.0
+
+METRIC_FIELDS = (
+    'total_return', 'cagr', 'volatility', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio',
+    'max_drawdown', 'max_drawdown_amount', 'max_drawdown_duration', 'exposure',
+    'total_trades', 'winning_trades', 'losing_trades', 'win_rate', 'avg_win', 'avg_loss',
+    'profit_factor', 'expectancy',
+)
+
+
+@dataclass
+class PerformanceMetrics:
+    """
+    单次回测的绩效指标, 比例均为小数(0.05 表示 5%)
+
+    max_drawdown_duration 为从前高到重新创新高(或回测结束)的最长天数
+    """
+    total_return: float
+    cagr: Optional[float]
+    volatility: Optional[float]
+    sharpe_ratio: Optional[float]
+    sortino_ratio: Optional[float]
+    calmar_ratio: Optional[float]
+    max_drawdown: float
+    max_drawdown_amount: float
+    max_drawdown_duration: float
+    exposure: float
+    total_trades: int
+    winning_trades: int
+    losing_trades: int
+    win_rate: float
+    avg_win: float
+    avg_loss: float
+    profit_factor: Optional[float]
+    expectancy: float
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in METRIC_FIELDS}
+
+
+def infer_periods_per_year(datetime_arr: np.ndarray) -> float:
+    """由K线时间间隔的中位数推算每年K线数"""
+    if datetime_arr.shape[0] < 2:
+        return float(DAYS_PER_YEAR)
+    seconds = np.diff(datetime_arr.astype('datetime64[s]').astype(np.int64))
+    step = float(np.median(seconds))
+    return DAYS_PER_YEAR * SECONDS_PER_DAY / step if step > 0 else float(DAYS_PER_YEAR)
+
+
+def closed_trade_pnl(trades: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    每笔完整交易扣除买卖手续费后的收益, 与 backtrader TradeAnalyzer 的 pnl.net 口径一致
+
+    每次卖出结束一笔交易, 之前未结束的买入都属于这笔交易
+    """
+    if not trades or trades['action'].shape[0] == 0:
+        return np.empty(0)
+    is_sell = trades['action'] == ACTION_SELL
+    trade_id = np.cumsum(is_sell) - is_sell
+    n_closed = int(is_sell.sum())
+    closed = trade_id < n_closed
+    commission = np.bincount(trade_id[closed], weights=trades['commission'][closed], minlength=n_closed)
+    return trades['pnl'][is_sell] - commission
+
+
+def pad_trade_pnl(pnl_list: Sequence[np.ndarray]) -> np.ndarray:
+    """不等长的逐笔收益补NaN为 (回测数 × 最大交易数) 矩阵"""
+    width = max((p.shape[0] for p in pnl_list), default=0)
+    matrix = np.full((len(pnl_list), width), np.nan)
+    for i, pnl in enumerate(pnl_list):
+        matrix[i, :pnl.shape[0]] = pnl
+    return matrix
+
+
+def equity_metrics(equity: np.ndarray, initial_value, periods_per_year: float) -> Dict[str, np.ndarray]:
+    """
+    批量计算权益曲线类指标
+
+    Args:
+        equity: (回测数 × K线数) 逐K线权益, 各回测需使用相同K线
+        initial_value: 初始资金, 标量或每个回测一个值
+        periods_per_year: 每年K线数
+
+    Returns:
+        Dict[str, np.ndarray]: 指标名 -> 每个回测一个值, 无法计算时为NaN
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    n_runs, n_bars = equity.shape
+    initial = np.broadcast_to(np.asarray(initial_value, dtype=np.float64), (n_runs,))
+    if n_bars == 0:
+        nan = np.full(n_runs, np.nan)
+        zero = np.zeros(n_runs)
+        return {'total_return': zero, 'cagr': nan, 'volatility': nan, 'sharpe_ratio': nan, 'sortino_ratio': nan,
+                'calmar_ratio': nan, 'max_drawdown': zero, 'max_drawdown_amount': zero,
+                'max_drawdown_duration': zero}
+
+    # 首根K线的收益相对初始资金计算
+    prev = np.concatenate([initial[:, None], equity[:, :-1]], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = equity / prev - 1
+        total_return = equity[:, -1] / initial - 1
+        growth = equity[:, -1] / initial
+        cagr = np.where(growth > 0, np.power(np.maximum(growth, 0), periods_per_year / n_bars) - 1, -1.0)
+
+        mean = returns.mean(axis=1)
+        std = returns.std(axis=1, ddof=1) if n_bars > 1 else np.full(n_runs, np.nan)
+        downside = np.sqrt(np.square(np.minimum(returns, 0)).mean(axis=1))
+        scale = math.sqrt(periods_per_year)
+        volatility = std * scale
+        sharpe = np.where(std > 0, mean / std * scale, np.nan)
+        sortino = np.where(downside > 0, mean / downside * scale, np.nan)
+
+        # 与 build_equity_curve 的 drawdown 列口径一致
+        peak = np.maximum.accumulate(equity, axis=1)
+        drawdown_amount = peak - equity
+        drawdown = np.where(peak > 0, drawdown_amount / peak, 0.0)
+        max_drawdown = drawdown.max(axis=1)
+        calmar = np.where(max_drawdown > 0, cagr / max_drawdown, np.nan)
+
+    # 最近一次处于前高的K线下标, 当前下标与之相差即为回撤持续的K线数
+    bars = np.arange(n_bars)
+    at_peak = np.where(drawdown_amount <= 0, bars, -1)
+    last_peak = np.maximum.accumulate(at_peak, axis=1)
+    duration = (bars - last_peak).max(axis=1) * (DAYS_PER_YEAR / periods_per_year)
+
+    return {
+        'total_return': total_return,
+        'cagr': cagr,
+        'volatility': volatility,
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino,
+        'calmar_ratio': calmar,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_amount': drawdown_amount.max(axis=1),
+        'max_drawdown_duration': duration.astype(np.float64),
+    }
+
+
+def trade_metrics(pnl: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    批量计算逐笔交易类指标
+
+    Args:
+        pnl: (回测数 × 交易数) 逐笔净收益, 不足的位置为NaN, 见 pad_trade_pnl
+
+    Returns:
+        Dict[str, np.ndarray]: 指标名 -> 每个回测一个值
+    """
+    pnl = np.atleast_2d(np.asarray(pnl, dtype=np.float64))
+    valid = ~np.isnan(pnl)
+    wins = np.where(valid & (pnl > 0), pnl, 0.0)
+    losses = np.where(valid & (pnl <= 0), pnl, 0.0)
+    total = valid.sum(axis=1)
+    n_win = (valid & (pnl > 0)).sum(axis=1)
+    n_loss = total - n_win
+    gross_win = wins.sum(axis=1)
+    gross_loss = -losses.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'total_trades': total,
+            'winning_trades': n_win,
+            'losing_trades': n_loss,
+            'win_rate': np.where(total > 0, n_win / total, 0.0),
+            'avg_win': np.where(n_win > 0, gross_win / n_win, 0.0),
+            'avg_loss': np.where(n_loss > 0, -gross_loss / n_loss, 0.0),
+            # 没有亏损交易时盈亏比为NaN
+            'profit_factor': np.where(gross_loss > 0, gross_win / gross_loss, np.nan),
+            'expectancy': np.where(total > 0, (gross_win - gross_loss) / total, 0.0),
+        }
+
+
+def exposure_ratio(position: np.ndarray) -> np.ndarray:
+    """持仓K线数占比"""
+    position = np.atleast_2d(np.asarray(position, dtype=np.float64))
+    if position.shape[1] == 0:
+        return np.zeros(position.shape[0])
+    return (position != 0).mean(axis=1)
+
+
+def compute_metrics_batch(equity: np.ndarray, trade_pnl: Sequence[np.ndarray], initial_value,
+                          datetime_arr: Optional[np.ndarray] = None, periods_per_year: Optional[float] = None,
+                          position: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    参数扫描等场景下一次计算多组回测的全部指标
+
+    Args:
+        equity: (回测数 × K线数) 逐K线权益
+        trade_pnl: 每个回测的逐笔净收益
+        initial_value: 初始资金
+        datetime_arr: K线时间, 用于推算年化系数
+        periods_per_year: 每年K线数, 指定时忽略 datetime_arr
+        position: (回测数 × K线数) 持仓数量, 为空时 exposure 为NaN
+
+    Returns:
+        Dict[str, np.ndarray]: METRIC_FIELDS -> 每个回测一个值
+    """
+    if periods_per_year is None:
+        periods_per_year = infer_periods_per_year(datetime_arr) if datetime_arr is not None else DAYS_PER_YEAR
+    metrics = equity_metrics(equity, initial_value, periods_per_year)
+    metrics.update(trade_metrics(pad_trade_pnl(trade_pnl)))
+    n_runs = metrics['total_return'].shape[0]
+    metrics['exposure'] = exposure_ratio(position) if position is not None else np.full(n_runs, np.nan)
+    return metrics
+
+
+def _scalar(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def compute_metrics(equity_curve: Dict[str, np.ndarray], trades: Dict[str, np.ndarray],
+                    initial_value: float) -> PerformanceMetrics:
+    """
+    由权益曲线与列式交易记录计算单次回测的绩效指标, 与回测引擎无关
+
+    Args:
+        equity_curve: build_equity_curve 的结果
+        trades: 列式交易记录, 字段同 result_store.save_trades
+        initial_value: 初始资金
+
+    Returns:
+        PerformanceMetrics: 绩效指标, 无法计算的比率为None
+    """
+    if equity_curve and equity_curve['equity'].shape[0]:
+        equity = equity_curve['equity']
+        datetime_arr = equity_curve['datetime']
+        position = equity_curve['position']
+    else:
+        equity = np.empty(0)
+        datetime_arr = np.empty(0, dtype='datetime64[s]')
+        position = np.empty(0)
+    metrics = compute_metrics_batch(equity[None, :], [closed_trade_pnl(trades)], initial_value,
+                                    datetime_arr=datetime_arr, position=position[None, :])
+    values = {name: metrics[name][0] for name in METRIC_FIELDS}
+    for name in ('total_trades', 'winning_trades', 'losing_trades'):
+        values[name] = int(values[name])
+    for name in ('cagr', 'volatility', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'profit_factor'):
+        values[name] = _scalar(values[name])
+    for name in ('total_return', 'max_drawdown', 'max_drawdown_amount', 'max_drawdown_duration', 'exposure',
+                 'win_rate', 'avg_win', 'avg_loss', 'expectancy'):
+        values[name] = float(values[name])
+    return PerformanceMetrics(**values)
+
+
+
+def build_backtest_results(equity_curve: Dict[str, np.ndarray], trades: Dict[str, np.ndarray],
+                           initial_value: float, total_entry_signals: int = 0, total_sell_signals: int = 0,
+                           key: str = '') -> BacktestResults:
+    """
+    由回测后的数组汇总 BacktestResults, backtrader 与向量化引擎共用
+
+    total_return/annual_return 保持 backtrader Returns 分析器的口径(对数收益, 按252天年化),
+    max_drawdown 与 win_rate 为百分数, 其余新增指标见 PerformanceMetrics
+    """
+    metrics = compute_metrics(equity_curve, trades, initial_value)
+    final_value = float(equity_curve['equity'][-1]) if equity_curve and equity_curve['equity'].shape[0] \
+        else initial_value
+    ratio = final_value / initial_value
+    # 权益小于等于0时对数收益无法计算, 与其他无法计算的比率一样为None
+    total_return = _scalar(np.log(ratio)) if ratio > 0 else None
+    n_days = 0
+    if equity_curve and equity_curve['datetime'].shape[0]:
+        n_days = np.unique(equity_curve['datetime'].astype('datetime64[D]')).shape[0]
+    if total_return is None:
+        annual_return = None
+    else:
+        annual_return = _scalar(np.expm1(total_return / n_days * TRADING_DAYS_PER_YEAR)) if n_days else 0.0
+
+    return BacktestResults(
+        initial_value=initial_value,
+        final_value=final_value,
+        total_return=total_return,
+        annual_return=annual_return,
+        sharpe_ratio=metrics.sharpe_ratio,
+        max_drawdown=metrics.max_drawdown * 100,
+        max_drawdown_amount=metrics.max_drawdown_amount,
+        total_trades=metrics.total_trades,
+        winning_trades=metrics.winning_trades,
+        losing_trades=metrics.losing_trades,
+        avg_win=metrics.avg_win,
+        avg_loss=metrics.avg_loss,
+        win_rate=metrics.win_rate * 100,
+        total_entry_signals=total_entry_signals,
+        total_sell_signals=total_sell_signals,
+        key=key,
+        cagr=metrics.cagr,
+        volatility=metrics.volatility,
+        sortino_ratio=metrics.sortino_ratio,
+        calmar_ratio=metrics.calmar_ratio,
+        max_drawdown_duration=metrics.max_drawdown_duration,
+        exposure=metrics.exposure,
+        profit_factor=metrics.profit_factor,
+        expectancy=metrics.expectancy,
+    )
@@ -0,0 +1,93 @@
+from typing import Dict, Optional
+
+import backtrader as bt
+import numpy as np
+
+# backtrader 日期数值(ordinal)中 1970-01-01 对应的值
+_EPOCH_ORDINAL = 719163.0
+_SECONDS_PER_DAY = 86400.0
+
+EQUITY_CURVE_FIELDS = ('datetime', 'equity', 'cash', 'position', 'drawdown')
+
+
+class EquityCurveAnalyzer(bt.Analyzer):
+    """
+    逐K线记录权益、现金、持仓与回撤
+
+    数组在 start() 中按数据长度预分配，next() 只做下标写入。
+    """
+
+    def start(self):
+        n = max(self.strategy.data0.buflen(), 1)
+        self._dt = np.empty(n, dtype=np.float64)
+        self._equity = np.empty(n, dtype=np.float64)
+        self._cash = np.empty(n, dtype=np.float64)
+        self._position = np.empty(n, dtype=np.float64)
+        self._i = 0
+        self.curve: Dict[str, np.ndarray] = {}
+
+    def _grow(self):
+        n = self._dt.shape[0] * 2
+        self._dt = np.resize(self._dt, n)
+        self._equity = np.resize(self._equity, n)
+        self._cash = np.resize(self._cash, n)
+        self._position = np.resize(self._position, n)
+
+    def next(self):
+        i = self._i
+        if i >= self._dt.shape[0]:
+            self._grow()
+        broker = self.strategy.broker
+        self._dt[i] = self.strategy.data0.datetime[0]
+        self._equity[i] = broker.getvalue()
+        self._cash[i] = broker.getcash()
+        self._position[i] = self.strategy.position.size
+        self._i = i + 1
+
+    def stop(self):
+        n = self._i
+        seconds = np.round((self._dt[:n] - _EPOCH_ORDINAL) * _SECONDS_PER_DAY).astype('int64')
+        self.curve = build_equity_curve(seconds.astype('datetime64[s]'), self._equity[:n],
+                                        self._cash[:n], self._position[:n])
+
+    def get_analysis(self) -> Dict[str, np.ndarray]:
+        return self.curve
+
+
+def build_equity_curve(datetime_arr: np.ndarray, equity: np.ndarray, cash: np.ndarray,
+                       position: np.ndarray) -> Dict[str, np.ndarray]:
+    """由逐K线权益、现金、持仓数组构造权益曲线并计算回撤"""
+    peak = np.maximum.accumulate(equity) if equity.shape[0] else equity
+    return {
+        'datetime': datetime_arr,
+        'equity': equity,
+        'cash': cash,
+        'position': position,
+        'drawdown': np.divide(peak - equity, peak, out=np.zeros_like(equity), where=peak > 0),
+    }
+
+
+def downsample_equity_curve(curve: Dict[str, np.ndarray], max_points: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    均匀抽样降采样, 保留首尾与最大回撤点
+
+    Args:
+        curve: 权益曲线数组
+        max_points: 最大点数, 为空或不小于原长度时原样返回
+
+    Returns:
+        Dict[str, np.ndarray]: 降采样后的曲线
+    """
+    n = curve['equity'].shape[0]
+    if not max_points or max_points >= n or max_points < 2:
+        return curve
+    index = np.linspace(0, n - 1, max_points - 1).astype(np.int64)
+    index = np.unique(np.append(index, np.argmax(curve['drawdown'])))
+    return {name: values[index] for name, values in curve.items()}
+
+
+def equity_curve_to_dict(curve: Dict[str, np.ndarray]) -> dict:
+    """转换为可JSON序列化的列式dict"""
+    result = {name: values.tolist() for name, values in curve.items() if name != 'datetime'}
+    result['datetime'] = np.datetime_as_string(curve['datetime'], unit='s').tolist()
+    return result
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本，回测引擎逻辑变化导致旧结果失效时递增
+CACHE_VERSION = 1
+# 默认缓存目录及容量上限
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """
+    计算数据集指纹
+
+    Args:
+        df: K线数据
+
+    Returns:
+        str: 基于列名与逐行哈希的sha1
+    """
+    digest = hashlib.sha1()
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def build_fingerprint(dataset_hash: str, st_codes: Dict[str, Optional[str]], source_hashes: Dict[str, str],
+                      params: Dict[str, Any], broker: Dict[str, Any]) -> str:
+    """
+    由数据集、策略code、策略源码、回测参数、broker设置构建缓存key
+
+    Args:
+        dataset_hash: 数据集指纹
+        st_codes: 入场/出场/过滤策略code
+        source_hashes: 策略code -> 源码哈希
+        params: 回测参数（起始时间、仓位参数等）
+        broker: broker设置（初始资金、手续费）
+
+    Returns:
+        str: 缓存key
+    """
+    payload = {
+        'version': CACHE_VERSION,
+        'dataset': dataset_hash,
+        'codes': st_codes,
+        'sources': source_hashes,
+        'params': params,
+        'broker': broker,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class BacktestCache:
+    """
+    回测结果缓存
+
+    以pickle文件形式保存在缓存目录下，多进程共享；总大小超过上限时按最近访问时间淘汰。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f'{fingerprint}.pkl')
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """命中返回缓存内容，并刷新访问时间"""
+        path = self._path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path, None)
+            logger.info(f"BacktestCache@get hit: {fingerprint}")
+            return entry
+        except Exception as e:
+            logger.error(f"BacktestCache@get failed to load {path}: {str(e)}")
+            self.invalidate(fingerprint)
+            return None
+
+    def put(self, fingerprint: str, entry: Dict[str, Any]) -> None:
+        """写入缓存，先写临时文件再原子替换，避免并发读到半成品"""
+        path = self._path(fingerprint)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"BacktestCache@put failed to write {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def invalidate(self, fingerprint: str) -> None:
+        path = self._path(fingerprint)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def clear(self) -> None:
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.pkl'):
+                os.remove(os.path.join(self.cache_dir, file))
+
+    def _evict(self) -> None:
+        """总大小超过上限时，按访问时间从旧到新删除"""
+        with self._lock:
+            entries = []
+            total = 0
+            for file in os.listdir(self.cache_dir):
+                if not file.endswith('.pkl'):
+                    continue
+                path = os.path.join(self.cache_dir, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"BacktestCache@evict: {path}")
+                except FileNotFoundError:
+                    continue
+
+
+backtest_cache = BacktestCache()
@@ -0,0 +1,238 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend._utils import SSEManager
+from backend.backtest_center.backtest_core.result_exporter import backtest_result_exporter, check_export_format
+from backend.data_object_center.enum_obj import EnumBacktestJobStatus
+
+logger = logging.getLogger(__name__)
+
+# 进程池大小, 默认保留一个核给API进程
+MAX_WORKERS = int(os.getenv('BACKTEST_MAX_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+# 内存中最多保留的已结束任务数
+MAX_FINISHED_JOBS = 200
+
+_FINISHED_STATUSES = (
+    EnumBacktestJobStatus.DONE.value,
+    EnumBacktestJobStatus.FAILED.value,
+    EnumBacktestJobStatus.CANCELED.value,
+)
+
+# 跨进程任务状态表的取值, 先写入的一方生效: 子进程开始执行时写入 STARTED, 取消时写入 CANCELED
+_JOB_STARTED = 'started'
+_JOB_CANCELED = 'canceled'
+
+
+class BacktestJobCanceled(Exception):
+    """任务已进入进程池调用队列后被取消, 子进程开始执行前跳过"""
+
+
+def run_backtest_job(job_id: str, st_instance_id: int, force_refresh: bool, progress_queue, job_states,
+                     filter_time_frame: Optional[str] = None, engine: str = 'backtrader',
+                     intrabar_time_frame: Optional[str] = None, leverage: Optional[float] = None,
+                     apply_filters: bool = False) -> dict:
+    """
+    进程池中执行的回测任务
+
+    Args:
+        job_id: 任务id
+        st_instance_id: 策略实例id
+        force_refresh: 是否忽略缓存
+        progress_queue: 跨进程进度队列, 元素为 (job_id, event, data)
+        job_states: 跨进程任务状态表 job_id -> started/canceled
+        filter_time_frame: 过滤策略周期
+        engine: 回测引擎
+        intrabar_time_frame: 止损成交模拟使用的低周期
+        leverage: 永续合约杠杆倍数, 为空时按现货撮合
+        apply_filters: 是否执行过滤策略
+
+    Returns:
+        dict: BacktestResults.to_dict()
+
+    Raises:
+        BacktestJobCanceled: 开始执行前已被取消
+    """
+    if job_states.setdefault(job_id, _JOB_STARTED) == _JOB_CANCELED:
+        raise BacktestJobCanceled(job_id)
+    # 在子进程内导入, 避免API进程导入时加载回测依赖
+    from backend.backtest_center.backtest_main import backtest_main
+
+    def report(event: str, data: dict):
+        progress_queue.put((job_id, event, data))
+
+    report('status', {'status': EnumBacktestJobStatus.RUNNING.value})
+    return backtest_main(st_instance_id, force_refresh=force_refresh,
+                         progress_callback=lambda data: report('progress', data),
+                         filter_time_frame=filter_time_frame, engine=engine,
+                         intrabar_time_frame=intrabar_time_frame, leverage=leverage,
+                         apply_filters=apply_filters)
+
+
+class BacktestJobManager:
+    """
+    异步回测任务管理
+
+    - submit 立即返回 job_id, 任务在有界进程池中执行
+    - 进度与阶段性指标通过 SSEManager 推送, 通道id即job_id
+    - 尚未开始执行的任务可以取消, 包括已被进程池放入调用队列的任务
+    - 任务结束并推送 end 事件后关闭SSE通道, 之后订阅只返回最终状态
+    - 指定 export_format 时, 任务完成后在API进程的后台线程中导出结果文件, 不占用回测进程
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._job_states = None
+        self._drain_thread: Optional[threading.Thread] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+
+    def _ensure_started(self) -> None:
+        """首次提交时创建进程池与进度转发线程"""
+        if self._executor is not None:
+            return
+        # spawn 避免子进程继承API进程的数据库连接和线程
+        ctx = multiprocessing.get_context('spawn')
+        manager = ctx.Manager()
+        self._progress_queue = manager.Queue()
+        self._job_states = manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+        self._drain_thread = threading.Thread(target=self._drain_progress, daemon=True,
+                                              name='backtest-progress-drain')
+        self._drain_thread.start()
+
+    def submit(self, st_instance_id: int, force_refresh: bool = False, filter_time_frame: Optional[str] = None,
+               engine: str = 'backtrader', intrabar_time_frame: Optional[str] = None,
+               export_format: Optional[str] = None, leverage: Optional[float] = None,
+               apply_filters: bool = False) -> str:
+        """提交回测任务, 需在事件循环中调用以绑定SSE通道"""
+        if export_format:
+            check_export_format(export_format)
+        with self._lock:
+            self._ensure_started()
+            job_id, _ = SSEManager.create_channel()
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'strategy_id': st_instance_id,
+                'status': EnumBacktestJobStatus.QUEUED.value,
+                'progress': 0.0,
+                'metrics': {},
+                'key': None,
+                'result': None,
+                'error': None,
+                'submit_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'finish_time': None,
+                'export_format': export_format,
+            }
+            future = self._executor.submit(run_backtest_job, job_id, st_instance_id, force_refresh,
+                                           self._progress_queue, self._job_states, filter_time_frame, engine,
+                                           intrabar_time_frame, leverage, apply_filters)
+            self._futures[job_id] = future
+            self._prune_finished_jobs()
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        self._publish(job_id, 'status', {'status': EnumBacktestJobStatus.QUEUED.value})
+        logger.info(f"BacktestJobManager@submit job {job_id} for strategy {st_instance_id}")
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消尚未开始执行的任务, 运行中或已结束的任务无法取消
+
+        进程池会提前把任务放入调用队列, 这时 future.cancel() 失败,
+        改为在状态表中标记取消, 子进程开始执行前检查到标记即跳过
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            if future is None:
+                return False
+            if future.cancel():
+                # 取消成功后 done_callback 会更新状态并关闭通道
+                return True
+            return self._job_states.setdefault(job_id, _JOB_CANCELED) == _JOB_CANCELED
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [dict(job) for job in self._jobs.values()]
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        # 与 _drain_progress 共用锁, 结束状态写入后不会再被子进程较晚到达的状态覆盖
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._job_states.pop(job_id, None)
+            if future.cancelled() or isinstance(future.exception(), BacktestJobCanceled):
+                job['status'] = EnumBacktestJobStatus.CANCELED.value
+            elif future.exception() is not None:
+                job['status'] = EnumBacktestJobStatus.FAILED.value
+                job['error'] = str(future.exception())
+            else:
+                job['status'] = EnumBacktestJobStatus.DONE.value
+                job['progress'] = 1.0
+                job['result'] = future.result()
+                job['key'] = job['result'].get('key') if job['result'] else None
+        if job['status'] == EnumBacktestJobStatus.FAILED.value:
+            logger.error(f"BacktestJobManager@job {job_id} failed: {job['error']}")
+        elif job['key'] and job['export_format']:
+            backtest_result_exporter.submit(job['key'], job['export_format'])
+        job['finish_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._publish(job_id, 'result', {
+            'status': job['status'],
+            'key': job['key'],
+            'error': job['error'],
+        })
+        self._publish(job_id, 'end', {})
+        # 已订阅的连接持有队列, 仍会收到上面的消息; 没有订阅时通道不再保留
+        SSEManager.close_channel(job_id)
+
+    def _drain_progress(self) -> None:
+        """将子进程上报的进度转发到对应SSE通道"""
+        while True:
+            try:
+                job_id, event, data = self._progress_queue.get()
+            except (EOFError, OSError):
+                break
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            with self._lock:
+                # 子进程的消息经Manager队列转发, 可能晚于 _on_done 到达, 已结束的任务不再更新, 通道也已关闭
+                if job['status'] in _FINISHED_STATUSES:
+                    continue
+                if event == 'status':
+                    job['status'] = data.get('status', job['status'])
+                elif event == 'progress':
+                    total = data.get('total_bars') or 0
+                    job['progress'] = round(data['bar'] / total, 4) if total else job['progress']
+                    job['metrics'] = data
+                    data = {**data, 'progress': job['progress']}
+                self._publish(job_id, event, data)
+
+    @staticmethod
+    def _publish(job_id: str, event: str, data: dict) -> None:
+        SSEManager.publish_threadsafe(job_id, event, json.dumps(data, default=str))
+
+    def _prune_finished_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in _FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+backtest_job_manager = BacktestJobManager()
@@ -1,23 +1,44 @@
+import logging
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
 
 import backtrader as bt
+import numpy as np
 import pandas as pd
 from backend.backtest_center.strategy_for_backtest import StrategyForBacktest
+from backend.backtest_center.analysis.performance_metrics import build_backtest_results
+from backend.backtest_center.analyzers.equity_curve import EquityCurveAnalyzer
 from backend.backtest_center.data_feeds.signal_data import SignalData
 from backend.backtest_center.models.backtest_result import BacktestResults
+from backend.backtest_center.models.trade_record import TradeRecord
+from backend.backtest_center.backtest_core.result_store import backtest_result_store, trade_records_to_arrays
+from backend.backtest_center.utils.event_log import LOG_SILENT
 from backend.data_object_center.backtest_record import BacktestRecord
-from backend.data_object_center.backtest_result import BacktestResult
+from backend.data_object_center.backtest_result import BacktestResult, METRIC_COLUMNS
 from backend.data_object_center.st_instance import StrategyInstance
 
+logger = logging.getLogger(__name__)
+
 
 class BacktestSystem:
     """回测系统主类"""
 
     def __init__(self, initial_cash: float = 100000.0, risk_percent: float = 2.0,
-                 commission: float = 0.001):
+                 commission: float = 0.001, progress_callback: Optional[Callable[[dict], None]] = None,
+                 verbosity: int = LOG_SILENT, event_writer: Optional[Callable[[str], None]] = logger.info):
+        """
+        Args:
+            verbosity: 策略事件日志级别, 默认 LOG_SILENT 热循环不记录任何事件, 排查问题时使用 LOG_TRADE/LOG_DEBUG
+            event_writer: 回测结束后输出事件日志的函数, 默认写入日志, 为None时丢弃
+        """
         self.initial_cash = initial_cash
         self.risk_percent = risk_percent
         self.commission = commission
+        self.progress_callback = progress_callback
+        self.verbosity = verbosity
+        self.event_writer = event_writer
+        self.trade_records = []
+        self.equity_curve: Dict[str, np.ndarray] = {}
         self.cerebro = bt.Cerebro()
         self._setup_cerebro()
 
@@ -25,15 +46,13 @@ class BacktestSystem:
         """设置cerebro基本参数"""
         self.cerebro.broker.setcash(self.initial_cash)
         self.cerebro.broker.setcommission(commission=self.commission)
-        self.cerebro.addstrategy(StrategyForBacktest, risk_percent=self.risk_percent)
+        self.cerebro.addstrategy(StrategyForBacktest, risk_percent=self.risk_percent,
+                                 progress_callback=self.progress_callback, verbosity=self.verbosity)
         self._add_analyzers()
 
     def _add_analyzers(self) -> None:
-        """添加分析器"""
-        self.cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
-        self.cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
-        self.cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+        """添加分析器, 只逐K线记录权益曲线, 绩效指标在回测结束后由数组计算"""
+        self.cerebro.addanalyzer(EquityCurveAnalyzer, _name='equity')
 
     def prepare_data(self, df: pd.DataFrame) -> None:
         """准备数据"""
@@ -56,68 +75,22 @@ class BacktestSystem:
     def _process_results(self, results) -> BacktestResults:
         """处理回测结果"""
         strat = results[0]
-        portfolio_value = self.cerebro.broker.getvalue()
-        returns = strat.analyzers.returns.get_analysis()
-        sharpe = strat.analyzers.sharpe.get_analysis()
-        drawdown = strat.analyzers.drawdown.get_analysis()
-        trades = strat.analyzers.trades.get_analysis()
-
-        total_trades = trades.get('total', {}).get('total', 0)
-        winning_trades = trades.get('won', {}).get('total', 0)
-        losing_trades = trades.get('lost', {}).get('total', 0)
-        avg_win = trades.get('won', {}).get('pnl', {}).get('average', 0)
-        avg_loss = trades.get('lost', {}).get('pnl', {}).get('average', 0)
-        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-
-        return BacktestResults(
-            initial_value=self.initial_cash,
-            final_value=portfolio_value,
-            total_return=returns.get('rtot', 0),
-            annual_return=returns.get('rnorm', 0),
-            sharpe_ratio=sharpe.get('sharperatio', 0),
-            max_drawdown=drawdown.get('max', {}).get('drawdown', 0),
-            max_drawdown_amount=drawdown.get('max', {}).get('moneydown', 0),
-            total_trades=total_trades,
-            winning_trades=winning_trades,
-            losing_trades=losing_trades,
-            avg_win=avg_win,
-            avg_loss=avg_loss,
-            win_rate=win_rate,
-            total_entry_signals=0,
-            total_sell_signals=0,
-            key=''
-        )
-
-    def _export_trade_records(self, results) -> None:
-        """导出交易记录到Excel"""
-        strategy = results[0]
-        if not strategy.trade_records:
+        return build_backtest_results(strat.analyzers.equity.get_analysis(),
+                                      trade_records_to_arrays(strat.trade_records), self.initial_cash)
+
+    def _flush_events(self, results) -> None:
+        """回测结束后统一输出策略事件日志"""
+        event_log = results[0].event_log
+        if self.verbosity == LOG_SILENT:
+            event_log.clear()
             return
-
-        records_df = pd.DataFrame([vars(record) for record in strategy.trade_records])
-
-        # 添加累计收益列
-        records_df['cumulative_pnl'] = records_df['pnl'].cumsum()
-
-        # 添加其他统计信息
-        stats_df = pd.DataFrame([{
-            'Initial Value': self.initial_cash,
-            'Final Value': self.cerebro.broker.getvalue(),
-            'Total Return': f"{(self.cerebro.broker.getvalue() / self.initial_cash - 1) * 100:.2f}%",
-            'Win Rate': f"{(len(records_df[records_df['pnl'] > 0]) / len(records_df) * 100):.2f}%" if len(
-                records_df) > 0 else "0%",
-            'Total Trades': len(records_df)
-        }])
-
-        # 导出到Excel，创建多个sheet
-        with pd.ExcelWriter('backtest_results.xlsx') as writer:
-            records_df.to_excel(writer, sheet_name='Trade Records', index=False)
-            stats_df.to_excel(writer, sheet_name='Summary', index=False)
+        event_log.flush(self.event_writer)
 
     def run(self, df: pd.DataFrame, st: StrategyInstance, plot: bool = False) -> dict:
         """运行回测"""
         self.prepare_data(df)
         results = self.cerebro.run()
+        self._flush_events(results)
 
         backtest_results = self._process_results(results)
         # 打印生成的信号统计
@@ -126,13 +99,13 @@ class BacktestSystem:
         print(f"\n信号统计:")
         print(f"总买入信号数: {backtest_results.total_entry_signals}")
         print(f"总卖出信号数: {backtest_results.total_sell_signals}")
-        key = f'{st.trade_pair}_' + f'ST{st.id}_' + datetime.now().strftime('%Y%m%d%H%M')
-        record_backtest_results(backtest_results, results, st, key)
+        key = make_backtest_key(st)
+        record_backtest_results(backtest_results, results[0].trade_records,
+                                results[0].analyzers.equity.get_analysis(), st, key)
         backtest_results.key = key
-
-        # 导出交易记录
-        self._export_trade_records(results)
-        _print_results(backtest_results)
+        self.trade_records = results[0].trade_records
+        self.equity_curve = results[0].analyzers.equity.get_analysis()
+        print_results(backtest_results)
 
         if plot:
             # self.cerebro.plot(style='candlestick')
@@ -141,12 +114,18 @@ class BacktestSystem:
         return backtest_results.to_dict()
 
 
-def _print_results(results: BacktestResults) -> None:
+def print_results(results: BacktestResults) -> None:
     print('\n=== 回测结果 ===')
     print(f'初始投资组合价值: ${results.initial_value:.2f}')
     print(f'最终投资组合价值: ${results.final_value:.2f}')
-    print(f'总收益率: {results.total_return:.2%}')
-    print(f'年化收益率: {results.annual_return:.2%}')
+    if results.total_return is None:
+        print('总收益率: 无法计算')
+    else:
+        print(f'总收益率: {results.total_return:.2%}')
+    if results.annual_return is None:
+        print('年化收益率: 无法计算')
+    else:
+        print(f'年化收益率: {results.annual_return:.2%}')
     if results.sharpe_ratio is None:
         print('夏普比率: 无法计算')
     else:
@@ -163,9 +142,27 @@ def _print_results(results: BacktestResults) -> None:
         print(f'平均盈利: ${results.avg_win:.2f}')
     if results.losing_trades:
         print(f'平均亏损: ${results.avg_loss:.2f}')
-
-
-def record_backtest_results(backtest_results: BacktestResults, results, st: StrategyInstance, key: str):
+    if results.profit_factor is not None:
+        print(f'盈亏比: {results.profit_factor:.3f}')
+    if results.expectancy is not None:
+        print(f'单笔期望收益: ${results.expectancy:.2f}')
+    if results.sortino_ratio is not None:
+        print(f'索提诺比率: {results.sortino_ratio:.3f}')
+    if results.calmar_ratio is not None:
+        print(f'卡玛比率: {results.calmar_ratio:.3f}')
+    if results.max_drawdown_duration is not None:
+        print(f'最长回撤天数: {results.max_drawdown_duration:.1f}')
+    if results.exposure is not None:
+        print(f'持仓时间占比: {results.exposure:.2%}')
+
+
+def make_backtest_key(st: StrategyInstance) -> str:
+    return f'{st.trade_pair}_' + f'ST{st.id}_' + datetime.now().strftime('%Y%m%d%H%M')
+
+
+def record_backtest_results(backtest_results: BacktestResults, trade_records: List[TradeRecord],
+                            equity_curve: Dict[str, np.ndarray], st: StrategyInstance, key: str,
+                            save_columnar: bool = True):
     # 插入回测结果表
     result_data = {
         'strategy_id': st.id,
@@ -180,17 +177,27 @@ def record_backtest_results(backtest_results: BacktestResults, results, st: Stra
         'loss_count': backtest_results.losing_trades,
         'profit_total_count': int(backtest_results.final_value - backtest_results.initial_value),
         'profit_average': int((backtest_results.avg_win + backtest_results.avg_loss) / 2),
-        'profit_rate': int(backtest_results.win_rate)
+        'profit_rate': int(backtest_results.win_rate),
+        **{name: getattr(backtest_results, name) for name in METRIC_COLUMNS},
     }
     result = BacktestResult.insert_or_update(result_data)
 
-    # 插入交易记录表
-    for record in results[0].trade_records:
-        if record.pnl != 0:
-            record_data = {
-                'back_test_result_key': key,
-                'transaction_time': record.datetime,
-                'transaction_result': f"Price: {record.price}, Size: {record.size}, PnL: {record.pnl}",
-                'transaction_pnl': round(record.pnl, 2)
-            }
-            BacktestRecord.insert_or_update(record_data)
+    # 插入交易记录表, 整次回测的记录在一个事务内写入
+    record_data_list = [
+        {
+            'back_test_result_key': key,
+            'transaction_time': record.datetime,
+            'transaction_pnl': round(record.pnl, 2),
+            'transaction_price': record.price,
+            'transaction_size': record.size
+        }
+        for record in trade_records if record.pnl != 0
+    ]
+    BacktestRecord.bulk_insert(record_data_list)
+
+    # 完整交易明细保存为列式文件，供大结果集读取
+    if save_columnar:
+        backtest_result_store.save_trades(key, trade_records)
+
+    # 逐K线权益曲线
+    backtest_result_store.save_equity_curve(key, equity_curve)
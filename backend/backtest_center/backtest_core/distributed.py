@@ -0,0 +1,624 @@
+"""
+多机回测: 协调节点 + 工作节点
+
+进程池只能用满一台机器, 这里用标准库 HTTP 把参数扫描分发到多台机器:
+
+- 协调节点保存数据集(按 hash_dataframe 索引)与任务队列, 对外提供 HTTP 接口
+- 工作节点注册后批量拉取 (数据集hash, 策略, 参数) 任务, 本地没有的数据集按hash下载后缓存,
+  用向量化引擎回测并把指标推回协调节点
+- 任务以租约方式分配, 工作节点超时未回报时任务重新入队
+- 默认只监听本机; 监听其他地址时必须设置共享token, 请求头 X-Backtest-Token 不一致的请求返回401,
+  工作节点会按任务导入并执行信号函数, 不能对不受信任的网络开放
+
+接口(均为JSON, 数据集为npz二进制):
+    POST /register           {"host", "pid"} -> {"worker_id"}
+    POST /tasks              {"worker_id", "max_tasks"} -> {"tasks": [...], "shutdown": bool}
+    GET  /datasets/<hash>    -> npz
+    POST /results            {"worker_id", "results": [{"task_id", "result", "error", "elapsed_seconds"}]}
+    GET  /status             -> 队列与工作节点状态
+
+数据集与任务只能在协调节点进程内登记, 没有对外的提交接口; sweep 命令启动协调节点执行一次参数扫描,
+全部任务结束后写出结果并退出:
+    python -m backend.backtest_center.backtest_core.distributed sweep --data BTC-4H.csv \
+        --strategy backend.backtest_center.backtest_core.param_search:sma_trend_signals \
+        --params params.json --output results.json --host 0.0.0.0 --token <token>
+本机测试与吞吐量对比:
+    python -m backend.backtest_center.backtest_core.distributed bench --workers 1,2,4
+其他机器上启动工作节点:
+    python -m backend.backtest_center.backtest_core.distributed worker --url http://<协调节点>:8765 --token <token>
+token 也可以通过环境变量 BACKTEST_COORDINATOR_TOKEN 设置
+"""
+import argparse
+import hmac
+import importlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.backtest_cache import hash_dataframe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+TOKEN_HEADER = 'X-Backtest-Token'
+TOKEN_ENV = 'BACKTEST_COORDINATOR_TOKEN'
+# 租约超时后任务重新分配
+DEFAULT_LEASE_SECONDS = 60.0
+# 单个任务最多分配次数, 超过后记为失败
+MAX_ATTEMPTS = 3
+# 工作节点每次拉取的任务数, 摊薄HTTP往返开销
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_POLL_INTERVAL = 0.2
+HTTP_TIMEOUT = 30
+
+TASK_PENDING = 'pending'
+TASK_RUNNING = 'running'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+DATETIME_COLUMN = 'datetime'
+
+
+def encode_dataset(df: pd.DataFrame) -> bytes:
+    """数据集序列化为npz, 只保留数值列与datetime列"""
+    if DATETIME_COLUMN not in df.columns and df.index.name == DATETIME_COLUMN:
+        df = df.reset_index()
+    arrays = {}
+    for column in df.columns:
+        values = df[column]
+        if column == DATETIME_COLUMN:
+            arrays[column] = pd.to_datetime(values).values.astype('datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            arrays[column] = values.to_numpy()
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_dataset(raw: bytes) -> pd.DataFrame:
+    with np.load(io.BytesIO(raw), allow_pickle=False) as data:
+        return pd.DataFrame({name: data[name] for name in data.files})
+
+
+def resolve_callable(path: str) -> Callable:
+    """'package.module:function' 形式的路径解析为函数"""
+    module_name, _, attr = path.partition(':')
+    if not attr:
+        raise ValueError(f"Invalid strategy path: {path}, expected 'module:function'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def run_task(df: pd.DataFrame, task: dict) -> dict:
+    """
+    执行一个回测任务
+
+    Args:
+        df: 任务对应的数据集
+        task: 包含 strategy('module:function'信号函数), params, backtest_kwargs;
+            可选 bars 只回测最近 bars 根K线, 信号在其前 warmup_bars 根K线起计算
+
+    Returns:
+        dict: 绩效指标与期末权益
+    """
+    from backend.backtest_center.analysis.performance_metrics import compute_metrics
+    from backend.backtest_center.backtest_core.param_search import ENGINE_PARAMS
+    from backend.backtest_center.backtest_core.vectorized_engine import run_vectorized_backtest
+
+    params = task.get('params') or {}
+    signal_params = {k: v for k, v in params.items() if k not in ENGINE_PARAMS}
+    engine_params = {k: v for k, v in params.items() if k in ENGINE_PARAMS}
+    signal_fn = resolve_callable(task['strategy'])
+    bars = task.get('bars')
+    if bars is None:
+        signals = signal_fn(df.copy(), signal_params)
+    else:
+        bars = min(int(bars), len(df))
+        start = max(0, len(df) - bars - int(task.get('warmup_bars') or 0))
+        signals = signal_fn(df.iloc[start:].copy(), signal_params).iloc[-bars:]
+    result = run_vectorized_backtest(signals, **{**(task.get('backtest_kwargs') or {}), **engine_params})
+    metrics = compute_metrics(result.equity_curve, result.trades, result.initial_value).to_dict()
+    return {'final_value': result.final_value, 'metrics': metrics}
+
+
+class BacktestCoordinator:
+    """
+    协调节点: 数据集仓库 + 带租约的任务队列
+
+    同一进程内可直接调用 add_dataset / submit / wait / run_sweep, start 后工作节点通过HTTP访问
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, token: Optional[str] = None):
+        """
+        Args:
+            host: 监听地址, 非本机地址时必须设置 token
+            token: 共享token, 设置后所有请求都需要携带
+        """
+        self.host = host
+        self.port = port
+        self.lease_seconds = lease_seconds
+        self.token = token
+        self._datasets: Dict[str, bytes] = {}
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._pending: deque = deque()
+        self._workers: Dict[str, Dict[str, Any]] = {}
+        self._shutdown = False
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host = '127.0.0.1' if self.host in ('0.0.0.0', '') else self.host
+        return f'http://{host}:{self.port}'
+
+    def start(self) -> 'BacktestCoordinator':
+        """在后台线程启动HTTP服务, port为0时使用随机端口"""
+        if self.host not in LOOPBACK_HOSTS and not self.token:
+            raise ValueError(f"Coordinator on {self.host} requires a shared token")
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name='backtest-coordinator')
+        self._thread.start()
+        logger.info(f"BacktestCoordinator@start listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """通知工作节点退出并关闭HTTP服务"""
+        with self._lock:
+            self._shutdown = True
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def add_dataset(self, df: pd.DataFrame) -> str:
+        """登记数据集, 返回数据集hash"""
+        dataset_hash = hash_dataframe(df)
+        with self._lock:
+            if dataset_hash not in self._datasets:
+                self._datasets[dataset_hash] = encode_dataset(df)
+        return dataset_hash
+
+    def get_dataset(self, dataset_hash: str) -> Optional[bytes]:
+        return self._datasets.get(dataset_hash)
+
+    def submit(self, dataset_hash: str, strategy: str, params_list: Sequence[Dict[str, Any]],
+               backtest_kwargs: Optional[dict] = None) -> List[str]:
+        """
+        提交一组参数的回测任务
+
+        Args:
+            dataset_hash: add_dataset 返回的hash
+            strategy: 信号函数路径 'module:function', 签名同 param_search.SignalFn
+            params_list: 每个任务的参数
+            backtest_kwargs: 传给 run_vectorized_backtest 的固定参数
+
+        Returns:
+            List[str]: 任务id, 顺序与 params_list 一致
+        """
+        if dataset_hash not in self._datasets:
+            raise ValueError(f"Unknown dataset: {dataset_hash}")
+        task_ids = []
+        with self._lock:
+            for params in params_list:
+                task_id = uuid.uuid4().hex
+                self._tasks[task_id] = {
+                    'task_id': task_id,
+                    'dataset': dataset_hash,
+                    'strategy': strategy,
+                    'params': dict(params),
+                    'backtest_kwargs': backtest_kwargs or {},
+                    'status': TASK_PENDING,
+                    'worker_id': None,
+                    'leased_at': None,
+                    'attempts': 0,
+                    'result': None,
+                    'error': None,
+                    'elapsed_seconds': None,
+                }
+                self._pending.append(task_id)
+                task_ids.append(task_id)
+        return task_ids
+
+    def register_worker(self, host: str, pid: int) -> str:
+        worker_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._workers[worker_id] = {
+                'worker_id': worker_id,
+                'host': host,
+                'pid': pid,
+                'registered_at': now,
+                'last_seen': now,
+                'completed': 0,
+                'failed': 0,
+            }
+        logger.info(f"BacktestCoordinator@register worker {worker_id} from {host} pid {pid}")
+        return worker_id
+
+    def lease_tasks(self, worker_id: str, max_tasks: int) -> dict:
+        """分配最多 max_tasks 个任务给工作节点"""
+        now = time.time()
+        leased = []
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker['last_seen'] = now
+            self._requeue_expired(now)
+            while self._pending and len(leased) < max_tasks:
+                task = self._tasks[self._pending.popleft()]
+                if task['status'] != TASK_PENDING:
+                    continue
+                task.update(status=TASK_RUNNING, worker_id=worker_id, leased_at=now,
+                            attempts=task['attempts'] + 1)
+                leased.append({name: task[name] for name in
+                               ('task_id', 'dataset', 'strategy', 'params', 'backtest_kwargs')})
+            return {'tasks': leased, 'shutdown': self._shutdown}
+
+    def complete_tasks(self, worker_id: str, results: List[dict]) -> None:
+        """记录工作节点回报的结果, 已被重新分配并完成的任务忽略重复回报"""
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            for item in results:
+                task = self._tasks.get(item['task_id'])
+                if task is None or task['status'] in (TASK_DONE, TASK_FAILED):
+                    continue
+                task['elapsed_seconds'] = item.get('elapsed_seconds')
+                task['worker_id'] = worker_id
+                if item.get('error'):
+                    task['error'] = item['error']
+                    task['status'] = TASK_FAILED
+                else:
+                    task['result'] = item.get('result')
+                    task['status'] = TASK_DONE
+                if worker is not None:
+                    worker['completed' if task['status'] == TASK_DONE else 'failed'] += 1
+                    worker['last_seen'] = time.time()
+            self._done.notify_all()
+
+    def _requeue_expired(self, now: float) -> None:
+        """租约超时的任务重新入队, 超过最大次数记为失败"""
+        for task in self._tasks.values():
+            if task['status'] != TASK_RUNNING or now - task['leased_at'] < self.lease_seconds:
+                continue
+            if task['attempts'] >= MAX_ATTEMPTS:
+                task['status'] = TASK_FAILED
+                task['error'] = f"lease expired {task['attempts']} times"
+                self._done.notify_all()
+            else:
+                task['status'] = TASK_PENDING
+                self._pending.append(task['task_id'])
+
+    def wait(self, task_ids: Sequence[str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """等待任务结束, 超时抛出TimeoutError"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while True:
+                unfinished = [task_id for task_id in task_ids
+                              if self._tasks[task_id]['status'] not in (TASK_DONE, TASK_FAILED)]
+                if not unfinished:
+                    return [dict(self._tasks[task_id]) for task_id in task_ids]
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{len(unfinished)} of {len(task_ids)} tasks unfinished")
+                # 没有工作节点拉取时也要检查租约
+                self._done.wait(min(remaining, self.lease_seconds) if remaining is not None else self.lease_seconds)
+                self._requeue_expired(time.time())
+
+    def run_sweep(self, df: pd.DataFrame, strategy: str, params_list: Sequence[Dict[str, Any]],
+                  backtest_kwargs: Optional[dict] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """登记数据集、提交参数扫描并等待全部完成"""
+        dataset_hash = self.add_dataset(df)
+        return self.wait(self.submit(dataset_hash, strategy, params_list, backtest_kwargs), timeout=timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = {status: 0 for status in (TASK_PENDING, TASK_RUNNING, TASK_DONE, TASK_FAILED)}
+            for task in self._tasks.values():
+                counts[task['status']] += 1
+            return {
+                'tasks': counts,
+                'datasets': list(self._datasets.keys()),
+                'workers': [dict(worker) for worker in self._workers.values()],
+                'shutdown': self._shutdown,
+            }
+
+
+def _make_handler(coordinator: BacktestCoordinator):
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            logger.debug(f"BacktestCoordinator@http {self.address_string()} {format % args}")
+
+        def _send(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, data: dict, status: int = 200) -> None:
+            self._send(status, json.dumps(data, default=_json_default).encode('utf-8'))
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _authorized(self) -> bool:
+            if not coordinator.token:
+                return True
+            if hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), coordinator.token):
+                return True
+            self._send_json({'success': False, 'message': 'invalid token'}, 401)
+            return False
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == '/status':
+                return self._send_json(coordinator.status())
+            if self.path.startswith('/datasets/'):
+                raw = coordinator.get_dataset(self.path[len('/datasets/'):])
+                if raw is None:
+                    return self._send_json({'success': False, 'message': 'dataset not found'}, 404)
+                return self._send(200, raw, 'application/octet-stream')
+            self._send_json({'success': False, 'message': 'not found'}, 404)
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            try:
+                body = self._read_json()
+                if self.path == '/register':
+                    return self._send_json({'worker_id': coordinator.register_worker(body.get('host', ''),
+                                                                                     body.get('pid', 0))})
+                if self.path == '/tasks':
+                    return self._send_json(coordinator.lease_tasks(body['worker_id'],
+                                                                   int(body.get('max_tasks', 1))))
+                if self.path == '/results':
+                    coordinator.complete_tasks(body['worker_id'], body.get('results', []))
+                    return self._send_json({'success': True})
+                self._send_json({'success': False, 'message': 'not found'}, 404)
+            except Exception as e:
+                logger.error(f"BacktestCoordinator@http {self.path} error: {e}")
+                self._send_json({'success': False, 'message': str(e)}, 400)
+
+    return CoordinatorHandler
+
+
+class BacktestWorker:
+    """工作节点: 拉取任务, 按hash缓存数据集, 回测后推送结果"""
+
+    def __init__(self, url: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, idle_exit_seconds: Optional[float] = None,
+                 token: Optional[str] = None):
+        """
+        Args:
+            url: 协调节点地址
+            token: 协调节点的共享token
+            batch_size: 每次拉取的任务数
+            poll_interval: 队列为空时的轮询间隔
+            idle_exit_seconds: 连续空闲超过该时长后退出, 为None时一直运行到协调节点关闭
+        """
+        self.url = url.rstrip('/')
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.idle_exit_seconds = idle_exit_seconds
+        self.token = token
+        self.worker_id: Optional[str] = None
+        self._datasets: Dict[str, pd.DataFrame] = {}
+
+    def _request(self, method: str, path: str, data: Optional[dict] = None) -> bytes:
+        body = None if data is None else json.dumps(data, default=_json_default).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        request = urllib.request.Request(f'{self.url}{path}', data=body, method=method, headers=headers)
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return response.read()
+
+    def _post(self, path: str, data: dict) -> dict:
+        return json.loads(self._request('POST', path, data))
+
+    def register(self) -> str:
+        self.worker_id = self._post('/register', {'host': socket.gethostname(), 'pid': os.getpid()})['worker_id']
+        return self.worker_id
+
+    def get_dataset(self, dataset_hash: str) -> pd.DataFrame:
+        """本地没有时从协调节点下载"""
+        df = self._datasets.get(dataset_hash)
+        if df is None:
+            df = decode_dataset(self._request('GET', f'/datasets/{dataset_hash}'))
+            self._datasets[dataset_hash] = df
+        return df
+
+    def execute(self, task: dict) -> dict:
+        begin = time.perf_counter()
+        try:
+            result, error = run_task(self.get_dataset(task['dataset']), task), None
+        except Exception as e:
+            result, error = None, f'{type(e).__name__}: {e}'
+        return {'task_id': task['task_id'], 'result': result, 'error': error,
+                'elapsed_seconds': time.perf_counter() - begin}
+
+    def run(self) -> int:
+        """主循环, 返回完成的任务数"""
+        if self.worker_id is None:
+            self.register()
+        completed = 0
+        idle_since = time.time()
+        while True:
+            try:
+                reply = self._post('/tasks', {'worker_id': self.worker_id, 'max_tasks': self.batch_size})
+            except (urllib.error.URLError, ConnectionError):
+                # 协调节点已关闭
+                break
+            tasks = reply.get('tasks', [])
+            if not tasks:
+                if reply.get('shutdown'):
+                    break
+                if self.idle_exit_seconds is not None and time.time() - idle_since > self.idle_exit_seconds:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            results = [self.execute(task) for task in tasks]
+            try:
+                self._post('/results', {'worker_id': self.worker_id, 'results': results})
+            except (urllib.error.URLError, ConnectionError) as e:
+                # 协调节点已关闭; 仍在运行时这批任务租约到期后会重新分配
+                logger.warning(f"BacktestWorker@run worker {self.worker_id} failed to report "
+                               f"{len(results)} results: {e}")
+                break
+            completed += len(results)
+            idle_since = time.time()
+        logger.info(f"BacktestWorker@run worker {self.worker_id} exit after {completed} tasks")
+        return completed
+
+
+def run_worker(url: str, batch_size: int = DEFAULT_BATCH_SIZE, idle_exit_seconds: Optional[float] = None,
+               token: Optional[str] = None) -> int:
+    return BacktestWorker(url, batch_size=batch_size, idle_exit_seconds=idle_exit_seconds, token=token).run()
+
+
+def start_local_workers(url: str, count: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                        token: Optional[str] = None) -> List[multiprocessing.Process]:
+    """在本机启动工作进程, 用于测试"""
+    ctx = multiprocessing.get_context('spawn')
+    processes = []
+    for _ in range(count):
+        process = ctx.Process(target=run_worker, args=(url, batch_size, None, token), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def _bench(worker_counts: List[int], n_tasks: int, n_bars: int) -> None:
+    """本机多工作进程吞吐量对比"""
+    from backend.backtest_center.backtest_core.param_search import sma_trend_signals
+    from backend.benchmark_center.synthetic_data import generate_ohlcv
+
+    df = generate_ohlcv(n_bars, freq='4h', regime_switch_prob=0.005, seed=7)
+    rng = np.random.default_rng(0)
+    params_list = [{'fast': int(rng.integers(5, 50)), 'slow': int(rng.integers(60, 200)),
+                    'stop_window': int(rng.integers(5, 60)), 'stop_buffer': float(rng.uniform(0.001, 0.05))}
+                   for _ in range(n_tasks)]
+    strategy = f'{sma_trend_signals.__module__}:{sma_trend_signals.__name__}'
+    base = None
+    for count in worker_counts:
+        coordinator = BacktestCoordinator(host='127.0.0.1', port=0).start()
+        processes = start_local_workers(coordinator.url, count)
+        # 预热: 工作进程导入与数据集下载不计入吞吐量
+        coordinator.run_sweep(df, strategy, params_list[:count * DEFAULT_BATCH_SIZE])
+        begin = time.perf_counter()
+        results = coordinator.run_sweep(df, strategy, params_list)
+        elapsed = time.perf_counter() - begin
+        coordinator.stop()
+        for process in processes:
+            process.join(timeout=10)
+        failed = sum(task['status'] == TASK_FAILED for task in results)
+        throughput = n_tasks / elapsed
+        base = base or throughput
+        print(f'workers={count} tasks={n_tasks} bars={n_bars} elapsed={elapsed:.2f}s '
+              f'throughput={throughput:.1f}/s speedup={throughput / base:.2f}x failed={failed}')
+
+
+def _sweep(args) -> None:
+    """启动协调节点执行一次参数扫描, 等待工作节点完成全部任务后写出结果"""
+    with open(args.params, encoding='utf-8') as f:
+        params_list = json.load(f)
+    if not isinstance(params_list, list):
+        raise ValueError(f"{args.params} must contain a list of parameter dicts")
+    backtest_kwargs = json.loads(args.backtest_kwargs) if args.backtest_kwargs else None
+    df = pd.read_csv(args.data)
+
+    coordinator = BacktestCoordinator(args.host, args.port, token=args.token).start()
+    processes = start_local_workers(coordinator.url, args.local_workers, token=args.token) \
+        if args.local_workers else []
+    print(f'coordinator listening on {coordinator.url}, {len(params_list)} tasks')
+    try:
+        tasks = coordinator.run_sweep(df, args.strategy, params_list, backtest_kwargs, timeout=args.timeout)
+    finally:
+        coordinator.stop()
+        for process in processes:
+            process.join(timeout=10)
+
+    results = [{name: task[name] for name in ('params', 'status', 'result', 'error', 'elapsed_seconds')}
+               for task in tasks]
+    failed = sum(task['status'] == TASK_FAILED for task in tasks)
+    print(f'sweep finished: {len(tasks) - failed} done, {failed} failed')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, default=_json_default, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(results, default=_json_default, ensure_ascii=False))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='多机回测协调节点/工作节点')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sweep_parser = sub.add_parser('sweep', help='启动协调节点执行一次参数扫描, 完成后退出')
+    sweep_parser.add_argument('--data', required=True, help='K线csv')
+    sweep_parser.add_argument('--strategy', required=True, help="信号函数 'module:function'")
+    sweep_parser.add_argument('--params', required=True, help='参数列表json文件, 每个元素为一个任务的参数')
+    sweep_parser.add_argument('--backtest-kwargs', default=None, help='传给 run_vectorized_backtest 的固定参数, json')
+    sweep_parser.add_argument('--output', default=None, help='结果json路径, 为空时输出到标准输出')
+    sweep_parser.add_argument('--host', default=DEFAULT_HOST)
+    sweep_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    sweep_parser.add_argument('--token', default=os.getenv(TOKEN_ENV), help='共享token, 监听非本机地址时必填')
+    sweep_parser.add_argument('--local-workers', type=int, default=0, help='同时在本机启动的工作进程数')
+    sweep_parser.add_argument('--timeout', type=float, default=None)
+    worker_parser = sub.add_parser('worker', help='启动工作节点')
+    worker_parser.add_argument('--url', required=True)
+    worker_parser.add_argument('--token', default=os.getenv(TOKEN_ENV))
+    worker_parser.add_argument('--processes', type=int, default=1)
+    worker_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    bench_parser = sub.add_parser('bench', help='本机多工作进程吞吐量测试')
+    bench_parser.add_argument('--workers', default='1,2,4')
+    bench_parser.add_argument('--tasks', type=int, default=400)
+    bench_parser.add_argument('--bars', type=int, default=20000)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'sweep':
+        _sweep(args)
+    elif args.command == 'worker':
+        if args.processes == 1:
+            run_worker(args.url, args.batch_size, token=args.token)
+        else:
+            for process in start_local_workers(args.url, args.processes, args.batch_size, args.token):
+                process.join()
+    else:
+        _bench([int(n) for n in args.workers.split(',')], args.tasks, args.bars)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+增量回测
+
+数据每天刷新后不必重跑全部历史: 每个key保存最后一根K线收盘后的撮合状态(现金、持仓、持仓成本、
+待成交入场单、止损价), 数据增长时只在新K线上继续撮合, 再由合并后的权益曲线与交易数组重新计算指标。
+
+策略信号在新K线前 warmup_bars 根K线起的窗口上重新计算, 代替保存指标内部状态;
+窗口上重算的最后一根已回测K线的信号与保存的不一致时说明窗口不够长, 会退回全量回测。
+已回测部分的数据被改写(最后一根K线的收盘价变化)或策略源码、回测参数变化时同样退回全量回测。
+
+    python -m backend.backtest_center.backtest_core.incremental        # 所有生效的策略实例
+    python -m backend.backtest_center.backtest_core.incremental 8 9
+"""
+import argparse
+import json
+import logging
+import math
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.analysis.performance_metrics import build_backtest_results
+from backend.backtest_center.analyzers.equity_curve import build_equity_curve
+from backend.backtest_center.backtest_core.backtest_cache import build_fingerprint
+from backend.backtest_center.backtest_core.result_store import BacktestResultStore, TRADES_FILE, \
+    backtest_result_store
+from backend.backtest_center.backtest_core.vectorized_engine import EngineState, VectorizedBacktestResult, \
+    run_vectorized_backtest
+from backend.backtest_center.models.backtest_result import BacktestResults
+from backend.data_object_center.backtest_record import BacktestRecord
+from backend.data_object_center.st_instance import StrategyInstance
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'engine_state.json'
+# 状态文件格式版本, 撮合规则变化时递增使旧状态失效
+STATE_VERSION = 1
+SHADOW_KEY_PREFIX = 'SHADOW_'
+# 重新计算信号时在新K线前多取的K线数
+DEFAULT_WARMUP_BARS = 500
+
+# 合并时保留的权益曲线字段, 回撤由合并后的曲线重新计算
+CURVE_FIELDS = ('datetime', 'equity', 'cash', 'position')
+
+MODE_FULL = 'full'
+MODE_INCREMENTAL = 'incremental'
+MODE_UNCHANGED = 'unchanged'
+
+# K线数据 -> 含 entry_sig, sell_price 的信号数据
+SignalFn = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def _concat_arrays(old: Optional[Dict[str, np.ndarray]], new: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if not old:
+        return new
+    if not new:
+        return old
+    return {name: np.concatenate([old[name], new[name]]) for name in old}
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _same_float(a: float, b: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+
+class IncrementalBacktest:
+    """
+    按key保存撮合状态的可续跑回测
+
+    文件: results/<key>/engine_state.json, trades.npz, equity.npz
+    """
+
+    def __init__(self, key: str, signal_fn: SignalFn, config: Optional[dict] = None,
+                 store: BacktestResultStore = backtest_result_store, warmup_bars: int = DEFAULT_WARMUP_BARS,
+                 initial_cash: float = 100000.0, risk_percent: float = 2.0, commission: float = 0.001,
+                 max_position_size: float = 0.5):
+        """
+        Args:
+            key: 回测key
+            signal_fn: 由K线数据生成信号的函数
+            config: 决定回测结果的其余配置(策略code、源码哈希等), 变化时全量重跑
+            store: 结果文件目录
+            warmup_bars: 重新计算信号时在新K线前多取的K线数
+        """
+        self.key = key
+        self.signal_fn = signal_fn
+        self.store = store
+        self.warmup_bars = warmup_bars
+        self.backtest_kwargs = {
+            'initial_cash': initial_cash,
+            'risk_percent': risk_percent,
+            'commission': commission,
+            'max_position_size': max_position_size,
+        }
+        self.fingerprint = build_fingerprint('', {}, {}, {'state_version': STATE_VERSION, **(config or {})},
+                                             self.backtest_kwargs)
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.store.key_dir(self.key), STATE_FILE)
+
+    def load_state(self) -> Optional[dict]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state: dict) -> None:
+        path = os.path.join(self.store.key_dir(self.key, create=True), STATE_FILE)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=_json_default)
+        os.replace(tmp_path, path)
+
+    def _resume_position(self, df: pd.DataFrame, saved: Optional[dict]) -> Optional[int]:
+        """
+        返回已回测的最后一根K线在 df 中的位置, 不能续跑时返回None
+
+        df 的 datetime 需为升序
+        """
+        if not saved or saved.get('fingerprint') != self.fingerprint:
+            return None
+        last_dt = np.datetime64(saved['last_datetime'], 's')
+        datetime_arr = df['datetime'].values.astype('datetime64[s]')
+        pos = int(np.searchsorted(datetime_arr, last_dt, side='left'))
+        if pos >= len(df) or datetime_arr[pos] != last_dt:
+            return None
+        if not _same_float(float(df['close'].iloc[pos]), saved['last_close']):
+            return None
+        return pos
+
+    def update(self, df: pd.DataFrame) -> dict:
+        """
+        用最新K线数据更新回测
+
+        Args:
+            df: 完整K线数据(包含已回测部分), datetime 升序
+
+        Returns:
+            dict: {'mode': full/incremental/unchanged, 'new_bars', 'results': BacktestResults.to_dict(),
+                   'engine_result': 本次撮合的 VectorizedBacktestResult, 只包含新K线上的交易}
+        """
+        df = df.reset_index(drop=True)
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        saved = self.load_state()
+        pos = self._resume_position(df, saved)
+        if pos is None:
+            return self._run_full(df, saved)
+        if pos == len(df) - 1:
+            return {'mode': MODE_UNCHANGED, 'new_bars': 0, 'results': saved['results']}
+
+        window = self.signal_fn(df.iloc[max(0, pos - self.warmup_bars):].copy())
+        window_dt = pd.to_datetime(window['datetime']).values.astype('datetime64[s]')
+        last_dt = np.datetime64(saved['last_datetime'], 's')
+        anchor = window[window_dt == last_dt]
+        if anchor.empty or int(anchor['entry_sig'].fillna(0).iloc[-1]) != saved['last_entry_sig'] \
+                or not _same_float(float(anchor['sell_price'].iloc[-1]),
+                                   math.nan if saved['last_sell_price'] is None else saved['last_sell_price']):
+            logger.warning(f"IncrementalBacktest@update {self.key}: signals at {saved['last_datetime']} "
+                           f"differ after recompute, warmup {self.warmup_bars} bars too short, running full")
+            return self._run_full(df, saved)
+
+        new_signals = window[window_dt > last_dt]
+        if new_signals.empty:
+            return {'mode': MODE_UNCHANGED, 'new_bars': 0, 'results': saved['results']}
+        engine_state = EngineState.from_dict(saved['engine'])
+        result = run_vectorized_backtest(new_signals, state=engine_state, **self.backtest_kwargs)
+        trades = _concat_arrays(self.store.load_trades(self.key), result.trades)
+        old_curve = self.store.load_equity_curve(self.key)
+        curve = _concat_arrays({name: old_curve[name] for name in CURVE_FIELDS} if old_curve else None,
+                               {name: result.equity_curve[name] for name in CURVE_FIELDS})
+        curve = build_equity_curve(curve['datetime'], curve['equity'], curve['cash'], curve['position'])
+        entry_signals = saved['entry_signals'] + result.entry_signal_count
+        sell_signals = saved['sell_signals'] + result.sell_signal_count
+        backtest_results = build_backtest_results(curve, trades, self.backtest_kwargs['initial_cash'],
+                                                  entry_signals, sell_signals, self.key)
+        self._persist(new_signals, engine_state, trades, curve, backtest_results)
+        return {'mode': MODE_INCREMENTAL, 'new_bars': len(new_signals), 'results': backtest_results.to_dict(),
+                'engine_result': result}
+
+    def _run_full(self, df: pd.DataFrame, saved: Optional[dict]) -> dict:
+        signals = self.signal_fn(df.copy())
+        engine_state = EngineState(cash=self.backtest_kwargs['initial_cash'])
+        result = run_vectorized_backtest(signals, state=engine_state, **self.backtest_kwargs)
+        backtest_results = result.to_backtest_results(self.key)
+        self._persist(signals, engine_state, result.trades, result.equity_curve, backtest_results)
+        if saved is not None:
+            logger.info(f"IncrementalBacktest@update {self.key}: state invalidated, ran full history")
+        return {'mode': MODE_FULL, 'new_bars': len(signals), 'results': backtest_results.to_dict(),
+                'engine_result': result}
+
+    def _persist(self, signals: pd.DataFrame, engine_state: EngineState, trades: Dict[str, np.ndarray],
+                 curve: Dict[str, np.ndarray], backtest_results: BacktestResults) -> None:
+        if trades:
+            self.store.save_arrays(self.key, TRADES_FILE, trades)
+        self.store.save_equity_curve(self.key, curve)
+        last = signals.iloc[-1]
+        self._save_state({
+            'version': STATE_VERSION,
+            'fingerprint': self.fingerprint,
+            'engine': engine_state.to_dict(),
+            'bars': int(curve['equity'].shape[0]),
+            'last_datetime': str(pd.Timestamp(last['datetime']).to_datetime64().astype('datetime64[s]')),
+            'last_close': float(last['close']),
+            'last_entry_sig': int(0 if pd.isna(last['entry_sig']) else last['entry_sig']),
+            'last_sell_price': None if pd.isna(last['sell_price']) else float(last['sell_price']),
+            'entry_signals': int(backtest_results.total_entry_signals),
+            'sell_signals': int(backtest_results.total_sell_signals),
+            'results': backtest_results.to_dict(),
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        })
+
+
+def shadow_key(st: StrategyInstance) -> str:
+    """影子回测使用固定key, 每次更新覆盖同一条回测结果"""
+    return f'{SHADOW_KEY_PREFIX}{st.trade_pair}_ST{st.id}'
+
+
+def run_shadow_backtest(st_instance_id: int, filter_time_frame: Optional[str] = None,
+                        warmup_bars: int = DEFAULT_WARMUP_BARS, apply_filters: bool = False) -> dict:
+    """
+    更新策略实例的影子回测并写入回测结果表
+
+    只有新产生的交易写入交易记录表, 回测结果表按key更新
+
+    Returns:
+        dict: mode, new_bars, key 与 BacktestResults.to_dict()
+    """
+    from backend.backtest_center.backtest_main import BACKTEST_START_TIME, COMMISSION, INITIAL_CASH, \
+        RISK_PERCENT, check_filter_options, get_filter_codes, load_kline_df, prepare_signals, registry
+    from backend.backtest_center.backtest_core.backtest_system import print_results, record_backtest_results
+
+    check_filter_options(filter_time_frame, apply_filters)
+    st = StrategyInstance.get_st_instance_by_id(st_instance_id)
+    if st is None:
+        raise ValueError(f"Strategy instance {st_instance_id} not found")
+    filter_codes = get_filter_codes(st) if apply_filters else []
+    codes = [code for code in [st.entry_st_code, st.exit_st_code] + filter_codes if code]
+    config = {
+        'codes': {'entry': st.entry_st_code, 'exit': st.exit_st_code, 'filter': st.filter_st_code},
+        'sources': {code: registry.get_source_hash(code) for code in codes},
+        'start_time': BACKTEST_START_TIME,
+        'apply_filters': apply_filters,
+        'filter_time_frame': filter_time_frame,
+    }
+    key = shadow_key(st)
+    backtest = IncrementalBacktest(key, lambda df: prepare_signals(df, st, filter_time_frame, apply_filters),
+                                   config=config,
+                                   warmup_bars=warmup_bars, initial_cash=INITIAL_CASH, risk_percent=RISK_PERCENT,
+                                   commission=COMMISSION)
+    update = backtest.update(load_kline_df(st.trade_pair, st.time_frame))
+    if update['mode'] != MODE_UNCHANGED:
+        results = BacktestResults(**update['results'])
+        engine_result: VectorizedBacktestResult = update['engine_result']
+        curve = backtest.store.load_equity_curve(key)
+        if update['mode'] == MODE_FULL:
+            # 全量重跑时旧的交易记录已失效
+            BacktestRecord.delete_by_key(key)
+        record_backtest_results(results, engine_result.to_trade_records(), curve, st, key, save_columnar=False)
+        print_results(results)
+    logger.info(f"run_shadow_backtest@{key}: {update['mode']}, {update['new_bars']} new bars")
+    return {'mode': update['mode'], 'new_bars': update['new_bars'], 'key': key, **update['results']}
+
+
+def refresh_shadow_backtests(st_instance_ids: Optional[List[int]] = None) -> List[dict]:
+    """更新所有生效策略实例(或指定实例)的影子回测, 单个实例失败不影响其他实例"""
+    if st_instance_ids is None:
+        st_instance_ids = [st.id for st in StrategyInstance.get_all_active()]
+    summaries = []
+    for st_instance_id in st_instance_ids:
+        try:
+            summaries.append(run_shadow_backtest(st_instance_id))
+        except Exception as e:
+            logger.error(f"refresh_shadow_backtests@{st_instance_id} failed: {e}")
+            summaries.append({'strategy_id': st_instance_id, 'error': str(e)})
+    return summaries
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='incremental shadow backtests for strategy instances')
+    parser.add_argument('st_instance_ids', type=int, nargs='*')
+    args = parser.parse_args(argv)
+    from backend.data_object_center.init_db import migrate_db
+
+    migrate_db()
+    for summary in refresh_shadow_backtests(args.st_instance_ids or None):
+        print(json.dumps({k: summary.get(k) for k in ('key', 'mode', 'new_bars', 'final_value', 'error')},
+                         default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.timeframe_alignment import bar_close_times
+
+
+class IntrabarSimulator:
+    """
+    用低周期K线模拟交易周期K线内部的成交
+
+    预先用 searchsorted 计算每根交易周期K线对应的低周期区间 [start, end),
+    只有在止损单实际处于可触发状态的K线上才逐根扫描低周期数据, 其余K线不产生额外开销。
+    """
+
+    def __init__(self, coarse_open_times: np.ndarray, coarse_interval: str, fine_df: pd.DataFrame):
+        """
+        Args:
+            coarse_open_times: 交易周期K线开盘时间
+            coarse_interval: 交易周期, 如 '4H'
+            fine_df: 低周期K线, 需包含 datetime, open, low 列
+        """
+        coarse_open_times = np.asarray(coarse_open_times, dtype='datetime64[ns]')
+        fine_times = pd.to_datetime(fine_df['datetime']).values.astype('datetime64[ns]')
+        coarse_close_times = bar_close_times(coarse_open_times, coarse_interval)
+        self._start = np.searchsorted(fine_times, coarse_open_times, side='left').tolist()
+        self._end = np.searchsorted(fine_times, coarse_close_times, side='left').tolist()
+        self._open = fine_df['open'].to_numpy(dtype=np.float64).tolist()
+        self._low = fine_df['low'].to_numpy(dtype=np.float64).tolist()
+        # 实际下钻到低周期的K线数
+        self.drilldowns = 0
+
+    def has_data(self, i: int) -> bool:
+        """第i根交易周期K线是否有低周期数据"""
+        return self._start[i] < self._end[i]
+
+    def stop_fill(self, i: int, stop: float) -> Optional[float]:
+        """
+        在第i根交易周期K线内部按时间顺序判断卖出止损单是否触发
+
+        低周期K线开盘价已低于止损价时按开盘价成交, 否则最低价触及时按止损价成交
+
+        Returns:
+            Optional[float]: 成交价, 未触发时为None
+        """
+        self.drilldowns += 1
+        open_, low = self._open, self._low
+        for j in range(self._start[i], self._end[i]):
+            if open_[j] <= stop:
+                return open_[j]
+            if low[j] <= stop:
+                return stop
+        return None
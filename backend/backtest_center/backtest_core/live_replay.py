@@ -0,0 +1,336 @@
+"""
+实盘策略回放
+
+按时间逐根K线把历史数据喂给策略的实盘分支(注册函数传入策略实例时执行的 *_live 实现),
+并与回测分支生成的信号及向量化回测的持仓逐根对比。实盘csv的最后一行是未收盘K线, 回放第i根K线时
+窗口结束于第i根已收盘K线, 之后再带一行第i+1根K线作为未收盘K线, 与实盘读到的数据形状一致。
+
+    python -m backend.backtest_center.backtest_core.live_replay 8 --start 2024-01-01 --end 2025-01-01
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import time
+import warnings
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.vectorized_engine import run_vectorized_backtest
+from backend.data_object_center.enum_obj import EnumSide
+from backend.data_object_center.st_instance import StrategyInstance
+
+# 实盘分支每次只需要最近若干根K线
+DEFAULT_LOOKBACK = 60
+# 止损价相对误差超过该值记为不一致
+DEFAULT_PRICE_TOLERANCE = 1e-6
+# 报告中最多保留的不一致明细条数
+MAX_MISMATCH_DETAILS = 200
+
+
+class ReplayPriceCollector:
+    """回放时代替 OKXTickerService 计算下单数量, 不访问交易所, 直接返回传入的仓位"""
+
+    @staticmethod
+    def get_sz(instId: str, position: str) -> str:
+        return position
+
+
+@dataclass
+class ReplayOrderRecord:
+    """回放时代替 SwapAlgoOrderRecord, 退出策略只用到下单时间"""
+    create_time: str
+
+
+class ReplayWindow:
+    """
+    增量窗口视图
+
+    历史数据只在构造时整理一次, view(i) 返回截止第i+1根K线的尾部切片(不复制数据),
+    其中第i根为最后一根已收盘K线, 第i+1根充当未收盘K线; 每一步的开销与窗口长度有关, 与已回放的K线数无关。
+    """
+
+    def __init__(self, df: pd.DataFrame, lookback: int = DEFAULT_LOOKBACK):
+        self.df = df.reset_index(drop=True)
+        self.df['datetime'] = pd.to_datetime(self.df['datetime'])
+        self.lookback = lookback
+
+    def __len__(self):
+        return len(self.df)
+
+    def view(self, i: int, start: Optional[int] = None) -> pd.DataFrame:
+        """
+        第i根K线收盘后实盘可见的数据, 最后一行为未收盘K线(第i+1根)
+
+        Args:
+            i: 最后一根已收盘K线的下标, 不超过 len-2
+            start: 窗口起点, 不晚于 i-lookback+1, 用于退出策略需要从开仓K线起的数据
+        """
+        begin = max(0, i - self.lookback + 1)
+        if start is not None:
+            begin = min(begin, max(0, start))
+        return self.df.iloc[begin:i + 2]
+
+
+@contextlib.contextmanager
+def live_sandbox(*strategies: Callable):
+    """
+    回放期间替换策略模块中访问交易所的对象, 并屏蔽实盘分支逐根K线的打印
+
+    实盘分支通过模块级 price_collector 计算下单数量, 这里临时换成 ReplayPriceCollector
+    """
+    replaced = []
+    for strategy in strategies:
+        # 计算核策略的注册函数由框架生成, 需要取策略模块中的原函数
+        module_globals = getattr(inspect.unwrap(strategy), '__globals__', {})
+        if 'price_collector' in module_globals:
+            replaced.append((module_globals, module_globals['price_collector']))
+            module_globals['price_collector'] = ReplayPriceCollector()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings(), \
+                pd.option_context('mode.chained_assignment', None):
+            warnings.simplefilter('ignore')
+            yield
+    finally:
+        for module_globals, original in replaced:
+            module_globals['price_collector'] = original
+
+
+@dataclass
+class SignalDiff:
+    """实盘分支与回测分支在每根K线上的信号对比"""
+    column: str
+    live_count: int = 0
+    backtest_count: int = 0
+    matched: int = 0
+    live_only: List[str] = field(default_factory=list)
+    backtest_only: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            'column': self.column,
+            'live_count': self.live_count,
+            'backtest_count': self.backtest_count,
+            'matched': self.matched,
+            'live_only_count': len(self.live_only),
+            'backtest_only_count': len(self.backtest_only),
+            'live_only': self.live_only[:MAX_MISMATCH_DETAILS],
+            'backtest_only': self.backtest_only[:MAX_MISMATCH_DETAILS],
+        }
+
+
+@dataclass
+class StopDiff:
+    """持仓期间实盘分支计算的止损价与回测 sell_price 的对比"""
+    compared: int = 0
+    mismatched: int = 0
+    max_abs_diff: float = 0.0
+    mismatches: List[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            'compared': self.compared,
+            'mismatched': self.mismatched,
+            'max_abs_diff': self.max_abs_diff,
+            'mismatches': self.mismatches[:MAX_MISMATCH_DETAILS],
+        }
+
+
+@dataclass
+class LiveReplayReport:
+    """回放结果"""
+    strategy_id: Optional[int]
+    entry_st_code: str
+    exit_st_code: Optional[str]
+    bars: int
+    elapsed_seconds: float
+    signals: Dict[str, SignalDiff] = field(default_factory=dict)
+    stop: Optional[StopDiff] = None
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def consistent(self) -> bool:
+        signals_ok = all(not d.live_only and not d.backtest_only for d in self.signals.values())
+        stop_ok = self.stop is None or self.stop.mismatched == 0
+        return signals_ok and stop_ok and not self.errors
+
+    def to_dict(self) -> dict:
+        return {
+            'strategy_id': self.strategy_id,
+            'entry_st_code': self.entry_st_code,
+            'exit_st_code': self.exit_st_code,
+            'bars': self.bars,
+            'elapsed_seconds': self.elapsed_seconds,
+            'consistent': self.consistent,
+            'signals': {name: diff.to_dict() for name, diff in self.signals.items()},
+            'stop': self.stop.to_dict() if self.stop else None,
+            'errors': self.errors[:MAX_MISMATCH_DETAILS],
+        }
+
+
+def _bar_range(window: ReplayWindow, start: Optional[str], end: Optional[str]) -> range:
+    """需要回放的K线下标范围, 之前的K线只作为窗口历史"""
+    times = window.df['datetime']
+    first = int(times.searchsorted(pd.Timestamp(start), side='left')) if start else 0
+    last = int(times.searchsorted(pd.Timestamp(end), side='right')) if end else len(window)
+    # 实盘分支最少需要看到前几根K线; 最后一根K线只作为未收盘K线
+    return range(max(first, 3), min(last, len(window) - 1))
+
+
+def replay_entry(window: ReplayWindow, bars: range, entry_strategy: Callable, signal_df: pd.DataFrame,
+                 st: StrategyInstance, errors: List[str]) -> Dict[str, SignalDiff]:
+    """
+    逐根K线执行入场策略的实盘分支, 第i步实盘判断的是第i根已收盘K线, 与回测分支该K线的 entry_sig/exit_sig 对比
+
+    实盘分支返回 side=buy 的信号对应 entry_sig, side=sell 对应 exit_sig(多空双向策略)
+    """
+    diffs = {'entry_sig': SignalDiff('entry_sig')}
+    if 'exit_sig' in signal_df.columns:
+        diffs['exit_sig'] = SignalDiff('exit_sig')
+    expected = {name: signal_df[name].fillna(0).to_numpy() == 1 for name in diffs}
+    dates = window.df['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+
+    with live_sandbox(entry_strategy):
+        for i in bars:
+            try:
+                result = entry_strategy(window.view(i), st)
+            except Exception as e:
+                errors.append(f'{dates[i]} entry: {type(e).__name__}: {e}')
+                result = None
+            signal = bool(result is not None and result.signal)
+            side = getattr(result, 'side', None) if signal else None
+            for name, diff in diffs.items():
+                live = signal and (side == EnumSide.SELL.value) == (name == 'exit_sig')
+                backtest = bool(expected[name][i])
+                diff.live_count += live
+                diff.backtest_count += backtest
+                if live and backtest:
+                    diff.matched += 1
+                elif live:
+                    diff.live_only.append(dates[i])
+                elif backtest:
+                    diff.backtest_only.append(dates[i])
+    return diffs
+
+
+def replay_exit(window: ReplayWindow, bars: range, exit_strategy: Callable, signal_df: pd.DataFrame,
+                st: StrategyInstance, errors: List[str], tolerance: float = DEFAULT_PRICE_TOLERANCE) -> StopDiff:
+    """
+    在向量化回测的每根持仓K线上执行退出策略的实盘分支, 与回测分支的 sell_price 对比
+
+    第i根K线收盘后仍有持仓时, 实盘计算的止损价在第i+1根K线上生效, 与回测第i+1根K线的 sell_price 对比。
+    实盘分支以开仓时间定位持仓区间, 这里使用向量化回测中当前持仓第一笔买入的成交K线时间
+    """
+    result = run_vectorized_backtest(signal_df)
+    position = result.equity_curve['position'] if result.equity_curve else np.zeros(len(signal_df))
+    buy_times = result.trades['datetime'][result.trades['action'] > 0] if result.trades else np.empty(0)
+    times = window.df['datetime'].to_numpy().astype('datetime64[s]')
+    sell_price = signal_df['sell_price'].to_numpy(dtype=np.float64)
+    dates = window.df['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+
+    diff = StopDiff()
+    open_index = None
+    with live_sandbox(exit_strategy):
+        for i in bars:
+            if position[i] <= 0:
+                open_index = None
+                continue
+            if open_index is None:
+                # 当前K线之前(含)最近一次买入成交即为本次持仓的开仓
+                k = int(np.searchsorted(buy_times, times[i], side='right')) - 1
+                open_index = int(np.searchsorted(times, buy_times[k])) if k >= 0 else i
+            record = ReplayOrderRecord(create_time=str(window.df['datetime'].iat[open_index]))
+            try:
+                live = exit_strategy(window.view(i, start=open_index), st, algoOrdRecord=record)
+                live_price = float(live.stop_loss_price) if live.stop_loss_price not in (None, '') else np.nan
+            except Exception as e:
+                errors.append(f'{dates[i]} exit: {type(e).__name__}: {e}')
+                continue
+            expected = sell_price[i + 1]
+            diff.compared += 1
+            if np.isnan(live_price) and np.isnan(expected):
+                continue
+            abs_diff = abs(live_price - expected)
+            if np.isnan(abs_diff) or abs_diff > tolerance * max(abs(expected), 1.0):
+                diff.mismatched += 1
+                diff.max_abs_diff = max(diff.max_abs_diff, float(abs_diff) if not np.isnan(abs_diff) else np.inf)
+                diff.mismatches.append({'datetime': dates[i + 1], 'live': live_price, 'backtest': float(expected)})
+    return diff
+
+
+def replay_strategy_instance(df: pd.DataFrame, st: StrategyInstance, start: Optional[str] = None,
+                             end: Optional[str] = None, lookback: int = DEFAULT_LOOKBACK,
+                             tolerance: float = DEFAULT_PRICE_TOLERANCE) -> LiveReplayReport:
+    """
+    回放一个策略实例的入场与退出策略
+
+    Args:
+        df: 带指标的K线数据, 与实盘读取的csv相同
+        st: 策略实例, 实盘分支会用到 trade_pair/time_frame/loss_per_trans 等字段
+        start: 回放起始时间, 之前的K线只作为窗口历史
+        end: 回放结束时间
+        lookback: 窗口长度
+        tolerance: 止损价相对误差
+
+    Returns:
+        LiveReplayReport: 对比结果
+    """
+    from backend.strategy_center.atom_strategy.strategy_registry import registry
+
+    begin = time.perf_counter()
+    window = ReplayWindow(df, lookback)
+    bars = _bar_range(window, start, end)
+    entry_strategy = registry.get_strategy(st.entry_st_code)
+    exit_strategy = registry.get_strategy(st.exit_st_code) if st.exit_st_code else None
+
+    # 回测分支在完整数据上一次性生成信号
+    with live_sandbox():
+        signal_df = entry_strategy(window.df.copy(), None)
+        if exit_strategy is not None:
+            signal_df = exit_strategy(signal_df, None)
+
+    errors: List[str] = []
+    signals = replay_entry(window, bars, entry_strategy, signal_df, st, errors)
+    stop = None
+    if exit_strategy is not None and 'sell_price' in signal_df.columns:
+        stop = replay_exit(window, bars, exit_strategy, signal_df, st, errors, tolerance)
+    return LiveReplayReport(
+        strategy_id=st.id,
+        entry_st_code=st.entry_st_code,
+        exit_st_code=st.exit_st_code,
+        bars=len(bars),
+        elapsed_seconds=time.perf_counter() - begin,
+        signals=signals,
+        stop=stop,
+        errors=errors,
+    )
+
+
+def run_live_replay(st_instance_id: int, start: Optional[str] = None, end: Optional[str] = None,
+                    lookback: int = DEFAULT_LOOKBACK) -> LiveReplayReport:
+    """读取策略实例与K线csv后回放"""
+    from backend.backtest_center.backtest_main import load_kline_df
+
+    st = StrategyInstance.get_st_instance_by_id(st_instance_id)
+    df = load_kline_df(st.trade_pair, st.time_frame)
+    return replay_strategy_instance(df, st, start=start, end=end, lookback=lookback)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='replay live strategy branches over history')
+    parser.add_argument('st_instance_id', type=int)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--lookback', type=int, default=DEFAULT_LOOKBACK)
+    args = parser.parse_args(argv)
+    report = run_live_replay(args.st_instance_id, start=args.start, end=args.end, lookback=args.lookback)
+    print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2, default=str))
+    return 0 if report.consistent else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,475 @@
+"""
+参数搜索
+
+网格扫描的回测次数随参数个数指数增长, 这里提供两种自适应搜索, 均基于向量化回测引擎:
+
+- successive halving: 大量随机配置先在最近一小段数据上回测, 每一轮只保留前 1/eta 进入更长的数据窗口,
+  最后一轮才使用完整历史
+- surrogate: 用高斯过程拟合已完成试验的得分, 按 UCB 选择下一组参数, 连续 patience 次没有提升时提前结束
+
+每次试验(参数、数据窗口、得分、指标、耗时)都会记录, 可保存到回测结果目录。
+"""
+import itertools
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.analysis.performance_metrics import compute_metrics
+from backend.backtest_center.backtest_core.result_store import backtest_result_store
+from backend.backtest_center.backtest_core.shared_data import SharedBacktestPool
+from backend.backtest_center.backtest_core.vectorized_engine import run_vectorized_backtest
+
+METHOD_SUCCESSIVE_HALVING = 'successive_halving'
+METHOD_SURROGATE = 'surrogate'
+SEARCH_METHODS = (METHOD_SUCCESSIVE_HALVING, METHOD_SURROGATE)
+
+# 这些参数传给回测引擎, 其余参数传给信号函数
+ENGINE_PARAMS = ('risk_percent', 'max_position_size')
+SEARCH_FILE = 'search_trials.json'
+
+# 信号函数: (K线数据, 参数) -> 包含 entry_sig 与 sell_price 的数据
+SignalFn = Callable[[pd.DataFrame, Dict[str, Any]], pd.DataFrame]
+
+
+@dataclass
+class IntParam:
+    low: int
+    high: int
+    step: int = 1
+
+    def values(self) -> List[int]:
+        return list(range(self.low, self.high + 1, self.step))
+
+    def sample(self, rng: np.random.Generator) -> int:
+        return int(rng.choice(self.values()))
+
+    def encode(self, value) -> float:
+        return (value - self.low) / (self.high - self.low) if self.high > self.low else 0.0
+
+
+@dataclass
+class FloatParam:
+    low: float
+    high: float
+    log: bool = False
+    # 网格扫描时的取值个数, 仅用于估算网格规模
+    grid_points: int = 10
+
+    def values(self) -> List[float]:
+        if self.log:
+            return np.geomspace(self.low, self.high, self.grid_points).tolist()
+        return np.linspace(self.low, self.high, self.grid_points).tolist()
+
+    def sample(self, rng: np.random.Generator) -> float:
+        if self.log:
+            return float(math.exp(rng.uniform(math.log(self.low), math.log(self.high))))
+        return float(rng.uniform(self.low, self.high))
+
+    def encode(self, value) -> float:
+        if self.high <= self.low:
+            return 0.0
+        if self.log:
+            return (math.log(value) - math.log(self.low)) / (math.log(self.high) - math.log(self.low))
+        return (value - self.low) / (self.high - self.low)
+
+
+@dataclass
+class ChoiceParam:
+    choices: Sequence[Any]
+
+    def values(self) -> List[Any]:
+        return list(self.choices)
+
+    def sample(self, rng: np.random.Generator):
+        return self.choices[int(rng.integers(len(self.choices)))]
+
+    def encode(self, value) -> float:
+        n = len(self.choices)
+        return self.choices.index(value) / (n - 1) if n > 1 else 0.0
+
+
+class ParamSpace:
+    """参数空间, 名称 -> IntParam / FloatParam / ChoiceParam"""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.params.keys())
+
+    def sample(self, rng: np.random.Generator) -> Dict[str, Any]:
+        return {name: param.sample(rng) for name, param in self.params.items()}
+
+    def encode(self, config: Dict[str, Any]) -> np.ndarray:
+        """参数映射到 [0, 1] 区间, 供代理模型使用"""
+        return np.array([param.encode(config[name]) for name, param in self.params.items()], dtype=np.float64)
+
+    def grid_size(self) -> int:
+        return int(np.prod([len(param.values()) for param in self.params.values()]))
+
+    def grid(self):
+        names = self.names
+        for values in itertools.product(*(self.params[name].values() for name in names)):
+            yield dict(zip(names, values))
+
+
+@dataclass
+class Trial:
+    """一次试验"""
+    trial_id: int
+    params: Dict[str, Any]
+    rung: int
+    bars: int
+    score: float
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def full_history(self) -> bool:
+        return self.metrics.get('_full_history', False)
+
+    def to_dict(self) -> dict:
+        return {
+            'trial_id': self.trial_id,
+            'params': self.params,
+            'rung': self.rung,
+            'bars': self.bars,
+            'score': None if math.isinf(self.score) or math.isnan(self.score) else self.score,
+            'metrics': {k: v for k, v in self.metrics.items() if not k.startswith('_')},
+            'elapsed_seconds': self.elapsed_seconds,
+            'error': self.error,
+        }
+
+
+@dataclass
+class SearchResult:
+    """搜索结果"""
+    method: str
+    metric: str
+    trials: List[Trial]
+    best: Optional[Trial]
+    full_backtests: int
+    bars_evaluated: int
+    grid_size: int
+    elapsed_seconds: float
+    key: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'method': self.method,
+            'metric': self.metric,
+            'best': self.best.to_dict() if self.best else None,
+            'full_backtests': self.full_backtests,
+            'bars_evaluated': self.bars_evaluated,
+            'grid_size': self.grid_size,
+            'trial_count': len(self.trials),
+            'elapsed_seconds': self.elapsed_seconds,
+            'key': self.key,
+            'trials': [trial.to_dict() for trial in self.trials],
+        }
+
+
+class BacktestObjective:
+    """
+    在数据的最近一段上回测一组参数并打分
+
+    信号在窗口起点前额外 warmup_bars 根K线上计算, 只统计窗口内的回测结果。
+    传入 pool 时 evaluate 经共享内存进程池并行回测一批参数, 信号函数必须能按 'module:function' 导入
+    """
+
+    def __init__(self, df: pd.DataFrame, signal_fn: SignalFn, metric: str = 'sharpe_ratio',
+                 min_trades: int = 5, warmup_bars: int = 100, backtest_kwargs: Optional[dict] = None,
+                 pool: Optional[SharedBacktestPool] = None):
+        self.df = df.reset_index(drop=True)
+        self.signal_fn = signal_fn
+        self.metric = metric
+        self.min_trades = min_trades
+        self.warmup_bars = warmup_bars
+        self.backtest_kwargs = backtest_kwargs or {}
+        self.pool = pool
+        self.strategy = callable_path(signal_fn) if pool is not None else None
+        self.trials: List[Trial] = []
+
+    def __call__(self, params: Dict[str, Any], bars: Optional[int] = None, rung: int = 0) -> Trial:
+        n = len(self.df)
+        bars = n if bars is None else min(bars, n)
+        start = n - bars
+        begin = time.perf_counter()
+        signal_params = {k: v for k, v in params.items() if k not in ENGINE_PARAMS}
+        engine_params = {k: v for k, v in params.items() if k in ENGINE_PARAMS}
+        try:
+            source = self.df.iloc[max(0, start - self.warmup_bars):].copy()
+            signals = self.signal_fn(source, signal_params).iloc[-bars:]
+            result = run_vectorized_backtest(signals, **{**self.backtest_kwargs, **engine_params})
+            metrics = compute_metrics(result.equity_curve, result.trades, result.initial_value).to_dict()
+            error = None
+        except Exception as e:
+            metrics, error = {}, f'{type(e).__name__}: {e}'
+        return self._record(params, bars, rung, metrics, error, time.perf_counter() - begin)
+
+    def evaluate(self, configs: Sequence[Dict[str, Any]], bars: Optional[int] = None, rung: int = 0) -> List[Trial]:
+        """同一窗口上回测一批参数, 有进程池时并行执行"""
+        if self.pool is None:
+            return [self(config, bars=bars, rung=rung) for config in configs]
+        n = len(self.df)
+        bars = n if bars is None else min(bars, n)
+        outputs = self.pool.run_sweep({'data': self.df}, self.strategy, [('data', config) for config in configs],
+                                      backtest_kwargs=self.backtest_kwargs, bars=bars, warmup_bars=self.warmup_bars)
+        return [self._record(config, bars, rung, output['result']['metrics'] if output['result'] else {},
+                             output['error'], output['elapsed_seconds'])
+                for config, output in zip(configs, outputs)]
+
+    def _record(self, params: Dict[str, Any], bars: int, rung: int, metrics: Dict[str, Any], error: Optional[str],
+                elapsed_seconds: float) -> Trial:
+        n = len(self.df)
+        score = metrics.get(self.metric)
+        # 短窗口上的最少交易数按长度折算
+        required = self.min_trades * bars / n
+        if error is not None or score is None or metrics['total_trades'] < required:
+            score = -math.inf
+        metrics['_full_history'] = bars == n
+        trial = Trial(trial_id=len(self.trials), params=dict(params), rung=rung, bars=bars, score=float(score),
+                      metrics=metrics, elapsed_seconds=elapsed_seconds, error=error)
+        self.trials.append(trial)
+        return trial
+
+
+def callable_path(fn: Callable) -> str:
+    """模块级函数 -> 'module:function', 供工作进程导入"""
+    module, name = getattr(fn, '__module__', None), getattr(fn, '__qualname__', '')
+    if not module or module == '__main__' or '.' in name or '<' in name:
+        raise ValueError(f"{fn!r} is not an importable module-level function")
+    return f'{module}:{name}'
+
+
+def _result(method: str, objective: BacktestObjective, space: ParamSpace, begin: float) -> SearchResult:
+    full = [trial for trial in objective.trials if trial.full_history]
+    scored = [trial for trial in full if not math.isinf(trial.score)]
+    return SearchResult(
+        method=method,
+        metric=objective.metric,
+        trials=objective.trials,
+        best=max(scored, key=lambda t: t.score) if scored else None,
+        full_backtests=len(full),
+        bars_evaluated=sum(trial.bars for trial in objective.trials),
+        grid_size=space.grid_size(),
+        elapsed_seconds=time.perf_counter() - begin,
+    )
+
+
+def successive_halving(objective: BacktestObjective, space: ParamSpace, n_configs: int = 81, eta: int = 3,
+                       min_bars: int = 200, seed: int = 0) -> SearchResult:
+    """
+    逐轮淘汰
+
+    第r轮使用最近 n/eta^(R-r) 根K线(不少于 min_bars), 每轮保留得分前 1/eta 的配置,
+    最后一轮在完整历史上评估剩下的约 eta 个配置。得分为 -inf(交易过少或出错)的配置不会晋级。
+
+    Args:
+        objective: 回测目标
+        space: 参数空间
+        n_configs: 初始随机配置数
+        eta: 每轮淘汰比例
+        min_bars: 最短数据窗口
+        seed: 随机种子
+    """
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2, got {eta}")
+    begin = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    n = len(objective.df)
+    # 整数计算 floor(log_eta(n_configs)) - 1, 浮点 log 在 eta 的整数次幂处可能少算一轮
+    rounds, size = -1, n_configs
+    while size >= eta:
+        size //= eta
+        rounds += 1
+    rounds = max(0, rounds)
+    configs = [space.sample(rng) for _ in range(n_configs)]
+    for rung in range(rounds + 1):
+        bars = n if rung == rounds else max(min_bars, int(n / eta ** (rounds - rung)))
+        if bars >= n:
+            bars = n
+        trials = objective.evaluate(configs, bars=bars, rung=rung)
+        if bars == n:
+            break
+        ranked = sorted((t for t in trials if not math.isinf(t.score)), key=lambda t: t.score, reverse=True)
+        keep = max(1, len(configs) // eta)
+        configs = [t.params for t in ranked[:keep]]
+        if not configs:
+            break
+    return _result(METHOD_SUCCESSIVE_HALVING, objective, space, begin)
+
+
+class GaussianProcess:
+    """RBF核高斯过程回归, 输入为 [0, 1] 区间的参数编码"""
+
+    def __init__(self, length_scale: float = 0.25, noise: float = 1e-3):
+        self.length_scale = length_scale
+        self.noise = noise
+
+    def _kernel(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        sq = np.square(a[:, None, :] - b[None, :, :]).sum(axis=2)
+        return np.exp(-sq / (2 * self.length_scale ** 2))
+
+    def fit(self, x: np.ndarray, y: np.ndarray) -> 'GaussianProcess':
+        self._x = x
+        self._mean = y.mean()
+        self._std = y.std() or 1.0
+        k = self._kernel(x, x) + self.noise * np.eye(x.shape[0])
+        self._chol = np.linalg.cholesky(k)
+        self._alpha = np.linalg.solve(self._chol.T, np.linalg.solve(self._chol, (y - self._mean) / self._std))
+        return self
+
+    def predict(self, x: np.ndarray):
+        k = self._kernel(x, self._x)
+        mean = k @ self._alpha
+        v = np.linalg.solve(self._chol, k.T)
+        var = np.clip(1.0 - np.square(v).sum(axis=0), 1e-12, None)
+        return mean * self._std + self._mean, np.sqrt(var) * self._std
+
+
+def surrogate_search(objective: BacktestObjective, space: ParamSpace, n_trials: int = 40, n_initial: int = 10,
+                     n_candidates: int = 512, kappa: float = 2.0, patience: int = 10,
+                     seed: int = 0) -> SearchResult:
+    """
+    代理模型搜索, 所有试验都使用完整历史
+
+    先随机评估 n_initial 组参数, 之后每次用高斯过程拟合已有得分,
+    在 n_candidates 组随机候选中选 UCB(均值 + kappa*标准差)最大的一组评估。
+    随机阶段结束后, 连续 patience 次没有刷新最好得分时提前结束。
+    """
+    begin = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    xs, ys = [], []
+    best, stale = -math.inf, 0
+    seen = set()
+    for i in range(n_trials):
+        if i < n_initial or len(ys) < 2:
+            config = space.sample(rng)
+        else:
+            y = np.array(ys)
+            # 无效配置按当前最差得分参与拟合, 避免模型反复选择
+            finite = np.isfinite(y)
+            y = np.where(finite, y, y[finite].min() if finite.any() else 0.0)
+            model = GaussianProcess().fit(np.array(xs), y)
+            candidates = [space.sample(rng) for _ in range(n_candidates)]
+            candidates = [c for c in candidates if json.dumps(c, sort_keys=True, default=str) not in seen] \
+                or candidates
+            mean, std = model.predict(np.array([space.encode(c) for c in candidates]))
+            config = candidates[int(np.argmax(mean + kappa * std))]
+        seen.add(json.dumps(config, sort_keys=True, default=str))
+        trial = objective(config)
+        xs.append(space.encode(config))
+        ys.append(trial.score)
+        if trial.score > best:
+            best, stale = trial.score, 0
+        elif i >= n_initial:
+            stale += 1
+            if stale >= patience:
+                break
+    return _result(METHOD_SURROGATE, objective, space, begin)
+
+
+def run_param_search(df: pd.DataFrame, signal_fn: SignalFn, space: ParamSpace,
+                     method: str = METHOD_SUCCESSIVE_HALVING, metric: str = 'sharpe_ratio', min_trades: int = 5,
+                     warmup_bars: int = 100, backtest_kwargs: Optional[dict] = None, name: Optional[str] = None,
+                     save: bool = True, max_workers: Optional[int] = None, **search_kwargs) -> SearchResult:
+    """
+    参数搜索入口
+
+    Args:
+        df: K线数据
+        signal_fn: 信号函数, 参数中 ENGINE_PARAMS 之外的部分传给它
+        space: 参数空间
+        method: successive_halving 或 surrogate
+        metric: 优化的指标, 见 PerformanceMetrics
+        min_trades: 完整历史上的最少交易数
+        warmup_bars: 指标预热K线数
+        backtest_kwargs: 传给 run_vectorized_backtest 的固定参数
+        name: 保存时的名称
+        save: 是否将全部试验保存到 results/SEARCH_<name>_<时间>/search_trials.json
+        max_workers: 大于1时 successive_halving 每一轮的配置经共享内存进程池并行回测,
+            signal_fn 必须是可导入的模块级函数; surrogate 逐个选择参数, 不使用进程池
+        search_kwargs: 透传给具体搜索方法
+
+    Returns:
+        SearchResult: 搜索结果
+    """
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unsupported search method: {method}, expected one of {SEARCH_METHODS}")
+    if method == METHOD_SURROGATE or not max_workers or max_workers <= 1:
+        objective = BacktestObjective(df, signal_fn, metric=metric, min_trades=min_trades, warmup_bars=warmup_bars,
+                                      backtest_kwargs=backtest_kwargs)
+        if method == METHOD_SURROGATE:
+            result = surrogate_search(objective, space, **search_kwargs)
+        else:
+            result = successive_halving(objective, space, **search_kwargs)
+    else:
+        with SharedBacktestPool(max_workers=max_workers) as pool:
+            objective = BacktestObjective(df, signal_fn, metric=metric, min_trades=min_trades,
+                                          warmup_bars=warmup_bars, backtest_kwargs=backtest_kwargs, pool=pool)
+            result = successive_halving(objective, space, **search_kwargs)
+    if save:
+        result.key = save_search_result(result, name or method)
+    return result
+
+
+def save_search_result(result: SearchResult, name: str) -> str:
+    key = f"SEARCH_{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    path = os.path.join(backtest_result_store.key_dir(key, create=True), SEARCH_FILE)
+    tmp_path = f'{path}.tmp'
+    result.key = key
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result.to_dict(), f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+    return key
+
+
+def load_search_result(key: str) -> Optional[dict]:
+    path = os.path.join(backtest_result_store.key_dir(key), SEARCH_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sma_trend_signals(df: pd.DataFrame, params: Dict[str, Any]) -> pd.DataFrame:
+    """
+    参数化示例信号: 快线上穿慢线入场, 止损为最近 stop_window 根K线最低价下方 stop_buffer
+
+    参数: fast, slow, stop_window, stop_buffer
+    """
+    close = df['close']
+    fast = close.rolling(int(params['fast'])).mean()
+    slow = close.rolling(int(params['slow'])).mean()
+    cross = (fast > slow) & (fast.shift(1) <= slow.shift(1))
+    df['entry_sig'] = cross.astype(np.int64)
+    df['entry_price'] = close
+    df['sell_sig'] = 0
+    df['sell_price'] = df['low'].rolling(int(params['stop_window'])).min() * (1 - params['stop_buffer'])
+    return df
+
+
+if __name__ == '__main__':
+    from backend.benchmark_center.synthetic_data import generate_ohlcv
+
+    data = generate_ohlcv(6000, freq='4h', regime_switch_prob=0.005, mean_reversion=0.0005, seed=7)
+    search_space = ParamSpace({
+        'fast': IntParam(5, 50),
+        'slow': IntParam(20, 200, 5),
+        'stop_window': IntParam(5, 60),
+        'stop_buffer': FloatParam(0.001, 0.05, log=True),
+        'risk_percent': FloatParam(0.5, 5.0),
+    })
+    for search_method in SEARCH_METHODS:
+        search = run_param_search(data, sma_trend_signals, search_space, method=search_method, save=False)
+        print(search_method, {k: v for k, v in search.to_dict().items() if k != 'trials'})
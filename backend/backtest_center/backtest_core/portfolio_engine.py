@@ -0,0 +1,297 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.analysis.performance_metrics import closed_trade_pnl, compute_metrics_batch
+from backend.backtest_center.analyzers.equity_curve import build_equity_curve
+from backend.backtest_center.backtest_core.result_store import ACTION_BUY, ACTION_SELL
+from backend.backtest_center.backtest_core.vectorized_engine import MIN_TRADE_RATIO
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'entry_sig', 'sell_price')
+
+
+@dataclass
+class SignalPanel:
+    """多品种信号面板, 每个字段为 (时间 × 品种) 数组, 品种在该时间没有K线时为NaN"""
+    datetime: np.ndarray
+    labels: List[str]
+    arrays: Dict[str, np.ndarray]
+
+    @property
+    def shape(self):
+        return self.arrays['close'].shape
+
+
+def build_signal_panel(frames: Dict[str, pd.DataFrame]) -> SignalPanel:
+    """
+    将各品种的信号数据按时间并集对齐为面板
+
+    Args:
+        frames: 标签 -> 包含 datetime 与 PANEL_FIELDS 列的信号数据
+
+    Returns:
+        SignalPanel: 信号面板
+    """
+    labels = list(frames.keys())
+    times = {label: pd.to_datetime(df['datetime']).values.astype('datetime64[s]') for label, df in frames.items()}
+    timeline = np.unique(np.concatenate(list(times.values()))) if times else np.empty(0, dtype='datetime64[s]')
+    arrays = {name: np.full((timeline.shape[0], len(labels)), np.nan) for name in PANEL_FIELDS}
+    for s, label in enumerate(labels):
+        rows = np.searchsorted(timeline, times[label])
+        df = frames[label]
+        for name in PANEL_FIELDS:
+            arrays[name][rows, s] = df[name].to_numpy(dtype=np.float64)
+    return SignalPanel(datetime=timeline, labels=labels, arrays=arrays)
+
+
+@dataclass
+class PortfolioBacktestResult:
+    """组合回测结果"""
+    labels: List[str]
+    initial_value: float
+    final_value: float
+    equity_curve: Dict[str, np.ndarray]
+    trades: Dict[str, np.ndarray]
+    # (时间 × 品种) 持仓市值
+    exposure: np.ndarray
+    # (时间 × 品种) 累计收益贡献, 各列之和 + 初始资金 = 组合权益
+    contribution: np.ndarray
+    limits: Dict[str, float] = field(default_factory=dict)
+
+    def drawdown_attribution(self) -> dict:
+        """
+        最大回撤区间内各品种的收益贡献, 以及各品种单独计算的最大回撤金额
+
+        分散系数 = 各品种单独最大回撤之和 / 组合最大回撤, 越接近1说明回撤越同步
+        """
+        equity = self.equity_curve['equity']
+        if equity.shape[0] == 0:
+            return {}
+        trough = int(np.argmax(self.equity_curve['drawdown']))
+        peak = int(np.argmax(equity[:trough + 1]))
+        portfolio_dd = float(equity[peak] - equity[trough])
+        contribution = self.contribution[trough] - self.contribution[peak]
+        standalone = (np.maximum.accumulate(self.contribution, axis=0) - self.contribution).max(axis=0)
+        return {
+            'peak_datetime': str(self.equity_curve['datetime'][peak]),
+            'trough_datetime': str(self.equity_curve['datetime'][trough]),
+            'max_drawdown_amount': portfolio_dd,
+            'contribution': dict(zip(self.labels, contribution.tolist())),
+            'standalone_max_drawdown_amount': dict(zip(self.labels, standalone.tolist())),
+            'diversification_ratio': float(standalone.sum() / portfolio_dd) if portfolio_dd > 0 else None,
+        }
+
+    def pnl_correlation(self) -> List[List[float]]:
+        """各品种逐K线收益贡献的相关系数矩阵"""
+        changes = np.diff(self.contribution, axis=0)
+        if changes.shape[0] < 2:
+            return np.eye(len(self.labels)).tolist()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.corrcoef(changes, rowvar=False)
+        corr = np.atleast_2d(np.nan_to_num(corr, nan=0.0))
+        np.fill_diagonal(corr, 1.0)
+        return corr.tolist()
+
+    def metrics(self) -> dict:
+        """组合权益曲线的绩效指标, 逐笔交易按品种分别配对后合并计算"""
+        pnl = [np.empty(0)]
+        if self.trades:
+            for s in range(len(self.labels)):
+                mask = self.trades['symbol'] == s
+                pnl.append(closed_trade_pnl({name: values[mask] for name, values in self.trades.items()}))
+        curve = self.equity_curve
+        position = self.exposure.sum(axis=1)
+        metrics = compute_metrics_batch(curve['equity'][None, :], [np.concatenate(pnl)], self.initial_value,
+                                        datetime_arr=curve['datetime'], position=position[None, :])
+        return {name: (None if np.isnan(values[0]) else float(values[0])) for name, values in metrics.items()}
+
+    def to_dict(self) -> dict:
+        equity = self.equity_curve['equity']
+        gross_exposure = self.exposure.sum(axis=1)
+        exposure_ratio = np.divide(gross_exposure, equity, out=np.zeros_like(equity), where=equity > 0)
+        per_symbol = {}
+        for s, label in enumerate(self.labels):
+            mask = (self.trades['symbol'] == s) & (self.trades['action'] == ACTION_SELL) if self.trades else None
+            pnl = self.trades['pnl'][mask] if self.trades else np.empty(0)
+            per_symbol[label] = {
+                'total_trades': int(pnl.shape[0]),
+                'winning_trades': int((pnl > 0).sum()),
+                'pnl': float(self.contribution[-1, s]) if self.contribution.shape[0] else 0.0,
+                'max_exposure': float(self.exposure[:, s].max()) if self.exposure.shape[0] else 0.0,
+            }
+        return {
+            'labels': self.labels,
+            'initial_value': self.initial_value,
+            'final_value': self.final_value,
+            'total_return': self.final_value / self.initial_value - 1,
+            'max_drawdown': float(self.equity_curve['drawdown'].max()) if equity.shape[0] else 0.0,
+            'max_gross_exposure_ratio': float(exposure_ratio.max()) if equity.shape[0] else 0.0,
+            'limits': self.limits,
+            'per_symbol': per_symbol,
+            'drawdown_attribution': self.drawdown_attribution(),
+            'pnl_correlation': self.pnl_correlation(),
+            'metrics': self.metrics(),
+        }
+
+
+def simulate_portfolio(panel: SignalPanel, initial_cash: float = 100000.0, risk_percent: float = 2.0,
+                       commission: float = 0.001, max_position_size: float = 0.5,
+                       max_gross_exposure: float = 1.0,
+                       max_open_positions: Optional[int] = None) -> PortfolioBacktestResult:
+    """
+    共享资金的多品种回测, 按时间顺序逐K线处理全部品种
+
+    单品种的撮合规则与 vectorized_engine.simulate_signals 相同, 区别在于:
+    - 所有品种共用一个现金账户, 仓位按组合权益计算
+    - 单品种持仓市值不超过 组合权益*max_position_size
+    - 全部持仓市值(含待成交入场单)不超过 组合权益*max_gross_exposure
+    - 同时持仓的品种数不超过 max_open_positions
+    - 同一时间多个品种同时出现信号时, 按 labels 顺序依次分配额度
+
+    Args:
+        panel: 信号面板
+        initial_cash: 初始资金
+        risk_percent: 单笔风险比例(%)
+        commission: 手续费率
+        max_position_size: 单品种最大仓位占组合权益比例
+        max_gross_exposure: 总持仓市值占组合权益比例上限
+        max_open_positions: 最大同时持仓品种数, 为空不限制
+
+    Returns:
+        PortfolioBacktestResult: 组合回测结果
+    """
+    n, n_symbols = panel.shape
+    open_rows = panel.arrays['open'].tolist()
+    low_rows = panel.arrays['low'].tolist()
+    close_rows = panel.arrays['close'].tolist()
+    sig_rows = panel.arrays['entry_sig'].tolist()
+    stop_rows = panel.arrays['sell_price'].tolist()
+    max_open = max_open_positions if max_open_positions is not None else n_symbols
+
+    equity = np.empty(n, dtype=np.float64)
+    cash_arr = np.empty(n, dtype=np.float64)
+    gross_arr = np.empty(n, dtype=np.float64)
+    exposure = np.zeros((n, n_symbols), dtype=np.float64)
+    contribution = np.zeros((n, n_symbols), dtype=np.float64)
+    trades = []
+
+    risk = risk_percent / 100
+    cash = initial_cash
+    pos = [0.0] * n_symbols
+    cost = [0.0] * n_symbols
+    realized = [0.0] * n_symbols
+    pending = [0.0] * n_symbols
+    stop = [math.nan] * n_symbols
+    last_close = [math.nan] * n_symbols
+    symbols = range(n_symbols)
+    for i in range(n):
+        o_row, l_row, c_row = open_rows[i], low_rows[i], close_rows[i]
+
+        # 开盘撮合: 入场市价单与上一根K线挂出的止损单
+        for s in symbols:
+            o = o_row[s]
+            if o != o:
+                continue
+            entry_filled = False
+            if pending[s] > 0:
+                size = pending[s]
+                value = size * o
+                comm = value * commission
+                if value + comm <= cash:
+                    cash -= value + comm
+                    pos[s] += size
+                    cost[s] += value
+                    realized[s] -= comm
+                    entry_filled = True
+                    trades.append((i, s, ACTION_BUY, o, size, value, comm, 0.0))
+                pending[s] = 0.0
+            if pos[s] > 0 and not entry_filled and stop[s] == stop[s]:
+                stop_price = stop[s]
+                fill = o if o <= stop_price else (stop_price if l_row[s] <= stop_price else None)
+                if fill is not None:
+                    value = pos[s] * fill
+                    comm = value * commission
+                    pnl = value - cost[s]
+                    cash += value - comm
+                    realized[s] += pnl - comm
+                    trades.append((i, s, ACTION_SELL, fill, -pos[s], value, comm, pnl))
+                    pos[s] = 0.0
+                    cost[s] = 0.0
+
+        # 收盘估值, 没有K线的品种沿用最近收盘价
+        gross = 0.0
+        open_count = 0
+        for s in symbols:
+            c = c_row[s]
+            if c == c:
+                last_close[s] = c
+            if pos[s] > 0:
+                position_value = pos[s] * last_close[s]
+                exposure[i, s] = position_value
+                contribution[i, s] = realized[s] + position_value - cost[s]
+                gross += position_value
+                open_count += 1
+            else:
+                contribution[i, s] = realized[s]
+        value_now = cash + gross
+        equity[i] = value_now
+        cash_arr[i] = cash
+        gross_arr[i] = gross
+
+        # 收盘决策: 入场信号在组合额度内分配, 止损价更新
+        reserved = 0.0
+        for s in symbols:
+            c = c_row[s]
+            if c != c:
+                continue
+            if sig_rows[i][s] == 1 and (pos[s] > 0 or open_count < max_open):
+                target = min(value_now * risk,
+                             value_now * max_position_size - exposure[i, s],
+                             value_now * max_gross_exposure - gross - reserved)
+                if target >= c * MIN_TRADE_RATIO:
+                    pending[s] = target / c
+                    reserved += target
+                    if pos[s] == 0:
+                        open_count += 1
+            stop[s] = stop_rows[i][s] if pos[s] > 0 else math.nan
+
+    trade_arrays = {}
+    if trades:
+        columns = list(zip(*trades))
+        trade_arrays = {
+            'datetime': panel.datetime[np.asarray(columns[0], dtype=np.int64)],
+            'symbol': np.asarray(columns[1], dtype=np.int16),
+            'action': np.asarray(columns[2], dtype=np.int8),
+            'price': np.asarray(columns[3], dtype=np.float64),
+            'size': np.asarray(columns[4], dtype=np.float64),
+            'value': np.asarray(columns[5], dtype=np.float64),
+            'commission': np.asarray(columns[6], dtype=np.float64),
+            'pnl': np.asarray(columns[7], dtype=np.float64),
+        }
+    return PortfolioBacktestResult(
+        labels=list(panel.labels),
+        initial_value=initial_cash,
+        final_value=float(equity[-1]) if n else initial_cash,
+        equity_curve=build_equity_curve(panel.datetime, equity, cash_arr, gross_arr),
+        trades=trade_arrays,
+        exposure=exposure,
+        contribution=contribution,
+        limits={
+            'max_position_size': max_position_size,
+            'max_gross_exposure': max_gross_exposure,
+            'max_open_positions': max_open,
+        },
+    )
+
+
+def run_portfolio_backtest(frames: Dict[str, pd.DataFrame], **kwargs) -> PortfolioBacktestResult:
+    """由各品种信号数据构造面板并执行组合回测, kwargs 透传给 simulate_portfolio"""
+    return simulate_portfolio(build_signal_panel(frames), **kwargs)
+
+
+def portfolio_labels(trade_pairs: Sequence[str], ids: Sequence[int]) -> List[str]:
+    """组合中每列的标签, 同一交易对可以对应多个策略实例"""
+    return [f'{pair}_ST{st_id}' for pair, st_id in zip(trade_pairs, ids)]
@@ -0,0 +1,209 @@
+import importlib.util
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.result_store import ACTION_BUY, BacktestResultStore, \
+    backtest_result_store
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = 'csv'
+FORMAT_PARQUET = 'parquet'
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_PARQUET)
+
+# 导出文件位于 results/<key>/export/ 下
+EXPORT_DIR = 'export'
+EXPORT_TRADES = 'trades'
+EXPORT_EQUITY = 'equity'
+EXPORT_SUMMARY = 'summary'
+EXPORT_NAMES = (EXPORT_TRADES, EXPORT_EQUITY, EXPORT_SUMMARY)
+
+EXPORT_STATUS_PENDING = 'pending'
+EXPORT_STATUS_DONE = 'done'
+EXPORT_STATUS_FAILED = 'failed'
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None or importlib.util.find_spec('fastparquet') is not None
+
+
+def check_export_format(fmt: str) -> None:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}, expected one of {EXPORT_FORMATS}")
+    if fmt == FORMAT_PARQUET and not parquet_available():
+        raise ValueError("Parquet export requires pyarrow or fastparquet")
+
+
+class BacktestResultExporter:
+    """
+    回测结果导出
+
+    从 BacktestResultStore 的列式文件生成 csv/parquet, 在后台线程中执行,
+    回测、参数扫描与回测任务本身只负责落列式文件, 不等待导出。
+
+    目录结构: results/<key>/export/trades.<fmt>, equity.<fmt>, summary.json
+    """
+
+    def __init__(self, store: BacktestResultStore = backtest_result_store, max_workers: int = 1):
+        self.store = store
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def export_dir(self, key: str, create: bool = False) -> str:
+        path = os.path.join(self.store.key_dir(key), EXPORT_DIR)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def export_path(self, key: str, name: str, fmt: str = FORMAT_CSV) -> str:
+        """导出文件路径, summary 固定为json"""
+        if name not in EXPORT_NAMES:
+            raise ValueError(f"Unsupported export file: {name}, expected one of {EXPORT_NAMES}")
+        if name != EXPORT_SUMMARY:
+            check_export_format(fmt)
+        suffix = 'json' if name == EXPORT_SUMMARY else fmt
+        return os.path.join(self.export_dir(key), f'{name}.{suffix}')
+
+    def submit(self, key: str, fmt: str = FORMAT_CSV) -> Future:
+        """提交后台导出, 立即返回"""
+        check_export_format(fmt)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='backtest-export')
+            self._status[key] = {
+                'key': key,
+                'format': fmt,
+                'status': EXPORT_STATUS_PENDING,
+                'files': [],
+                'error': None,
+                'finish_time': None,
+            }
+            future = self._executor.submit(self.export, key, fmt)
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return future
+
+    def get_status(self, key: str) -> Optional[Dict[str, Any]]:
+        """导出状态, 进程重启后根据已有文件判断"""
+        status = self._status.get(key)
+        if status is not None:
+            return dict(status)
+        files = self.list_files(key)
+        if not files:
+            return None
+        return {'key': key, 'format': None, 'status': EXPORT_STATUS_DONE, 'files': files, 'error': None,
+                'finish_time': None}
+
+    def list_files(self, key: str) -> List[str]:
+        path = self.export_dir(key)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if not name.endswith('.tmp'))
+
+    def _on_done(self, key: str, future: Future) -> None:
+        status = self._status.get(key)
+        if status is None:
+            return
+        if future.exception() is not None:
+            status['status'] = EXPORT_STATUS_FAILED
+            status['error'] = str(future.exception())
+            logger.error(f"BacktestResultExporter@export {key} failed: {status['error']}")
+        else:
+            status['status'] = EXPORT_STATUS_DONE
+            status['files'] = future.result()
+        status['finish_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def export(self, key: str, fmt: str = FORMAT_CSV) -> List[str]:
+        """
+        同步导出一次回测的交易明细、权益曲线与汇总
+
+        Args:
+            key: 回测key
+            fmt: csv 或 parquet
+
+        Returns:
+            List[str]: 生成的文件名
+        """
+        check_export_format(fmt)
+        trades = self.store.load_trades(key)
+        equity = self.store.load_equity_curve(key)
+        if trades is None and equity is None:
+            raise KeyError(f"Backtest results of {key} not found")
+        self.export_dir(key, create=True)
+
+        files = []
+        trades_df = trades_to_frame(trades)
+        self._write_frame(trades_df, self.export_path(key, EXPORT_TRADES, fmt), fmt)
+        files.append(f'{EXPORT_TRADES}.{fmt}')
+        if equity is not None:
+            self._write_frame(pd.DataFrame(equity), self.export_path(key, EXPORT_EQUITY, fmt), fmt)
+            files.append(f'{EXPORT_EQUITY}.{fmt}')
+
+        summary_path = self.export_path(key, EXPORT_SUMMARY)
+        tmp_path = f'{summary_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(build_summary(key, trades_df, equity), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, summary_path)
+        files.append(f'{EXPORT_SUMMARY}.json')
+        logger.info(f"BacktestResultExporter@export {key}: {files}")
+        return files
+
+    @staticmethod
+    def _write_frame(df: pd.DataFrame, path: str, fmt: str) -> None:
+        """先写临时文件再原子替换, 下载时不会读到写了一半的文件"""
+        tmp_path = f'{path}.tmp'
+        if fmt == FORMAT_PARQUET:
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def trades_to_frame(trades: Optional[Dict[str, np.ndarray]]) -> pd.DataFrame:
+    """列式交易记录转为导出表, 附带累计收益列"""
+    columns = ['datetime', 'action', 'price', 'size', 'value', 'commission', 'pnl', 'cumulative_pnl']
+    if not trades:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame({name: trades[name] for name in columns[:-1]})
+    df['action'] = np.where(trades['action'] == ACTION_BUY, 'BUY', 'SELL')
+    df['cumulative_pnl'] = df['pnl'].cumsum()
+    return df
+
+
+def build_summary(key: str, trades_df: pd.DataFrame, equity: Optional[Dict[str, np.ndarray]]) -> dict:
+    """导出汇总, 对应原Excel的Summary页"""
+    closed = trades_df[trades_df['pnl'] != 0]
+    summary = {
+        'key': key,
+        'total_trades': int(len(closed)),
+        'win_rate': float((closed['pnl'] > 0).mean() * 100) if len(closed) else 0.0,
+        'total_pnl': float(closed['pnl'].sum()),
+    }
+    if equity is not None and equity['equity'].shape[0]:
+        start_equity = float(equity['equity'][0])
+        final_equity = float(equity['equity'][-1])
+        summary.update({
+            'start_equity': start_equity,
+            'final_equity': final_equity,
+            'total_return': final_equity / start_equity - 1 if start_equity else 0.0,
+            'max_drawdown': float(equity['drawdown'].max()) if 'drawdown' in equity else None,
+        })
+    return summary
+
+
+backtest_result_exporter = BacktestResultExporter()
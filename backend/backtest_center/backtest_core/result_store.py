@@ -0,0 +1,121 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.backtest_center.models.trade_record import TradeRecord
+
+logger = logging.getLogger(__name__)
+
+# 回测结果文件根目录，每个回测key一个子目录
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'results')
+
+TRADES_FILE = 'trades.npz'
+EQUITY_FILE = 'equity.npz'
+
+# 交易动作编码
+ACTION_BUY = 1
+ACTION_SELL = -1
+
+
+class BacktestResultStore:
+    """
+    按回测key保存的列式结果文件
+
+    目录结构: results/<key>/trades.npz, results/<key>/equity.npz
+    """
+
+    def __init__(self, base_dir: str = DEFAULT_RESULTS_DIR):
+        self.base_dir = base_dir
+
+    def key_dir(self, key: str, create: bool = False) -> str:
+        """
+        回测key对应的目录, key 来自接口参数, 只能是 base_dir 下的一级目录名
+
+        Raises:
+            ValueError: key 为空、为 . 或 .., 或包含路径分隔符
+        """
+        if not key or key in ('.', '..') or any(sep in key for sep in ('/', '\\', '\0')):
+            raise ValueError(f"Invalid backtest key: {key!r}")
+        path = os.path.join(self.base_dir, key)
+        if create:
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def exists(self, key: str, file_name: str) -> bool:
+        return os.path.exists(os.path.join(self.key_dir(key), file_name))
+
+    def save_arrays(self, key: str, file_name: str, arrays: Dict[str, np.ndarray]) -> str:
+        """保存一组等长数组，先写临时文件再原子替换"""
+        path = os.path.join(self.key_dir(key, create=True), file_name)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_arrays(self, key: str, file_name: str) -> Optional[Dict[str, np.ndarray]]:
+        path = os.path.join(self.key_dir(key), file_name)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def save_trades(self, key: str, trade_records: List[TradeRecord]) -> Optional[str]:
+        """
+        将一次回测的全部交易记录保存为列式文件
+
+        Args:
+            key: 回测key
+            trade_records: 交易记录列表
+
+        Returns:
+            Optional[str]: 文件路径，没有交易时返回None
+        """
+        if not trade_records:
+            return None
+        return self.save_arrays(key, TRADES_FILE, trade_records_to_arrays(trade_records))
+
+    def load_trades(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        return self.load_arrays(key, TRADES_FILE)
+
+    def save_equity_curve(self, key: str, curve: Dict[str, np.ndarray]) -> Optional[str]:
+        """保存逐K线权益曲线"""
+        if not curve or curve['equity'].shape[0] == 0:
+            return None
+        return self.save_arrays(key, EQUITY_FILE, curve)
+
+    def load_equity_curve(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        return self.load_arrays(key, EQUITY_FILE)
+
+
+def trade_records_to_arrays(trade_records: List[TradeRecord]) -> Dict[str, np.ndarray]:
+    """交易记录列表转为列式数组"""
+    n = len(trade_records)
+    datetime_arr = np.empty(n, dtype='datetime64[s]')
+    action = np.empty(n, dtype=np.int8)
+    price = np.empty(n, dtype=np.float64)
+    size = np.empty(n, dtype=np.float64)
+    value = np.empty(n, dtype=np.float64)
+    commission = np.empty(n, dtype=np.float64)
+    pnl = np.empty(n, dtype=np.float64)
+    for i, record in enumerate(trade_records):
+        datetime_arr[i] = np.datetime64(record.datetime, 's')
+        action[i] = ACTION_BUY if record.action == 'BUY' else ACTION_SELL
+        price[i] = record.price
+        size[i] = record.size
+        value[i] = record.value
+        commission[i] = record.commission
+        pnl[i] = record.pnl
+    return {
+        'datetime': datetime_arr,
+        'action': action,
+        'price': price,
+        'size': size,
+        'value': value,
+        'commission': commission,
+        'pnl': pnl,
+    }
+
+
+backtest_result_store = BacktestResultStore()
@@ -0,0 +1,273 @@
+"""
+共享内存数据集
+
+进程池回测如果把DataFrame作为任务参数, 每个任务都要pickle一份完整数据。这里把每个品种的
+K线与指标数组只写入一次 multiprocessing 共享内存, 任务参数只传一个很小的 SharedDatasetHandle,
+工作进程按handle挂载后得到零拷贝、只读的numpy视图:
+
+- 数值列按 (列数, K线数) 放在同一个float64块中, 与pandas内部的块布局一致, 构造DataFrame时不复制
+- datetime 列单独以 datetime64[ns] 存放
+- 发布方按数据集hash做引用计数, 同一数据集重复发布共用一个段, 计数归零时释放
+
+    with SharedBacktestPool(max_workers=4) as pool:
+        results = pool.run_sweep({'BTC': btc_df}, 'module:signal_fn', [('BTC', params), ...])
+"""
+import atexit
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.backtest_cache import hash_dataframe
+
+logger = logging.getLogger(__name__)
+
+DATETIME_COLUMN = 'datetime'
+# 工作进程内最多保持挂载的数据集个数, 超出后关闭最久未使用的
+MAX_ATTACHED_DATASETS = 16
+
+
+@dataclass(frozen=True)
+class SharedDatasetHandle:
+    """共享内存中数据集的描述, 可pickle, 只有几百字节"""
+    dataset_hash: str
+    segment_name: str
+    n_rows: int
+    columns: Tuple[str, ...]
+    has_datetime: bool
+
+    @property
+    def block_bytes(self) -> int:
+        return len(self.columns) * self.n_rows * 8
+
+    @property
+    def nbytes(self) -> int:
+        return self.block_bytes + (self.n_rows * 8 if self.has_datetime else 0)
+
+
+def _numeric_columns(df: pd.DataFrame) -> List[str]:
+    return [column for column in df.columns if column != DATETIME_COLUMN
+            and (pd.api.types.is_numeric_dtype(df[column]) or pd.api.types.is_bool_dtype(df[column]))]
+
+
+class SharedDatasetStore:
+    """发布方(回测主进程)持有的共享内存段, 按数据集hash引用计数"""
+
+    def __init__(self):
+        self._segments: Dict[str, shared_memory.SharedMemory] = {}
+        self._handles: Dict[str, SharedDatasetHandle] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, df: pd.DataFrame) -> SharedDatasetHandle:
+        """
+        把数据集写入共享内存并增加引用计数, 已发布过的相同数据直接返回原handle
+
+        非数值列(datetime 除外)不会发布
+        """
+        dataset_hash = hash_dataframe(df)
+        with self._lock:
+            if dataset_hash in self._handles:
+                self._refcounts[dataset_hash] += 1
+                return self._handles[dataset_hash]
+            columns = tuple(_numeric_columns(df))
+            has_datetime = DATETIME_COLUMN in df.columns
+            n_rows = len(df)
+            handle_size = (len(columns) + int(has_datetime)) * n_rows * 8
+            segment = shared_memory.SharedMemory(create=True, size=max(1, handle_size))
+            handle = SharedDatasetHandle(dataset_hash, segment.name, n_rows, columns, has_datetime)
+            block, datetime_arr = _views(segment.buf, handle)
+            for i, column in enumerate(columns):
+                block[i] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            if has_datetime:
+                datetime_arr[:] = pd.to_datetime(df[DATETIME_COLUMN]).values.astype('datetime64[ns]')
+            self._segments[dataset_hash] = segment
+            self._handles[dataset_hash] = handle
+            self._refcounts[dataset_hash] = 1
+        logger.info(f"SharedDatasetStore@publish {dataset_hash[:12]} {n_rows} rows, "
+                    f"{handle.nbytes / 1024 / 1024:.1f} MB")
+        return handle
+
+    def release(self, handle: SharedDatasetHandle) -> None:
+        """减少引用计数, 归零时释放共享内存段"""
+        with self._lock:
+            count = self._refcounts.get(handle.dataset_hash)
+            if count is None:
+                return
+            if count > 1:
+                self._refcounts[handle.dataset_hash] = count - 1
+                return
+            self._refcounts.pop(handle.dataset_hash)
+            self._handles.pop(handle.dataset_hash)
+            segment = self._segments.pop(handle.dataset_hash)
+        segment.close()
+        segment.unlink()
+
+    def refcount(self, handle: SharedDatasetHandle) -> int:
+        return self._refcounts.get(handle.dataset_hash, 0)
+
+    def close_all(self) -> None:
+        """释放所有段, 进程退出时自动调用"""
+        with self._lock:
+            segments = list(self._segments.values())
+            self._segments.clear()
+            self._handles.clear()
+            self._refcounts.clear()
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+
+def _views(buf, handle: SharedDatasetHandle) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    block = np.ndarray((len(handle.columns), handle.n_rows), dtype=np.float64, buffer=buf)
+    datetime_arr = None
+    if handle.has_datetime:
+        datetime_arr = np.ndarray((handle.n_rows,), dtype='datetime64[ns]', buffer=buf, offset=handle.block_bytes)
+    return block, datetime_arr
+
+
+# 工作进程内已挂载的段, 任务之间复用
+_attached: 'OrderedDict[str, shared_memory.SharedMemory]' = OrderedDict()
+
+
+def _attach_segment(handle: SharedDatasetHandle) -> shared_memory.SharedMemory:
+    segment = _attached.get(handle.segment_name)
+    if segment is not None:
+        _attached.move_to_end(handle.segment_name)
+        return segment
+    if sys.version_info >= (3, 13):
+        segment = shared_memory.SharedMemory(name=handle.segment_name, track=False)
+    else:
+        # 3.13 之前挂载也会登记到 resource_tracker。spawn 的工作进程与发布方共用同一个 resource_tracker,
+        # 重复登记不会新增记录, 发布方释放时取消登记; 不能在这里取消登记, 否则会删掉发布方的记录
+        segment = shared_memory.SharedMemory(name=handle.segment_name)
+    _attached[handle.segment_name] = segment
+    while len(_attached) > MAX_ATTACHED_DATASETS:
+        _, evicted = _attached.popitem(last=False)
+        evicted.close()
+    return segment
+
+
+def _readonly_views(handle: SharedDatasetHandle) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    block, datetime_arr = _views(_attach_segment(handle).buf, handle)
+    block.flags.writeable = False
+    if datetime_arr is not None:
+        datetime_arr.flags.writeable = False
+    return block, datetime_arr
+
+
+def attach_arrays(handle: SharedDatasetHandle) -> Dict[str, np.ndarray]:
+    """
+    工作进程挂载数据集, 返回 列名 -> 只读numpy视图
+
+    挂载的段在本进程内缓存, 发布方释放后已挂载的映射仍然有效, 直到被淘汰或进程退出
+    """
+    block, datetime_arr = _readonly_views(handle)
+    arrays = {column: block[i] for i, column in enumerate(handle.columns)}
+    if datetime_arr is not None:
+        arrays[DATETIME_COLUMN] = datetime_arr
+    return arrays
+
+
+def attach_frame(handle: SharedDatasetHandle) -> pd.DataFrame:
+    """
+    挂载为DataFrame, 数值列与共享内存共用同一块内存
+
+    视图只读, 策略新增列时分配在本进程内; 修改已有列时pandas会复制该列, 不会改写共享数据
+    """
+    block, datetime_arr = _readonly_views(handle)
+    df = pd.DataFrame(block.T, columns=list(handle.columns), copy=False)
+    if datetime_arr is not None:
+        df.insert(0, DATETIME_COLUMN, datetime_arr)
+    return df
+
+
+def detach_all() -> None:
+    while _attached:
+        _, segment = _attached.popitem()
+        segment.close()
+
+
+def _run_shared_task(handle: SharedDatasetHandle, task: dict) -> dict:
+    """进程池中执行: 挂载数据集后按 distributed.run_task 回测"""
+    from backend.backtest_center.backtest_core.distributed import run_task
+
+    begin = time.perf_counter()
+    try:
+        result, error = run_task(attach_frame(handle), task), None
+    except Exception as e:
+        result, error = None, f'{type(e).__name__}: {e}'
+    return {'result': result, 'error': error, 'elapsed_seconds': time.perf_counter() - begin}
+
+
+class SharedBacktestPool:
+    """
+    数据集经共享内存广播的回测进程池
+
+    run_sweep 开始时每个品种发布一次, 全部任务结束后释放; 任务参数只包含handle与策略参数。
+    param_search.run_param_search(max_workers=...) 用它并行回测 successive halving 每一轮的配置
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, store: Optional[SharedDatasetStore] = None):
+        self.max_workers = max_workers
+        self.store = store or shared_dataset_store
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'SharedBacktestPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.shutdown()
+
+    def _ensure_started(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn 与 BacktestJobManager 一致, 不继承父进程的数据库连接
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def run_sweep(self, datasets: Dict[str, pd.DataFrame], strategy: str,
+                  tasks: Sequence[Tuple[str, dict]], backtest_kwargs: Optional[dict] = None,
+                  chunksize: int = 4, bars: Optional[int] = None, warmup_bars: int = 0) -> List[dict]:
+        """
+        Args:
+            datasets: 品种 -> K线数据(已包含指标列)
+            strategy: 信号函数路径 'module:function', 签名同 param_search.SignalFn
+            tasks: (品种, 参数) 列表
+            backtest_kwargs: 传给 run_vectorized_backtest 的固定参数
+            chunksize: 每次分发给工作进程的任务数
+            bars: 只回测最近 bars 根K线, 为空时使用完整数据
+            warmup_bars: bars 之前额外用于计算信号的K线数
+
+        Returns:
+            List[dict]: 与 tasks 顺序一致, {'result': {'final_value', 'metrics'}, 'error', 'elapsed_seconds'}
+        """
+        executor = self._ensure_started()
+        handles = {symbol: self.store.publish(df) for symbol, df in datasets.items()}
+        try:
+            handle_list = [handles[symbol] for symbol, _ in tasks]
+            task_list = [{'strategy': strategy, 'params': params, 'backtest_kwargs': backtest_kwargs or {},
+                          'bars': bars, 'warmup_bars': warmup_bars} for _, params in tasks]
+            return list(executor.map(_run_shared_task, handle_list, task_list, chunksize=chunksize))
+        finally:
+            for handle in handles.values():
+                self.store.release(handle)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+shared_dataset_store = SharedDatasetStore()
+atexit.register(shared_dataset_store.close_all)
+atexit.register(detach_all)
@@ -0,0 +1,323 @@
+"""
+现货自动限价/止损规则回测
+
+按 SpotMainTask 的调度方式在日线上回放 SpotTradeConfig:
+
+- 调度每天 8:00 (日线开盘) 执行一次, 指标价格与线上一致: 取最近 candle_limit 根日线(最后一根为刚开盘、
+  收盘价等于开盘价的K线)计算指标, 保留两位小数; 指标无法计算(如周期长于K线数)时线上下单抛异常、
+  不扣减 exec_nums, 这里同样跳过当天
+- limit_order: exec_nums > 0 时每天以指标价(或 target_price)挂一笔限价买单, 金额为 amount
+  或可用USDT * percentage%, 每次下单扣减 exec_nums(余额不足被拒也扣减); 挂单一直有效直到成交,
+  最低价触及挂单价成交, 开盘价已低于挂单价时按开盘价成交
+- stop_loss: exec_nums > 0 时每天挂一笔条件止损卖单, 每天开盘已挂的止损单改为当天的指标价与数量;
+  最低价触及触发价时按触发价成交(开盘即低于触发价时按开盘价), 卖出数量为 amount/触发价 或持仓 * percentage%
+
+每个配置独立使用一份初始资金(initial_usdt USDT + initial_qty 币)回测, 逐日循环内对全部配置做数组运算,
+同一币种数百个配置一次算完。
+"""
+import argparse
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.data_object_center.enum_obj import EnumTradeExecuteType
+
+# OKX get_candlesticks 未指定 limit 时返回 100 根
+DEFAULT_CANDLE_LIMIT = 100
+DEFAULT_INITIAL_USDT = 10000.0
+DEFAULT_COMMISSION = 0.001
+# 单个配置最多模拟的下单次数
+MAX_ORDERS_PER_CONFIG = 365
+# 布林带周期, 与 KlineDataProcessor.add_target_indicator 一致
+BAND_PERIOD = 20
+PRICE_DECIMALS = 2
+SIZE_DECIMALS = 6
+SUPPORTED_INDICATORS = ('sma', 'ema', 'upper_band', 'lower_band')
+
+
+def _forming_windows(open_: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    """
+    每天调度时可见的K线收盘价窗口, 形状 (天数, length)
+
+    第d行为第 d-length+1 ~ d-1 天的收盘价加第d天开盘价, 历史不足 length 天的行为NaN
+    """
+    n = close.shape[0]
+    windows = np.full((n, length), np.nan)
+    if n >= length:
+        if length > 1:
+            windows[length - 1:, :-1] = np.lib.stride_tricks.sliding_window_view(close[:-1], length - 1)[
+                                        :n - length + 1]
+        windows[length - 1:, -1] = open_[length - 1:]
+    return windows
+
+
+def indicator_prices(open_: np.ndarray, close: np.ndarray, indicator: str, indicator_val: str,
+                     candle_limit: int = DEFAULT_CANDLE_LIMIT) -> np.ndarray:
+    """
+    每天调度时线上 get_target_indicator_latest_price 得到的指标价格
+
+    计算口径同 talib: SMA/EMA(以前n个值的均值为起点)、BBANDS(20, k, 总体标准差)
+    """
+    indicator = (indicator or '').lower()
+    if indicator not in SUPPORTED_INDICATORS:
+        raise ValueError(f"Unsupported indicator for spot rules: {indicator}")
+    windows = _forming_windows(open_, close, candle_limit)
+    if indicator in ('upper_band', 'lower_band'):
+        period, k = BAND_PERIOD, float(indicator_val)
+    else:
+        period, k = int(indicator_val), 0.0
+    if period > candle_limit:
+        return np.full(close.shape[0], np.nan)
+    tail = windows[:, -period:]
+    if indicator == 'sma':
+        values = tail.mean(axis=1)
+    elif indicator == 'ema':
+        # 窗口内从第 period 个值开始递推, 展开为固定权重
+        alpha = 2.0 / (period + 1)
+        steps = candle_limit - period
+        decay = (1 - alpha) ** np.arange(steps - 1, -1, -1)
+        values = windows[:, :period].mean(axis=1) * (1 - alpha) ** steps + windows[:, period:] @ (alpha * decay)
+    else:
+        mean = tail.mean(axis=1)
+        std = tail.std(axis=1)
+        values = mean + k * std if indicator == 'upper_band' else mean - k * std
+    return np.round(values, PRICE_DECIMALS)
+
+
+def _parse_number(value) -> float:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return math.nan
+    return float(value)
+
+
+def _simulate_limit_orders(open_, low, prices, amount, pct, exec_nums, initial_usdt, initial_qty, commission):
+    n_configs, n_days = prices.shape
+    slots = max(1, int(exec_nums.max(initial=0)))
+    usdt = np.full(n_configs, initial_usdt)
+    qty = np.full(n_configs, initial_qty)
+    reserved = np.zeros(n_configs)
+    order_px = np.zeros((n_configs, slots))
+    order_sz = np.zeros((n_configs, slots))
+    live = np.zeros((n_configs, slots), dtype=bool)
+    placed = np.zeros(n_configs, dtype=np.int64)
+    rejected = np.zeros(n_configs, dtype=np.int64)
+    rows = np.arange(n_configs)
+    fills = []
+    for d in range(n_days):
+        px = prices[:, d]
+        want = (placed < exec_nums) & ~np.isnan(px)
+        if want.any():
+            avail = usdt - reserved
+            amt = np.where(np.isnan(amount), avail * pct / 100, amount)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sz = np.round(amt / px, SIZE_DECIMALS)
+            ok = want & (sz > 0) & (sz * px <= avail)
+            rejected += want & ~ok
+            slot = np.minimum(placed, slots - 1)
+            order_px[rows[ok], slot[ok]] = px[ok]
+            order_sz[rows[ok], slot[ok]] = sz[ok]
+            live[rows[ok], slot[ok]] = True
+            reserved += np.where(ok, sz * px, 0.0)
+            placed += want
+        hit = live & (low[d] <= order_px)
+        if hit.any():
+            fill_px = np.minimum(order_px, open_[d])
+            cost = np.where(hit, fill_px * order_sz, 0.0).sum(axis=1)
+            usdt -= cost * (1 + commission)
+            reserved -= np.where(hit, order_px * order_sz, 0.0).sum(axis=1)
+            qty += np.where(hit, order_sz, 0.0).sum(axis=1)
+            live &= ~hit
+            for c, k in zip(*np.nonzero(hit)):
+                fills.append((int(c), d, float(fill_px[c, k]), float(order_sz[c, k])))
+    return usdt, qty, placed, rejected, fills
+
+
+def _simulate_stop_losses(open_, low, prices, amount, pct, exec_nums, initial_usdt, initial_qty, commission):
+    n_configs, n_days = prices.shape
+    usdt = np.full(n_configs, initial_usdt)
+    qty = np.full(n_configs, initial_qty)
+    trigger = np.full(n_configs, np.nan)
+    n_live = np.zeros(n_configs, dtype=np.int64)
+    placed = np.zeros(n_configs, dtype=np.int64)
+    rejected = np.zeros(n_configs, dtype=np.int64)
+    fills = []
+    for d in range(n_days):
+        px = prices[:, d]
+        valid = ~np.isnan(px)
+        # 已挂的止损单先改价, 再按剩余 exec_nums 新挂一单
+        trigger = np.where(valid & (n_live > 0), px, trigger)
+        want = (placed < exec_nums) & valid
+        trigger = np.where(want, px, trigger)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sz_each = np.where(np.isnan(amount), np.round(qty * pct / 100, SIZE_DECIMALS),
+                               np.round(amount / trigger, SIZE_DECIMALS))
+        ok = want & (sz_each > 0) & (qty > 0)
+        rejected += want & ~ok
+        n_live += ok
+        placed += want
+        hit = (n_live > 0) & (low[d] <= trigger)
+        if hit.any():
+            fill_px = np.minimum(trigger, open_[d])
+            sell = np.where(hit, np.minimum(qty, n_live * sz_each), 0.0)
+            usdt += sell * fill_px * (1 - commission)
+            qty -= sell
+            n_live = np.where(hit, 0, n_live)
+            for c in np.nonzero(hit)[0]:
+                fills.append((int(c), d, float(fill_px[c]), -float(sell[c])))
+    return usdt, qty, placed, rejected, fills
+
+
+def backtest_spot_configs(df: pd.DataFrame, configs: Sequence[Dict[str, Any]], start: Optional[str] = None,
+                          end: Optional[str] = None, initial_usdt: float = DEFAULT_INITIAL_USDT,
+                          initial_qty: Optional[float] = None, commission: float = DEFAULT_COMMISSION,
+                          candle_limit: int = DEFAULT_CANDLE_LIMIT, max_fills: int = 50) -> List[dict]:
+    """
+    回测一个币种的多个 SpotTradeConfig
+
+    Args:
+        df: 该币种日线数据, 包含 datetime, open, high, low, close
+        configs: SpotTradeConfig.to_dict() 列表, 只回测 limit_order 与 stop_loss 类型
+        start: 调度开始日期, 之前的数据只用于计算指标
+        end: 调度结束日期
+        initial_usdt: 每个配置的初始USDT
+        initial_qty: 每个配置的初始持币数量, 为空时为开始当天开盘价买入 initial_usdt 的数量
+        commission: 手续费率
+        candle_limit: 线上计算指标使用的日线数量
+        max_fills: 每个配置结果中保留的成交明细条数
+
+    Returns:
+        List[dict]: 与 configs 顺序一致的回测结果
+    """
+    df = df.reset_index(drop=True)
+    datetime_arr = pd.to_datetime(df['datetime'])
+    open_all = df['open'].to_numpy(dtype=np.float64)
+    close_all = df['close'].to_numpy(dtype=np.float64)
+    mask = np.ones(len(df), dtype=bool)
+    if start:
+        mask &= (datetime_arr >= pd.Timestamp(start)).to_numpy()
+    if end:
+        mask &= (datetime_arr <= pd.Timestamp(end)).to_numpy()
+    days = np.nonzero(mask)[0]
+    if days.shape[0] == 0:
+        raise ValueError("No daily bars in the backtest range")
+    open_, low, close = open_all[days], df['low'].to_numpy(dtype=np.float64)[days], close_all[days]
+    dates = datetime_arr.iloc[days].dt.strftime('%Y-%m-%d').to_numpy()
+    if initial_qty is None:
+        initial_qty = initial_usdt / open_[0]
+    hold_value = float(initial_usdt + initial_qty * close[-1])
+
+    results: List[Optional[dict]] = [None] * len(configs)
+    price_cache: Dict[tuple, np.ndarray] = {}
+    groups: Dict[str, List[int]] = {EnumTradeExecuteType.LIMIT_ORDER.value: [],
+                                    EnumTradeExecuteType.STOP_LOSS.value: []}
+    rows: Dict[int, tuple] = {}
+    for i, config in enumerate(configs):
+        base = {'config_id': config.get('id'), 'ccy': config.get('ccy'), 'type': config.get('type')}
+        try:
+            if config.get('type') not in groups:
+                raise ValueError(f"Unsupported config type: {config.get('type')}")
+            target_price = _parse_number(config.get('target_price'))
+            if math.isnan(target_price):
+                cache_key = ((config.get('indicator') or '').lower(), str(config.get('indicator_val')))
+                if cache_key not in price_cache:
+                    price_cache[cache_key] = indicator_prices(open_all, close_all, config.get('indicator'),
+                                                              config.get('indicator_val'), candle_limit)[days]
+                prices = price_cache[cache_key]
+            else:
+                prices = np.full(days.shape[0], target_price)
+            amount = _parse_number(config.get('amount'))
+            pct = _parse_number(config.get('percentage'))
+            if math.isnan(amount) and math.isnan(pct):
+                raise ValueError("Either amount or percentage is required")
+            if config.get('type') == EnumTradeExecuteType.STOP_LOSS.value and math.isnan(amount) \
+                    and pct != int(pct):
+                # SpotStopLossTask 以 int(percentage) 计算数量, 小数百分比线上下单会失败
+                raise ValueError(f"Stop loss percentage must be an integer, got {config.get('percentage')}")
+            exec_nums = min(int(config.get('exec_nums') or 0), MAX_ORDERS_PER_CONFIG)
+        except (TypeError, ValueError) as e:
+            results[i] = {**base, 'error': str(e)}
+            continue
+        groups[config['type']].append(i)
+        rows[i] = (prices, amount, pct, exec_nums, base)
+
+    simulators = {
+        EnumTradeExecuteType.LIMIT_ORDER.value: _simulate_limit_orders,
+        EnumTradeExecuteType.STOP_LOSS.value: _simulate_stop_losses,
+    }
+    for config_type, indices in groups.items():
+        if not indices:
+            continue
+        prices = np.vstack([rows[i][0] for i in indices])
+        amount, pct, exec_nums = (np.array([rows[i][j] for i in indices], dtype=np.float64) for j in (1, 2, 3))
+        usdt, qty, placed, rejected, fills = simulators[config_type](
+            open_, low, prices, amount, pct, exec_nums.astype(np.int64), initial_usdt, initial_qty, commission)
+        fills_by_row: Dict[int, List[tuple]] = {}
+        for row, d, price, size in fills:
+            fills_by_row.setdefault(row, []).append((d, price, size))
+        for row, i in enumerate(indices):
+            row_fills = fills_by_row.get(row, [])
+            filled_qty = sum(abs(size) for _, _, size in row_fills)
+            notional = sum(abs(size) * price for _, price, size in row_fills)
+            final_value = float(usdt[row] + qty[row] * close[-1])
+            results[i] = {
+                **rows[i][4],
+                'orders_placed': int(placed[row]),
+                'orders_rejected': int(rejected[row]),
+                'fills': len(row_fills),
+                'filled_qty': filled_qty,
+                'avg_fill_price': notional / filled_qty if filled_qty else None,
+                'first_fill_date': dates[row_fills[0][0]] if row_fills else None,
+                'last_fill_date': dates[row_fills[-1][0]] if row_fills else None,
+                'final_usdt': float(usdt[row]),
+                'final_qty': float(qty[row]),
+                'final_value': final_value,
+                'hold_value': hold_value,
+                'pnl_vs_hold': final_value - hold_value,
+                'fill_details': [{'date': dates[d], 'price': price, 'size': size}
+                                 for d, price, size in row_fills[:max_fills]],
+                'error': None,
+            }
+    return results
+
+
+def run_spot_config_backtest(ccy: str, config_ids: Optional[Sequence[int]] = None,
+                             configs: Optional[Sequence[Dict[str, Any]]] = None, **kwargs) -> List[dict]:
+    """
+    读取币种日线csv与已保存的配置后回测
+
+    Args:
+        ccy: 币种, 如 'ETH' 或 'ETH-USDT'
+        config_ids: 只回测指定id的已保存配置, 为空时回测该币种全部未删除的限价与止损配置
+        configs: 直接传入的配置(如未保存的候选配置), 传入时不读取数据库
+        kwargs: 透传给 backtest_spot_configs
+    """
+    from backend.backtest_center.backtest_main import load_kline_df
+    from backend.data_object_center.spot_trade_config import SpotTradeConfig
+
+    if configs is None:
+        configs = []
+        for config_type in (EnumTradeExecuteType.LIMIT_ORDER.value, EnumTradeExecuteType.STOP_LOSS.value):
+            configs += SpotTradeConfig.list_configs_by_ccy_and_type(ccy, config_type)
+        if config_ids:
+            configs = [config for config in configs if config['id'] in set(config_ids)]
+    df = load_kline_df(ccy.split('-')[0], '1D')
+    return backtest_spot_configs(df, configs, **kwargs)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='backtest SpotTradeConfig limit/stop rules on daily bars')
+    parser.add_argument('ccy')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--initial-usdt', type=float, default=DEFAULT_INITIAL_USDT)
+    args = parser.parse_args(argv)
+    for result in run_spot_config_backtest(args.ccy, start=args.start, end=args.end,
+                                           initial_usdt=args.initial_usdt):
+        print(json.dumps({k: v for k, v in result.items() if k != 'fill_details'}, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+永续合约(USDT-SWAP)撮合模型
+
+实盘通过 OKXAlgoOrderService.place_order_by_st_result 以逐仓(isolated)市价开多并附带止损,
+现货撮合(vectorized_engine.simulate_signals)没有杠杆、资金费率与强平, 合约策略的回测收益偏差很大。
+这里在相同的信号与止损规则上加入:
+
+- 杠杆: 入场按 权益*risk% 作为保证金, 名义价值 = 保证金*杠杆, 已占用保证金受 max_position_size 限制
+- 资金费率: 从本地csv读取结算记录, 按结算时间对齐到K线后在收盘时从逐仓保证金中扣除(费率为正时多头支付)
+- 维持保证金与强平: 逐仓保证金 + 未实现盈亏 <= 名义价值*(维持保证金率+手续费率) 时强平, 损失全部逐仓保证金
+
+资金费率文件放在 data_center/funding_rate/<instId>.csv, 与OKX资金费率历史接口字段一致:
+fundingTime(毫秒时间戳) 与 realizedRate/fundingRate; 也可以使用 datetime 列。
+"""
+import logging
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.backtest_core.result_store import ACTION_BUY, ACTION_SELL
+
+logger = logging.getLogger(__name__)
+
+FUNDING_RATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'data_center', 'funding_rate')
+
+# 默认3倍杠杆与入场策略中 getattr(stIns, 'leverage', 3) 一致, 维持保证金率取OKX BTC永续第一档
+DEFAULT_LEVERAGE = 3.0
+DEFAULT_MAINTENANCE_MARGIN_RATE = 0.004
+# 与 vectorized_engine.MIN_TRADE_RATIO 一致
+MIN_TRADE_RATIO = 0.001
+
+
+def get_swap_inst_id(symbol: str) -> str:
+    """'BTC-USDT' / 'BTC' -> 'BTC-USDT-SWAP', 与 SymbolFormatUtils.get_swap_usdt 一致"""
+    return symbol.split('-')[0] + '-USDT-SWAP'
+
+
+def funding_rate_path(inst_id: str) -> str:
+    return os.path.join(FUNDING_RATE_DIR, f'{inst_id}.csv')
+
+
+@lru_cache(maxsize=32)
+def _read_funding_file(path: str, mtime: float) -> pd.DataFrame:
+    raw = pd.read_csv(path)
+    if 'fundingTime' in raw.columns:
+        times = pd.to_datetime(raw['fundingTime'].astype('int64'), unit='ms')
+    else:
+        times = pd.to_datetime(raw['datetime'])
+    rate_column = 'realizedRate' if 'realizedRate' in raw.columns else 'fundingRate'
+    funding = pd.DataFrame({'datetime': times, 'funding_rate': raw[rate_column].astype(float)})
+    return funding.dropna().sort_values('datetime').drop_duplicates('datetime').reset_index(drop=True)
+
+
+def load_funding_rates(symbol: Optional[str] = None, path: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    读取资金费率结算记录
+
+    Args:
+        symbol: 交易对或币种, 如 'BTC-USDT', 读取 funding_rate/BTC-USDT-SWAP.csv
+        path: 直接指定文件路径, 优先于 symbol
+
+    Returns:
+        Optional[pd.DataFrame]: datetime(UTC结算时间) 与 funding_rate 两列, 文件不存在时返回None
+    """
+    path = path or (funding_rate_path(get_swap_inst_id(symbol)) if symbol else None)
+    if not path or not os.path.exists(path):
+        return None
+    return _read_funding_file(path, os.path.getmtime(path))
+
+
+def funding_per_bar(bar_datetime: np.ndarray, funding_datetime: np.ndarray, funding_rate: np.ndarray) -> np.ndarray:
+    """
+    把资金费率结算对齐到K线, 返回每根K线收盘时需要结算的费率之和
+
+    K线时间为开盘时间; t 时刻的结算由 t 之前持有的仓位支付, 因此归到开盘时间严格早于 t 的最后一根K线,
+    恰好在K线开盘时刻的结算归到上一根K线, 不会向新开仓位收取。早于第一根或晚于最后一根K线收盘的结算忽略。
+    """
+    n = bar_datetime.shape[0]
+    rates = np.zeros(n, dtype=np.float64)
+    if n == 0 or funding_datetime.shape[0] == 0:
+        return rates
+    bars = bar_datetime.astype('datetime64[s]')
+    settle = funding_datetime.astype('datetime64[s]')
+    idx = np.searchsorted(bars, settle, side='left') - 1
+    # 最后一根K线的收盘时间按前一根K线间隔推算
+    last_close = bars[-1] + (bars[-1] - bars[-2] if n > 1 else np.timedelta64(0, 's'))
+    valid = (idx >= 0) & (settle <= last_close)
+    np.add.at(rates, idx[valid], funding_rate[valid])
+    return rates
+
+
+@dataclass
+class SwapConfig:
+    """
+    合约撮合参数
+
+    funding_rates 为空时按 symbol / funding_file 读取本地资金费率文件, 都没有时不计资金费用
+    """
+    leverage: float = DEFAULT_LEVERAGE
+    maintenance_margin_rate: float = DEFAULT_MAINTENANCE_MARGIN_RATE
+    symbol: Optional[str] = None
+    funding_file: Optional[str] = None
+    funding_rates: Optional[pd.DataFrame] = None
+
+    def __post_init__(self):
+        if self.leverage < 1:
+            raise ValueError(f"Leverage must be >= 1, got {self.leverage}")
+        if not 0 <= self.maintenance_margin_rate < 1:
+            raise ValueError(f"Invalid maintenance margin rate: {self.maintenance_margin_rate}")
+
+    def to_dict(self) -> dict:
+        """可json序列化的参数, 不含已加载的资金费率"""
+        return {
+            'leverage': self.leverage,
+            'maintenance_margin_rate': self.maintenance_margin_rate,
+            'symbol': self.symbol,
+            'funding_file': self.funding_file,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SwapConfig':
+        return cls(
+            leverage=data.get('leverage', DEFAULT_LEVERAGE),
+            maintenance_margin_rate=data.get('maintenance_margin_rate', DEFAULT_MAINTENANCE_MARGIN_RATE),
+            symbol=data.get('symbol'),
+            funding_file=data.get('funding_file'),
+        )
+
+    def bar_funding(self, bar_datetime: np.ndarray) -> np.ndarray:
+        """每根K线收盘时结算的资金费率"""
+        funding = self.funding_rates
+        if funding is None:
+            funding = load_funding_rates(self.symbol, self.funding_file)
+            if funding is None:
+                if self.symbol or self.funding_file:
+                    logger.warning(f"SwapConfig@bar_funding, no funding rate file for "
+                                   f"{self.funding_file or get_swap_inst_id(self.symbol)}, funding ignored")
+                return np.zeros(bar_datetime.shape[0], dtype=np.float64)
+        return funding_per_bar(bar_datetime, pd.to_datetime(funding['datetime']).values,
+                               funding['funding_rate'].to_numpy(dtype=np.float64))
+
+
+def liquidation_price(size: float, cost: float, margin: float, maintenance_margin_rate: float,
+                      commission: float) -> float:
+    """
+    逐仓多头强平价
+
+    margin + size*(P - 均价) = size*P*(维持保证金率 + 手续费率)
+    => P = (cost - margin) / (size * (1 - 维持保证金率 - 手续费率))
+    """
+    if size <= 0:
+        return math.nan
+    return max((cost - margin) / (size * (1 - maintenance_margin_rate - commission)), 0.0)
+
+
+def simulate_swap_signals(open_: np.ndarray, low: np.ndarray, close: np.ndarray, entry_sig: np.ndarray,
+                          sell_price: np.ndarray, funding: np.ndarray, config: SwapConfig,
+                          initial_cash: float = 100000.0, risk_percent: float = 2.0, commission: float = 0.001,
+                          max_position_size: float = 0.5, state=None):
+    """
+    逐仓永续合约逐K线撮合, 入场与止损规则与 simulate_signals 相同, 只做多
+
+    - 入场: 第i根K线收盘出现信号, 保证金 = min(权益*risk%, 权益*最大仓位-已占用保证金),
+      数量 = 保证金*杠杆/收盘价, 第i+1根K线开盘成交; 可用资金不足以支付保证金与手续费时拒单
+    - 强平价随加仓与资金费用变化; 开盘价已低于强平价时按开盘强平, 否则最低价先触及止损价与强平价中
+      较高者: 止损在上方时止损成交, 否则按强平价强平。入场K线上止损不生效, 但会强平
+    - 强平损失该仓位全部逐仓保证金(剩余部分视为强平费用), 不再退回
+    - 资金费用 = 持仓数量*收盘价*费率, 在K线收盘时从逐仓保证金中扣除(负费率时增加保证金)
+
+    卖出记录的 pnl 为价差收益减去持仓期间的资金费用, 与 closed_trade_pnl 合计后等于现金变化;
+    强平时 pnl 为全部投入保证金的亏损, commission 为0。
+
+    state 为 EngineState, 使用其中的 margin 与 funding 字段。
+
+    Returns:
+        tuple: (交易列表, 权益数组, 可用资金数组, 持仓数组, 资金费用合计, 强平次数)
+    """
+    n = close.shape[0]
+    o_list, l_list, c_list = open_.tolist(), low.tolist(), close.tolist()
+    sig_list = entry_sig.tolist()
+    stop_list = sell_price.tolist()
+    funding_list = funding.tolist()
+    equity = np.empty(n, dtype=np.float64)
+    cash_arr = np.empty(n, dtype=np.float64)
+    position_arr = np.empty(n, dtype=np.float64)
+    trades = []
+
+    risk = risk_percent / 100
+    leverage, mmr = config.leverage, config.maintenance_margin_rate
+    if state is None:
+        cash, pos, cost, margin, trade_funding = initial_cash, 0.0, 0.0, 0.0, 0.0
+        pending_size, stop = 0.0, math.nan
+    else:
+        cash, pos, cost, margin, trade_funding = state.cash, state.position, state.cost, state.margin, state.funding
+        pending_size, stop = state.pending_size, state.stop
+    liq = liquidation_price(pos, cost, margin, mmr, commission)
+    total_funding = 0.0
+    liquidations = 0
+    for i in range(n):
+        o = o_list[i]
+        entry_filled = False
+        if pending_size > 0:
+            value = pending_size * o
+            required = value / leverage
+            comm = value * commission
+            if required + comm <= cash:
+                cash -= required + comm
+                pos += pending_size
+                cost += value
+                margin += required
+                liq = liquidation_price(pos, cost, margin, mmr, commission)
+                entry_filled = True
+                trades.append((i, ACTION_BUY, o, pending_size, value, comm, 0.0))
+            pending_size = 0.0
+        if pos > 0:
+            lo = l_list[i]
+            stop_active = stop == stop and not entry_filled
+            liquidated = False
+            fill = None
+            if o <= liq:
+                liquidated, fill = True, o
+            elif stop_active and o <= stop:
+                fill = o
+            elif stop_active and stop >= liq and lo <= stop:
+                fill = stop
+            elif lo <= liq:
+                liquidated, fill = True, liq
+            if liquidated:
+                trades.append((i, ACTION_SELL, fill, -pos, pos * fill, 0.0, -(margin + trade_funding)))
+                liquidations += 1
+            elif fill is not None:
+                value = pos * fill
+                comm = value * commission
+                cash += margin + value - cost - comm
+                trades.append((i, ACTION_SELL, fill, -pos, value, comm, value - cost - trade_funding))
+            if fill is not None:
+                pos, cost, margin, trade_funding, liq = 0.0, 0.0, 0.0, 0.0, math.nan
+
+        c = c_list[i]
+        rate = funding_list[i]
+        if pos > 0 and rate != 0:
+            payment = pos * c * rate
+            margin -= payment
+            trade_funding += payment
+            total_funding += payment
+            liq = liquidation_price(pos, cost, margin, mmr, commission)
+        value_now = cash + margin + pos * c - cost
+        equity[i] = value_now
+        cash_arr[i] = cash
+        position_arr[i] = pos
+
+        if sig_list[i] == 1:
+            target_margin = min(value_now * risk, value_now * max_position_size - margin)
+            if target_margin * leverage >= c * MIN_TRADE_RATIO:
+                pending_size = target_margin * leverage / c
+        stop = stop_list[i] if pos > 0 else math.nan
+    if state is not None:
+        state.cash, state.position, state.cost = cash, pos, cost
+        state.margin, state.funding = margin, trade_funding
+        state.pending_size, state.stop = pending_size, stop
+        state.last_sell_price = stop_list[-1] if n else state.last_sell_price
+    return trades, equity, cash_arr, position_arr, total_funding, liquidations
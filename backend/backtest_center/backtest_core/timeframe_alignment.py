@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# K线周期 -> 时长, key 为 EnumTimeFrame 的取值
+INTERVAL_DURATIONS = {
+    '1': pd.Timedelta(minutes=1),
+    '3': pd.Timedelta(minutes=3),
+    '5': pd.Timedelta(minutes=5),
+    '15': pd.Timedelta(minutes=15),
+    '30': pd.Timedelta(minutes=30),
+    '45': pd.Timedelta(minutes=45),
+    '1H': pd.Timedelta(hours=1),
+    '2H': pd.Timedelta(hours=2),
+    '3H': pd.Timedelta(hours=3),
+    '4H': pd.Timedelta(hours=4),
+    '4h': pd.Timedelta(hours=4),
+    '1D': pd.Timedelta(days=1),
+    '1d': pd.Timedelta(days=1),
+    '1W': pd.Timedelta(weeks=1),
+}
+
+
+def interval_to_timedelta(interval: str) -> pd.Timedelta:
+    """K线周期字符串转时长"""
+    if interval not in INTERVAL_DURATIONS:
+        raise ValueError(f"Unsupported interval for alignment: {interval}")
+    return INTERVAL_DURATIONS[interval]
+
+
+def bar_close_times(open_times: np.ndarray, interval: str) -> np.ndarray:
+    """
+    计算每根K线的收盘时间
+
+    csv中的datetime为开盘时间。收盘时间取下一根K线的开盘时间与 开盘时间+周期 的较大值,
+    数据有缺口时按更晚的时间算, 保证不会提前使用未收盘的K线。
+    """
+    open_times = np.asarray(open_times, dtype='datetime64[ns]')
+    close_times = open_times + interval_to_timedelta(interval).to_timedelta64()
+    if open_times.shape[0] > 1:
+        close_times[:-1] = np.maximum(close_times[:-1], open_times[1:])
+    return close_times
+
+
+def build_alignment_index(base_open_times: np.ndarray, base_interval: str,
+                          htf_open_times: np.ndarray, htf_interval: str) -> np.ndarray:
+    """
+    预计算基础周期到高周期的下标映射
+
+    对每根基础K线, 找到在其收盘时刻之前已经收盘的最后一根高周期K线。
+    一次 searchsorted 完成全部映射, 没有可用高周期K线时为 -1。
+
+    Args:
+        base_open_times: 基础周期开盘时间, 升序
+        base_interval: 基础周期, 如 '4H'
+        htf_open_times: 高周期开盘时间, 升序
+        htf_interval: 高周期, 如 '1D'
+
+    Returns:
+        np.ndarray: 长度与基础周期相同的int64下标数组
+    """
+    base_close = np.asarray(base_open_times, dtype='datetime64[ns]') + \
+        interval_to_timedelta(base_interval).to_timedelta64()
+    htf_close = bar_close_times(htf_open_times, htf_interval)
+    return np.searchsorted(htf_close, base_close, side='right').astype(np.int64) - 1
+
+
+def take_aligned(values: np.ndarray, index: np.ndarray, fill_value=np.nan) -> np.ndarray:
+    """按映射下标取高周期数组, 下标为-1的位置填充 fill_value"""
+    values = np.asarray(values)
+    valid = index >= 0
+    if np.issubdtype(values.dtype, np.integer) or values.dtype == np.bool_:
+        values = values.astype(np.float64)
+    result = np.full(index.shape[0], fill_value, dtype=values.dtype)
+    result[valid] = values[index[valid]]
+    return result
+
+
+def align_mask(base_df: pd.DataFrame, base_interval: str, htf_df: pd.DataFrame, htf_interval: str,
+               mask: np.ndarray) -> np.ndarray:
+    """
+    将高周期布尔条件对齐到基础周期, 没有可用高周期K线时视为不满足
+
+    Returns:
+        np.ndarray: 长度与基础周期相同的bool数组
+    """
+    index = build_alignment_index(pd.to_datetime(base_df['datetime']).values, base_interval,
+                                  pd.to_datetime(htf_df['datetime']).values, htf_interval)
+    return take_aligned(np.asarray(mask, dtype=np.bool_), index, fill_value=0.0) > 0
@@ -0,0 +1,274 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from backend.backtest_center.analysis.performance_metrics import build_backtest_results, closed_trade_pnl
+from backend.backtest_center.analyzers.equity_curve import build_equity_curve
+from backend.backtest_center.backtest_core.intrabar import IntrabarSimulator
+from backend.backtest_center.backtest_core.result_store import ACTION_BUY, ACTION_SELL
+from backend.backtest_center.backtest_core.swap_broker import SwapConfig, simulate_swap_signals
+from backend.backtest_center.models.backtest_result import BacktestResults
+from backend.backtest_center.models.trade_record import TradeRecord
+
+# 最小交易单位, 与 StrategyForBacktest.calculate_position_size 一致
+MIN_TRADE_RATIO = 0.001
+
+TRADE_FIELDS = ('datetime', 'action', 'price', 'size', 'value', 'commission', 'pnl')
+
+
+@dataclass
+class EngineState:
+    """
+    最后一根K线收盘后的撮合状态, 用于在新K线上继续回测
+
+    pending_size 为最后一根K线信号产生、尚未成交的入场数量; stop 为下一根K线生效的止损价;
+    last_sell_price 为最后一根K线的 sell_price, 低周期撮合在入场K线上使用;
+    margin 与 funding 为合约撮合的逐仓保证金与当前仓位累计资金费用
+    """
+    cash: float
+    position: float = 0.0
+    cost: float = 0.0
+    pending_size: float = 0.0
+    stop: float = math.nan
+    last_sell_price: float = math.nan
+    margin: float = 0.0
+    funding: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'cash': self.cash,
+            'position': self.position,
+            'cost': self.cost,
+            'pending_size': self.pending_size,
+            # json 不支持 NaN
+            'stop': None if math.isnan(self.stop) else self.stop,
+            'last_sell_price': None if math.isnan(self.last_sell_price) else self.last_sell_price,
+            'margin': self.margin,
+            'funding': self.funding,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EngineState':
+        return cls(
+            cash=data['cash'],
+            position=data.get('position', 0.0),
+            cost=data.get('cost', 0.0),
+            pending_size=data.get('pending_size', 0.0),
+            stop=math.nan if data.get('stop') is None else data['stop'],
+            last_sell_price=math.nan if data.get('last_sell_price') is None else data['last_sell_price'],
+            margin=data.get('margin', 0.0),
+            funding=data.get('funding', 0.0),
+        )
+
+
+@dataclass
+class VectorizedBacktestResult:
+    """向量化回测结果, 交易与权益曲线均为列式数组"""
+    initial_value: float
+    final_value: float
+    trades: Dict[str, np.ndarray] = field(default_factory=dict)
+    equity_curve: Dict[str, np.ndarray] = field(default_factory=dict)
+    entry_signal_count: int = 0
+    sell_signal_count: int = 0
+    # 下钻到低周期数据的K线数
+    intrabar_drilldowns: int = 0
+    # 合约撮合: 累计支付的资金费用(负数为收取)与强平次数
+    funding_paid: float = 0.0
+    liquidations: int = 0
+
+    @property
+    def sell_pnl(self) -> np.ndarray:
+        if not self.trades:
+            return np.empty(0)
+        return self.trades['pnl'][self.trades['action'] == ACTION_SELL]
+
+    @property
+    def net_pnl(self) -> np.ndarray:
+        """每笔完整交易扣除买卖手续费后的收益, 与 backtrader TradeAnalyzer 的 pnl.net 口径一致"""
+        return closed_trade_pnl(self.trades)
+
+    def to_trade_records(self) -> List[TradeRecord]:
+        if not self.trades:
+            return []
+        dates = np.datetime_as_string(self.trades['datetime'], unit='D')
+        return [
+            TradeRecord(
+                datetime=str(dates[i]),
+                action='BUY' if self.trades['action'][i] == ACTION_BUY else 'SELL',
+                price=float(self.trades['price'][i]),
+                size=float(self.trades['size'][i]),
+                value=float(self.trades['value'][i]),
+                commission=float(self.trades['commission'][i]),
+                pnl=float(self.trades['pnl'][i]),
+            )
+            for i in range(dates.shape[0])
+        ]
+
+    def to_backtest_results(self, key: str = '') -> BacktestResults:
+        """汇总方式与 BacktestSystem 相同, 见 build_backtest_results"""
+        return build_backtest_results(self.equity_curve, self.trades, self.initial_value,
+                                      self.entry_signal_count, self.sell_signal_count, key)
+
+
+def simulate_signals(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                     entry_sig: np.ndarray, sell_price: np.ndarray, initial_cash: float = 100000.0,
+                     risk_percent: float = 2.0, commission: float = 0.001,
+                     max_position_size: float = 0.5, intrabar: Optional[IntrabarSimulator] = None,
+                     state: Optional[EngineState] = None):
+    """
+    单品种逐K线撮合, 在 list 上逐根K线循环(不是numpy向量运算), 省去的是backtrader的订单与数据线开销。
+    仓位计算与成交价参照 StrategyForBacktest + backtrader 默认broker, 规则如下:
+
+    - 第i根K线收盘出现入场信号时, 按收盘权益计算仓位: min(权益*risk%, 权益*最大仓位-持仓市值)/收盘价,
+      市价单在第i+1根K线开盘成交, 资金不足时拒单
+    - 持仓期间每根K线收盘按 sell_price 设置止损单, 下一根K线生效:
+      开盘价已低于止损价则按开盘价成交, 否则最低价触及时按止损价成交, 一次卖出全部持仓
+    - 入场单成交的K线上止损单重新挂出, 该K线不触发止损
+    - 手续费为成交金额*commission; 卖出收益按持仓均价计算, 不含手续费
+
+    传入 intrabar 时, 止损在交易周期K线上被触及的K线会下钻到低周期数据确定成交价;
+    入场单与止损单同时生效: 入场K线上沿用已有止损价, 新开仓使用信号K线的 sell_price,
+    与实盘下单时同时挂出止损的方式一致。没有低周期数据的K线仍按上面的规则处理。
+
+    传入 state 时从该状态继续撮合(忽略 initial_cash), 结束后把最新状态写回 state。
+
+    与 BacktestSystem(backtrader) 的结果不完全相同:
+    - 入场单成交的K线上不检查止损; backtrader 中原有的止损单在该K线仍可能先成交, 卖出加仓前的持仓
+    - 任何时候只有一张止损单, 一次卖出全部持仓, 不会出现空头; StrategyForBacktest 在入场与止损同一根K线
+      成交时可能留下多张止损单, 持仓卖完后剩余的止损单继续成交形成空头并不断放大
+    BTC 4H 实盘数据上两者只差一笔交易; 10万根15分钟合成数据(backtest_benchmark)上 backtrader 从第202笔交易
+    开始出现上述空头, 最终权益为NaN, 本引擎为 4998 笔交易, 最终权益约 68,811。
+
+    Returns:
+        tuple: (交易列表, 权益数组, 现金数组, 持仓数组)
+    """
+    n = close.shape[0]
+    o_list, l_list, c_list = open_.tolist(), low.tolist(), close.tolist()
+    sig_list = entry_sig.tolist()
+    stop_list = sell_price.tolist()
+    equity = np.empty(n, dtype=np.float64)
+    cash_arr = np.empty(n, dtype=np.float64)
+    position_arr = np.empty(n, dtype=np.float64)
+    trades = []
+
+    risk = risk_percent / 100
+    if state is None:
+        cash, pos, cost, pending_size, stop, prev_stop = initial_cash, 0.0, 0.0, 0.0, math.nan, math.nan
+    else:
+        cash, pos, cost = state.cash, state.position, state.cost
+        pending_size, stop, prev_stop = state.pending_size, state.stop, state.last_sell_price
+    for i in range(n):
+        o = o_list[i]
+        entry_filled = False
+        if intrabar is not None and pending_size > 0 and pos == 0:
+            if i > 0:
+                stop = stop_list[i - 1]
+            elif prev_stop == prev_stop:
+                stop = prev_stop
+        if pending_size > 0:
+            value = pending_size * o
+            comm = value * commission
+            if value + comm <= cash:
+                cash -= value + comm
+                pos += pending_size
+                cost += value
+                entry_filled = True
+                trades.append((i, ACTION_BUY, o, pending_size, value, comm, 0.0))
+            pending_size = 0.0
+        if pos > 0 and stop == stop and (not entry_filled or intrabar is not None):
+            if intrabar is not None and (o <= stop or l_list[i] <= stop) and intrabar.has_data(i):
+                fill = intrabar.stop_fill(i, stop)
+            elif entry_filled:
+                fill = None
+            else:
+                fill = o if o <= stop else (stop if l_list[i] <= stop else None)
+            if fill is not None:
+                value = pos * fill
+                comm = value * commission
+                pnl = value - cost
+                cash += value - comm
+                trades.append((i, ACTION_SELL, fill, -pos, value, comm, pnl))
+                pos = 0.0
+                cost = 0.0
+
+        c = c_list[i]
+        value_now = cash + pos * c
+        equity[i] = value_now
+        cash_arr[i] = cash
+        position_arr[i] = pos
+
+        if sig_list[i] == 1:
+            target = min(value_now * risk, value_now * max_position_size - pos * c)
+            if target >= c * MIN_TRADE_RATIO:
+                pending_size = target / c
+        stop = stop_list[i] if pos > 0 else math.nan
+    if state is not None:
+        state.cash, state.position, state.cost = cash, pos, cost
+        state.pending_size, state.stop = pending_size, stop
+        state.last_sell_price = stop_list[-1] if n else state.last_sell_price
+    return trades, equity, cash_arr, position_arr
+
+
+def run_vectorized_backtest(df: pd.DataFrame, initial_cash: float = 100000.0, risk_percent: float = 2.0,
+                            commission: float = 0.001, max_position_size: float = 0.5,
+                            intrabar: Optional[IntrabarSimulator] = None,
+                            state: Optional[EngineState] = None,
+                            swap: Optional[Union[SwapConfig, dict]] = None) -> VectorizedBacktestResult:
+    """
+    不经过backtrader, 直接在数组上回测单品种信号, 撮合规则及与 backtrader 的差异见 simulate_signals
+
+    Args:
+        df: 包含 datetime, open, high, low, close, entry_sig, sell_price 的数据
+        initial_cash: 初始资金
+        risk_percent: 单笔风险比例(%)
+        commission: 手续费率
+        max_position_size: 最大仓位占权益比例
+        intrabar: 低周期成交模拟, 为空时只使用交易周期K线
+        state: 上次回测结束时的撮合状态, 传入时只回测 df 中的K线并在其后继续, 结束后写回最新状态
+        swap: 合约撮合参数(或其 to_dict), 传入时按逐仓永续合约计算杠杆、资金费用与强平, 见 swap_broker
+
+    Returns:
+        VectorizedBacktestResult: 回测结果, initial_value 仍为 initial_cash
+    """
+    datetime_arr = pd.to_datetime(df['datetime']).values.astype('datetime64[s]')
+    entry_sig = df['entry_sig'].fillna(0).to_numpy()
+    funding_paid, liquidations = 0.0, 0
+    if swap is not None:
+        if intrabar is not None:
+            raise ValueError("Intrabar fill simulation is not supported with the swap broker")
+        if isinstance(swap, dict):
+            swap = SwapConfig.from_dict(swap)
+        trades, equity, cash, position, funding_paid, liquidations = simulate_swap_signals(
+            df['open'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64), entry_sig, df['sell_price'].to_numpy(dtype=np.float64),
+            swap.bar_funding(datetime_arr), swap, initial_cash, risk_percent, commission, max_position_size, state)
+    else:
+        trades, equity, cash, position = simulate_signals(
+            df['open'].to_numpy(dtype=np.float64), df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64), df['close'].to_numpy(dtype=np.float64),
+            entry_sig, df['sell_price'].to_numpy(dtype=np.float64),
+            initial_cash, risk_percent, commission, max_position_size, intrabar, state)
+
+    trade_arrays = {}
+    if trades:
+        columns = list(zip(*trades))
+        trade_arrays = {
+            'datetime': datetime_arr[np.asarray(columns[0], dtype=np.int64)],
+            'action': np.asarray(columns[1], dtype=np.int8),
+        }
+        for name, values in zip(TRADE_FIELDS[2:], columns[2:]):
+            trade_arrays[name] = np.asarray(values, dtype=np.float64)
+    return VectorizedBacktestResult(
+        initial_value=initial_cash,
+        final_value=float(equity[-1]) if equity.shape[0] else initial_cash,
+        trades=trade_arrays,
+        equity_curve=build_equity_curve(datetime_arr, equity, cash, position),
+        entry_signal_count=int((entry_sig == 1).sum()),
+        sell_signal_count=int(df['sell_sig'].sum()) if 'sell_sig' in df.columns else 0,
+        intrabar_drilldowns=intrabar.drilldowns if intrabar is not None else 0,
+        funding_paid=funding_paid,
+        liquidations=liquidations,
+    )
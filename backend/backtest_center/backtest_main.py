@@ -1,36 +1,263 @@
+import logging
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-from backend.backtest_center.backtest_core.backtest_system import BacktestSystem
+from backend.backtest_center.backtest_core.backtest_cache import backtest_cache, build_fingerprint, hash_dataframe
+from backend.backtest_center.backtest_core.intrabar import IntrabarSimulator
+from backend.backtest_center.backtest_core.backtest_system import BacktestSystem, make_backtest_key, \
+    record_backtest_results, print_results
+from backend.backtest_center.backtest_core.portfolio_engine import portfolio_labels, run_portfolio_backtest
+from backend.backtest_center.backtest_core.result_store import backtest_result_store
+from backend.backtest_center.backtest_core.swap_broker import SwapConfig, funding_rate_path, get_swap_inst_id
+from backend.backtest_center.backtest_core.timeframe_alignment import align_mask
+from backend.backtest_center.backtest_core.vectorized_engine import run_vectorized_backtest
+from backend.backtest_center.models.trade_record import TradeRecord
 from backend.data_object_center.enum_obj import get_interval_by_value
 from backend.data_center.kline_data.kline_data_collector import KlineDataCollector
 from backend.data_object_center.st_instance import StrategyInstance
-from backend.strategy_center.atom_strategy.entry_strategy.dbb_entry_strategy import registry
+from backend.strategy_center.atom_strategy.strategy_pipeline import StrategyPipeline
+from backend.strategy_center.atom_strategy.strategy_registry import registry
+
+logger = logging.getLogger(__name__)
+
+# 回测参数
+BACKTEST_START_TIME = "2023-12-31 08:00:00"
+INITIAL_CASH = 100000.0
+RISK_PERCENT = 2.0
+COMMISSION = 0.001
+
+# 回测引擎
+ENGINE_BACKTRADER = 'backtrader'
+ENGINE_VECTORIZED = 'vectorized'
+
+
+def load_kline_df(trade_pair: str, time_frame: str) -> pd.DataFrame:
+    """读取交易对在指定周期下的K线csv"""
+    interval = get_interval_by_value(time_frame)
+    file_abspath = KlineDataCollector.get_abspath(symbol=trade_pair.split('-')[0], interval=interval)
+    return pd.read_csv(f"{file_abspath}")
+
+
+def get_filter_codes(st: StrategyInstance) -> List[str]:
+    """返回已注册的过滤策略code, 未注册的code跳过"""
+    codes = []
+    for code in (st.filter_st_code or '').split(','):
+        code = code.strip()
+        if not code:
+            continue
+        if not registry.has_strategy(code):
+            logger.warning(f"backtest_main@get_filter_codes, filter strategy {code} not registered, skipped")
+            continue
+        codes.append(code)
+    return codes
 
 
-def backtest_main(st_instance_id):
-    """主函数"""
-    # 创建回测系统实例
-    backtest = BacktestSystem(initial_cash=100000.0, risk_percent=2.0, commission=0.001)
+def check_filter_options(filter_time_frame: Optional[str], apply_filters: bool) -> None:
+    if filter_time_frame and not apply_filters:
+        raise ValueError("filter_time_frame requires apply_filters")
 
+
+def get_filter_mask(df: pd.DataFrame, st: StrategyInstance, pipeline: StrategyPipeline,
+                    filter_time_frame: Optional[str] = None,
+                    filter_df: Optional[pd.DataFrame] = None) -> Optional[np.ndarray]:
+    """
+    高周期过滤策略在基础周期每根K线上是否通过
+
+    filter_time_frame 为空或与策略周期相同时返回None, 由流水线直接在基础周期数据上执行过滤策略;
+    否则在高周期数据上执行, 得到的通过条件按已收盘的高周期K线对齐回基础周期, 不会用到未来数据。
+
+    Args:
+        df: 基础周期数据
+        st: 策略实例
+        pipeline: 策略实例的流水线
+        filter_time_frame: 过滤周期, 如 '1D'
+        filter_df: 过滤周期K线数据, 为空时从csv读取
+    """
+    if not pipeline.filters or not filter_time_frame or filter_time_frame == st.time_frame:
+        return None
+    htf_df = filter_df if filter_df is not None else load_kline_df(st.trade_pair, filter_time_frame)
+    return align_mask(df, st.time_frame, htf_df, filter_time_frame, pipeline.filter_mask(htf_df))
+
+
+def get_backtest_fingerprint(df: pd.DataFrame, st: StrategyInstance, filter_time_frame: Optional[str] = None,
+                             engine: str = ENGINE_BACKTRADER, intrabar_time_frame: Optional[str] = None,
+                             leverage: Optional[float] = None, apply_filters: bool = False) -> str:
+    """根据原始数据、策略代码与回测参数计算缓存key"""
+    st_codes = {
+        'entry': st.entry_st_code,
+        'exit': st.exit_st_code,
+        'filter': st.filter_st_code,
+    }
+    filter_codes = get_filter_codes(st) if apply_filters else []
+    source_hashes = {code: registry.get_source_hash(code)
+                     for code in [st.entry_st_code, st.exit_st_code] + filter_codes if code}
+    params = {
+        'start_time': BACKTEST_START_TIME,
+        'risk_percent': RISK_PERCENT,
+        'apply_filters': apply_filters,
+        'filter_time_frame': filter_time_frame,
+        'engine': engine,
+        'intrabar_time_frame': intrabar_time_frame,
+    }
+    broker = {
+        'initial_cash': INITIAL_CASH,
+        'commission': COMMISSION,
+    }
+    if leverage:
+        broker['swap'] = SwapConfig(leverage=leverage).to_dict()
+    dataset_hash = hash_dataframe(df)
+    if filter_time_frame and filter_time_frame != st.time_frame and filter_codes:
+        dataset_hash += hash_dataframe(load_kline_df(st.trade_pair, filter_time_frame))
+    if intrabar_time_frame:
+        dataset_hash += hash_dataframe(load_kline_df(st.trade_pair, intrabar_time_frame))
+    if leverage:
+        # 资金费率文件更新后需要重新回测
+        funding_file = funding_rate_path(get_swap_inst_id(st.trade_pair))
+        if os.path.exists(funding_file):
+            dataset_hash += hash_dataframe(pd.read_csv(funding_file))
+    return build_fingerprint(dataset_hash, st_codes, source_hashes, params, broker)
+
+
+def prepare_signals(df: pd.DataFrame, st: StrategyInstance, filter_time_frame: Optional[str] = None,
+                    apply_filters: bool = False) -> pd.DataFrame:
+    """执行入场、退出策略生成信号, apply_filters 为True时同时执行过滤策略, 并截取回测区间"""
+    pipeline = StrategyPipeline.from_instance(st, get_filter_codes(st) if apply_filters else [])
+    df = pipeline.run_backtest(df, get_filter_mask(df, st, pipeline, filter_time_frame))
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    return df[df['datetime'] > BACKTEST_START_TIME]
+
+
+def run_vectorized(df: pd.DataFrame, st: StrategyInstance, intrabar_time_frame: Optional[str] = None,
+                   leverage: Optional[float] = None) -> Tuple[dict, List[TradeRecord]]:
+    """使用向量化引擎回测, 结果记录方式与 BacktestSystem.run 相同; 指定 leverage 时按逐仓永续合约撮合"""
+    intrabar = None
+    if intrabar_time_frame:
+        intrabar = IntrabarSimulator(df['datetime'].values, st.time_frame,
+                                     load_kline_df(st.trade_pair, intrabar_time_frame))
+    swap = SwapConfig(leverage=leverage, symbol=st.trade_pair) if leverage else None
+    result = run_vectorized_backtest(df, initial_cash=INITIAL_CASH, risk_percent=RISK_PERCENT,
+                                     commission=COMMISSION, intrabar=intrabar, swap=swap)
+    if intrabar is not None:
+        logger.info(f"backtest_main@run_vectorized, intrabar drilldowns: {result.intrabar_drilldowns}/{len(df)}")
+    if swap is not None:
+        logger.info(f"backtest_main@run_vectorized, swap {leverage}x funding paid: {result.funding_paid:.2f}, "
+                    f"liquidations: {result.liquidations}")
+    key = make_backtest_key(st)
+    backtest_results = result.to_backtest_results(key)
+    trade_records = result.to_trade_records()
+    record_backtest_results(backtest_results, trade_records, result.equity_curve, st, key)
+    print_results(backtest_results)
+    return backtest_results.to_dict(), trade_records
+
+
+def backtest_main(st_instance_id, force_refresh: bool = False,
+                  progress_callback: Optional[Callable[[dict], None]] = None,
+                  filter_time_frame: Optional[str] = None, engine: str = ENGINE_BACKTRADER,
+                  intrabar_time_frame: Optional[str] = None, leverage: Optional[float] = None,
+                  apply_filters: bool = False):
+    """
+    主函数
+
+    Args:
+        st_instance_id: 策略实例id
+        force_refresh: 为True时忽略缓存，强制重新回测
+        progress_callback: 回测进度回调
+        filter_time_frame: 过滤策略使用的周期, 为空时与策略周期相同, 需同时指定 apply_filters
+        engine: backtrader 或 vectorized
+        intrabar_time_frame: 止损成交使用的低周期, 如 '15', 仅 vectorized 引擎支持
+        leverage: 按逐仓永续合约回测的杠杆倍数, 为空时按现货撮合, 仅 vectorized 引擎支持
+        apply_filters: 为True时执行策略实例配置的过滤策略, 默认与原回测一致只执行入场与退出策略
+    """
+    check_filter_options(filter_time_frame, apply_filters)
+    if engine not in (ENGINE_BACKTRADER, ENGINE_VECTORIZED):
+        raise ValueError(f"Unsupported backtest engine: {engine}")
+    if intrabar_time_frame and engine != ENGINE_VECTORIZED:
+        raise ValueError("Intrabar fill simulation requires the vectorized engine")
+    if leverage and engine != ENGINE_VECTORIZED:
+        raise ValueError("Swap backtest requires the vectorized engine")
     # get strategy instance
     st = StrategyInstance.get_st_instance_by_id(st_instance_id)
-    interval = get_interval_by_value(st.time_frame)
     # 准备数据
-    tv = KlineDataCollector()
-    file_abspath = tv.get_abspath(symbol=st.trade_pair.split('-')[0], interval=interval)
-    df = pd.read_csv(f"{file_abspath}")
+    df = load_kline_df(st.trade_pair, st.time_frame)
+
+    # 查询缓存
+    fingerprint = get_backtest_fingerprint(df, st, filter_time_frame, engine, intrabar_time_frame, leverage,
+                                           apply_filters)
+    if not force_refresh:
+        cached = backtest_cache.get(fingerprint)
+        if cached is not None:
+            return cached['results']
 
     # 执行策略生成信号
-    entry_strategy = registry.get_strategy(st.entry_st_code)
-    df = entry_strategy(df, None)
-    exist_strategy = registry.get_strategy(st.exit_st_code)
-    df = exist_strategy(df, None)
-    df['datetime'] = pd.to_datetime(df['datetime'])
-    df = df[df['datetime'] > "2023-12-31 08:00:00"]
+    df = prepare_signals(df, st, filter_time_frame, apply_filters)
 
     # 运行回测
-    return backtest.run(df, plot=True, st=st)
+    if engine == ENGINE_VECTORIZED:
+        results, trade_records = run_vectorized(df, st, intrabar_time_frame, leverage)
+    else:
+        # 创建回测系统实例
+        backtest = BacktestSystem(initial_cash=INITIAL_CASH, risk_percent=RISK_PERCENT, commission=COMMISSION,
+                                  progress_callback=progress_callback)
+        results = backtest.run(df, plot=True, st=st)
+        trade_records = backtest.trade_records
+    backtest_cache.put(fingerprint, {
+        'results': results,
+        'trade_records': [record.to_dict() for record in trade_records],
+    })
+    return results
+
+
+def portfolio_backtest_main(st_instance_ids: List[int], max_gross_exposure: float = 1.0,
+                            max_open_positions: Optional[int] = None,
+                            filter_time_frame: Optional[str] = None, apply_filters: bool = False) -> dict:
+    """
+    多策略实例共享资金的组合回测
+
+    Args:
+        st_instance_ids: 策略实例id列表, 需为同一周期
+        max_gross_exposure: 总持仓市值占组合权益比例上限
+        max_open_positions: 最大同时持仓数
+        filter_time_frame: 过滤策略周期
+        apply_filters: 是否执行过滤策略
+
+    Returns:
+        dict: 组合回测汇总, 包含结果key
+    """
+    check_filter_options(filter_time_frame, apply_filters)
+    instances = [StrategyInstance.get_st_instance_by_id(st_id) for st_id in st_instance_ids]
+    if not instances:
+        raise ValueError("No strategy instance for portfolio backtest")
+    time_frames = {st.time_frame for st in instances}
+    if len(time_frames) > 1:
+        raise ValueError(f"Portfolio backtest requires the same time frame, got {sorted(time_frames)}")
+
+    labels = portfolio_labels([st.trade_pair for st in instances], [st.id for st in instances])
+    frames = {label: prepare_signals(load_kline_df(st.trade_pair, st.time_frame), st, filter_time_frame,
+                                     apply_filters)
+              for label, st in zip(labels, instances)}
+    result = run_portfolio_backtest(frames, initial_cash=INITIAL_CASH, risk_percent=RISK_PERCENT,
+                                    commission=COMMISSION, max_gross_exposure=max_gross_exposure,
+                                    max_open_positions=max_open_positions)
+
+    key = 'PORTFOLIO_' + '_'.join(f'ST{st.id}' for st in instances) + '_' + datetime.now().strftime('%Y%m%d%H%M')
+    backtest_result_store.save_equity_curve(key, result.equity_curve)
+    if result.trades:
+        backtest_result_store.save_arrays(key, 'trades.npz', result.trades)
+    backtest_result_store.save_arrays(key, 'portfolio.npz', {
+        'labels': np.asarray(result.labels),
+        'exposure': result.exposure,
+        'contribution': result.contribution,
+    })
+    summary = result.to_dict()
+    summary['key'] = key
+    return summary
 
 
 if __name__ == '__main__':
-    backtest_main(8)
+    from backend.data_object_center.init_db import migrate_db
 
+    migrate_db()
+    backtest_main(8)
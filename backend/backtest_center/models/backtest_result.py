@@ -12,8 +12,8 @@ class BacktestResults:
     """回测结果数据类"""
     initial_value: float
     final_value: float
-    total_return: float
-    annual_return: float
+    total_return: Optional[float]
+    annual_return: Optional[float]
     sharpe_ratio: Optional[float]
     max_drawdown: float
     max_drawdown_amount: float
@@ -26,6 +26,15 @@ class BacktestResults:
     total_entry_signals: int
     total_sell_signals: int
     key: str
+    # 回测后由权益曲线与交易记录计算的指标, 见 analysis.performance_metrics
+    cagr: Optional[float] = None
+    volatility: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    calmar_ratio: Optional[float] = None
+    max_drawdown_duration: Optional[float] = None  # 天
+    exposure: Optional[float] = None
+    profit_factor: Optional[float] = None
+    expectancy: Optional[float] = None
 
     def to_dict(self) -> dict:
         return {
@@ -44,7 +53,15 @@ class BacktestResults:
             "win_rate": self.win_rate,
             "total_entry_signals": self.total_entry_signals,
             "total_sell_signals": self.total_sell_signals,
-            "key": self.key
+            "key": self.key,
+            "cagr": self.cagr,
+            "volatility": self.volatility,
+            "sortino_ratio": self.sortino_ratio,
+            "calmar_ratio": self.calmar_ratio,
+            "max_drawdown_duration": self.max_drawdown_duration,
+            "exposure": self.exposure,
+            "profit_factor": self.profit_factor,
+            "expectancy": self.expectancy
         }
 
     def format_percentage(self, value: float) -> str:
@@ -1,8 +1,10 @@
-from typing import Optional, Any
-
 import backtrader as bt
 
 from backend.backtest_center.models.trade_record import TradeRecord
+from backend.backtest_center.utils.event_log import (
+    EventLog, LOG_TRADE, EVENT_BUY_CREATED, EVENT_BUY_FILLED, EVENT_SELL_FILLED,
+    EVENT_POSITION_TOO_SMALL, EVENT_STOP_FAILED, EVENT_SUMMARY, EVENT_OPEN_STOP_AT_END,
+)
 
 
 class StrategyForBacktest(bt.Strategy):
@@ -11,7 +13,9 @@ class StrategyForBacktest(bt.Strategy):
     params = (
         ('risk_percent', 2.0),
         ('max_position_size', 0.5),
-        ('debug', True),  # 添加调试标志
+        ('verbosity', LOG_TRADE),  # 事件日志级别, 见 event_log.LOG_*
+        ('progress_callback', None),  # 进度回调, 接收包含当前进度和阶段性指标的dict
+        ('progress_interval', 500),  # 每隔多少根K线回调一次
     )
 
     def __init__(self):
@@ -37,10 +41,12 @@ class StrategyForBacktest(bt.Strategy):
 
         # 调试信息
         self.missed_signals = []
+        # 事件只写入内存缓冲, 回测结束后由 BacktestSystem 统一输出或丢弃
+        self.event_log = EventLog(verbosity=self.p.verbosity)
 
-    def log(self, txt: str, dt: Optional[Any] = None):
-        dt = dt or self.datas[0].datetime.date(0)
-        print(f'{dt.isoformat()} {txt}')
+    def record_event(self, event: int, a=0.0, b=0.0, c=0.0, d=0.0):
+        """记录事件到内存缓冲, 不做格式化和I/O"""
+        self.event_log.record(self.datas[0].datetime[0], event, a, b, c, d)
 
     def notify_order(self, order):
         """订单状态更新处理"""
@@ -67,9 +73,8 @@ class StrategyForBacktest(bt.Strategy):
 
             if order.isbuy():
                 self.buy_price = order.executed.price
-                self.log(f'买入执行 - 价格: {order.executed.price:.2f}, '
-                         f'数量: {order.executed.size:.8f}, '
-                         f'金额: {order.executed.value:.2f}')
+                self.record_event(EVENT_BUY_FILLED, order.executed.price, order.executed.size,
+                                  order.executed.value)
 
                 # 设置初始止损单
                 self.place_stop_order()
@@ -78,11 +83,8 @@ class StrategyForBacktest(bt.Strategy):
                 if self.buy_price:
                     profit = (order.executed.price - self.buy_price) * abs(order.executed.size)
                     trade_record.pnl = profit
-                    self.log(f'卖出执行 - 卖出价格: {order.executed.price:.2f}, '
-                             f'买入价格: {self.buy_price:.2f}, '
-                             f'卖出仓位: {abs(order.executed.size):.8f}, '
-                             f'收益: {profit:.2f}'
-                             f'{"(盈利)" if profit > 0 else "(亏损)"}')
+                    self.record_event(EVENT_SELL_FILLED, order.executed.price, self.buy_price,
+                                      abs(order.executed.size), profit)
 
                     # 更新统计
                     if profit > 0:
@@ -139,8 +141,6 @@ class StrategyForBacktest(bt.Strategy):
                     exectype=bt.Order.StopTrail,
                     trailpercent=TRAIL_PERCENT
                 )
-                self.log(f'设置追踪止损单 - 跟踪比例: {TRAIL_PERCENT * 100}%, '
-                         f'当前价格: {current_price:.2f}')
 
             # 2. 限价止损
             elif USE_STOP:
@@ -153,7 +153,7 @@ class StrategyForBacktest(bt.Strategy):
                 #          f'当前价格: {current_price:.2f}')
 
         except Exception as e:
-            self.log(f'设置止损单失败: {str(e)}')
+            self.record_event(EVENT_STOP_FAILED, str(e))
             self.stop_order = None
 
             # 记录止损设置
@@ -171,6 +171,9 @@ class StrategyForBacktest(bt.Strategy):
         if self.entry_sig[0] == 1:
             self.entry_signal_count += 1
 
+        if self.p.progress_callback is not None and len(self) % self.p.progress_interval == 0:
+            self.report_progress()
+
         current_price = self.dataclose[0]
 
         # 处理入场信号 - 不再检查是否有仓位
@@ -181,9 +184,8 @@ class StrategyForBacktest(bt.Strategy):
             size = self.calculate_position_size(current_price)
 
             if size > 0:
-                self.log(f'创建买入订单 - 价格: {current_price:.2f}, '
-                         f'数量: {size:.8f}, '
-                         f'当前持仓: {self.position.size if self.position else 0}')
+                self.record_event(EVENT_BUY_CREATED, current_price, size,
+                                  self.position.size if self.position else 0)
                 self.entry_order = self.buy(size=size)
 
                 # if self.p.debug:
@@ -212,6 +214,18 @@ class StrategyForBacktest(bt.Strategy):
             #              f'当前价格: {current_price:.2f}, '
             #              f'止损价格: {stop_price:.2f}')
 
+    def report_progress(self):
+        """推送当前进度及阶段性指标"""
+        self.p.progress_callback({
+            'bar': len(self),
+            'total_bars': self.data0.buflen(),
+            'datetime': self.datas[0].datetime.date(0).isoformat(),
+            'value': self.broker.getvalue(),
+            'trade_count': self.trade_count,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+        })
+
     def calculate_position_size(self, price: float) -> float:
         """
         改进的仓位计算:
@@ -236,9 +250,7 @@ class StrategyForBacktest(bt.Strategy):
 
         # 如果可用金额太小，返回0
         if target_trade_value < price * 0.001:  # 最小交易单位
-            if self.p.debug:
-                self.log(f'仓位太小 - 目标交易价值: {target_trade_value:.2f}, '
-                         f'最小要求: {price * 0.001:.2f}')
+            self.record_event(EVENT_POSITION_TOO_SMALL, target_trade_value, price * 0.001)
             return 0
 
         # 计算实际可以购买的数量
@@ -249,27 +261,11 @@ class StrategyForBacktest(bt.Strategy):
     def stop(self):
         """
         策略结束时的统计
-        修复了信号统计的问题
+        入场信号数直接使用 next() 中的计数, 不再回溯整个数据序列
         """
-        # 计算胜率
-        win_rate = (self.winning_trades / self.trade_count * 100) if self.trade_count > 0 else 0
-
-        # 统计信号 - 使用lines的队列方式而不是直接访问数组
-        entry_signals = 0
-        for i in range(0, len(self.data0)):
-            if self.entry_sig[0 - i] == 1:  # 使用相对索引
-                entry_signals += 1
-
-        # 输出最终统计
-        self.log(f'策略结束统计:')
-        self.log(f'总交易次数: {self.trade_count}')
-        self.log(f'盈利交易: {self.winning_trades}')
-        self.log(f'亏损交易: {self.losing_trades}')
-        self.log(f'胜率: {win_rate:.2f}%')
-        self.log(f'入场信号总数: {entry_signals}')
+        self.record_event(EVENT_SUMMARY, self.trade_count, self.winning_trades, self.losing_trades,
+                          self.entry_signal_count)
 
         # 如果需要检查止损单状态
         if self.stop_order:
-            self.log('策略结束时有未完成的止损单')
-            if self.position:
-                self.log(f'最后持仓: {self.position.size:.8f}')
+            self.record_event(EVENT_OPEN_STOP_AT_END, self.position.size if self.position else 0)
@@ -0,0 +1,133 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+
+import backtrader as bt
+
+logger = logging.getLogger(__name__)
+
+# 日志级别
+LOG_SILENT = 0  # 不记录任何事件, 参数搜索/批量回测使用
+LOG_TRADE = 1  # 只记录成交与异常
+LOG_DEBUG = 2  # 记录全部事件
+
+# 事件类型
+EVENT_BUY_CREATED = 1
+EVENT_BUY_FILLED = 2
+EVENT_SELL_FILLED = 3
+EVENT_POSITION_TOO_SMALL = 4
+EVENT_STOP_FAILED = 5
+EVENT_SUMMARY = 6
+EVENT_OPEN_STOP_AT_END = 7
+
+# 各事件的最低记录级别
+EVENT_LEVELS = {
+    EVENT_BUY_CREATED: LOG_DEBUG,
+    EVENT_BUY_FILLED: LOG_TRADE,
+    EVENT_SELL_FILLED: LOG_TRADE,
+    EVENT_POSITION_TOO_SMALL: LOG_DEBUG,
+    EVENT_STOP_FAILED: LOG_TRADE,
+    EVENT_SUMMARY: LOG_TRADE,
+    EVENT_OPEN_STOP_AT_END: LOG_TRADE,
+}
+
+
+def _format_sell(a, b, c, d) -> str:
+    return (f'卖出执行 - 卖出价格: {a:.2f}, 买入价格: {b:.2f}, 卖出仓位: {c:.8f}, '
+            f'收益: {d:.2f}{"(盈利)" if d > 0 else "(亏损)"}')
+
+
+def _format_summary(a, b, c, d) -> str:
+    # a: 总交易次数, b: 盈利交易, c: 亏损交易, d: 入场信号总数
+    win_rate = (b / a * 100) if a > 0 else 0
+    return (f'策略结束统计:\n总交易次数: {a}\n盈利交易: {b}\n亏损交易: {c}\n'
+            f'胜率: {win_rate:.2f}%\n入场信号总数: {d}')
+
+
+def _format_open_stop(a, b, c, d) -> str:
+    text = '策略结束时有未完成的止损单'
+    if a:
+        text += f'\n最后持仓: {a:.8f}'
+    return text
+
+
+# 事件 -> 格式化函数, 参数为事件槽位中的 (a, b, c, d)
+_FORMATTERS = {
+    EVENT_BUY_CREATED: lambda a, b, c, d: f'创建买入订单 - 价格: {a:.2f}, 数量: {b:.8f}, 当前持仓: {c}',
+    EVENT_BUY_FILLED: lambda a, b, c, d: f'买入执行 - 价格: {a:.2f}, 数量: {b:.8f}, 金额: {c:.2f}',
+    EVENT_SELL_FILLED: _format_sell,
+    EVENT_POSITION_TOO_SMALL: lambda a, b, c, d: f'仓位太小 - 目标交易价值: {a:.2f}, 最小要求: {b:.2f}',
+    EVENT_STOP_FAILED: lambda a, b, c, d: f'设置止损单失败: {a}',
+    EVENT_SUMMARY: _format_summary,
+    EVENT_OPEN_STOP_AT_END: _format_open_stop,
+}
+
+EventSlot = Tuple[float, int, object, object, object, object]
+
+
+def format_event(event: int, a=0.0, b=0.0, c=0.0, d=0.0) -> str:
+    """事件格式化为日志文本, 不含日期"""
+    return _FORMATTERS[event](a, b, c, d)
+
+
+class EventLog:
+    """
+    回测热循环中的内存事件缓冲
+
+    next()/notify_order() 中只写入预分配槽位 (K线时间数值, 事件类型, 原始数值),
+    不做字符串格式化和任何I/O; 回测结束后再统一格式化输出或直接丢弃。
+    """
+
+    def __init__(self, verbosity: int = LOG_TRADE, capacity: int = 1024):
+        self.verbosity = verbosity
+        self._slots: List[Optional[EventSlot]] = [None] * max(capacity, 1)
+        self._n = 0
+        # 预先算好当前级别需要记录的事件, 热循环只做一次集合查找
+        self._enabled = frozenset(event for event, level in EVENT_LEVELS.items() if level <= verbosity)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def enabled(self, event: int) -> bool:
+        return event in self._enabled
+
+    def record(self, dt: float, event: int, a=0.0, b=0.0, c=0.0, d=0.0) -> None:
+        """写入一条事件, 未开启的事件直接忽略"""
+        if event not in self._enabled:
+            return
+        n = self._n
+        if n >= len(self._slots):
+            self._slots.extend([None] * len(self._slots))
+        self._slots[n] = (dt, event, a, b, c, d)
+        self._n = n + 1
+
+    def events(self) -> List[EventSlot]:
+        return self._slots[:self._n]
+
+    def format_lines(self) -> List[str]:
+        """将缓冲中的事件格式化为日志文本"""
+        lines = []
+        for dt, event, a, b, c, d in self.events():
+            date_str = bt.num2date(dt).date().isoformat() if dt else ''
+            lines.append(f'{date_str} {format_event(event, a, b, c, d)}')
+        return lines
+
+    def flush(self, writer: Optional[Callable[[str], None]] = print) -> int:
+        """
+        输出并清空缓冲
+
+        Args:
+            writer: 输出函数, 为None时只清空不输出
+
+        Returns:
+            int: 本次处理的事件数
+        """
+        n = self._n
+        if writer is not None:
+            for line in self.format_lines():
+                writer(line)
+        self.clear()
+        return n
+
+    def clear(self) -> None:
+        self._slots[:self._n] = [None] * self._n
+        self._n = 0
@@ -0,0 +1,321 @@
+"""
+回测链路基准测试
+
+在合成行情(随机游走 + 行情状态切换)上分别计时:
+- KlineDataProcessor.add_indicator
+- 每个已注册的入场/过滤/退出策略的回测模式
+- BacktestSystem.run (backtrader) 与 run_vectorized_backtest
+- record_backtest_results
+
+结果写入json文件, 可与历史结果对比发现性能回退:
+    python -m backend.benchmark_center.backtest_benchmark --sizes 1000,100000 \
+        --baseline backend/benchmark_center/results/last.json --tolerance 0.2
+
+数据库写入使用正式库的临时副本, 不会影响 trade_db.db。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backend.benchmark_center.synthetic_data import add_sample_signals, generate_ohlcv
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# 合成数据参数
+SYNTHETIC_FREQ = '15min'
+REGIME_SWITCH_PROB = 0.002
+MEAN_REVERSION = 0.0005
+# 部分策略的回测实现是逐行循环, 超过该长度时跳过
+DEFAULT_MAX_STRATEGY_BARS = 10000
+# backtrader 每根K线约数百微秒, 超过该长度时跳过
+DEFAULT_MAX_BACKTRADER_BARS = 100000
+BENCHMARK_KEY_PREFIX = 'BENCHMARK_'
+# 回测引擎基准使用的信号: 固定间隔入场, sma20 止损, 与 dbb 策略的持仓节奏接近
+ENGINE_ENTRY_EVERY = 40
+ENGINE_STOP_COLUMN = 'sma20'
+
+STATUS_OK = 'ok'
+STATUS_SKIPPED = 'skipped'
+STATUS_ERROR = 'error'
+
+
+def _case(group: str, name: str, bars: int, status: str, times: Optional[List[float]] = None,
+          error: Optional[str] = None) -> dict:
+    case = {'group': group, 'name': name, 'bars': bars, 'status': status, 'error': error}
+    if times:
+        best = min(times)
+        case.update({
+            'repeat': len(times),
+            'best_seconds': best,
+            'mean_seconds': float(np.mean(times)),
+            'us_per_bar': best / bars * 1e6,
+        })
+    return case
+
+
+def _measure(group: str, name: str, bars: int, fn: Callable, make_input: Callable, repeat: int) -> dict:
+    """多次计时取最小值, 输入数据的准备不计入耗时"""
+    times = []
+    try:
+        for _ in range(repeat):
+            arg = make_input()
+            start = time.perf_counter()
+            fn(arg)
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        return _case(group, name, bars, STATUS_ERROR, times, error=f'{type(e).__name__}: {e}')
+    return _case(group, name, bars, STATUS_OK, times)
+
+
+def bench_indicators(df: pd.DataFrame, repeat: int) -> List[dict]:
+    from backend.data_center.kline_data.kline_data_processor import KlineDataProcessor
+    return [_measure('indicator', 'KlineDataProcessor.add_indicator', len(df), KlineDataProcessor.add_indicator,
+                     df.copy, repeat)]
+
+
+def bench_strategies(df: pd.DataFrame, repeat: int, max_bars: int) -> List[dict]:
+    """依次计时全部已注册策略, 退出与过滤策略使用固定间隔的入场信号作为输入"""
+    try:
+        from backend.strategy_center.atom_strategy.strategy_registry import registry
+    except Exception as e:
+        return [_case('strategy', 'registry', len(df), STATUS_ERROR, error=f'{type(e).__name__}: {e}')]
+
+    type_order = {'entry': 0, 'filter': 1, 'exit': 2}
+    configs = sorted(registry.list_strategies(), key=lambda c: type_order.get(c['type'], 3))
+    signal_df = add_sample_signals(df)
+    cases = []
+    seen = set()
+    for config in configs:
+        name = config['name']
+        if name in seen:
+            continue
+        seen.add(name)
+        group = f"strategy.{config['type']}"
+        if len(df) > max_bars:
+            cases.append(_case(group, name, len(df), STATUS_SKIPPED, error=f'bars > {max_bars}'))
+            continue
+        strategy = registry.get_strategy(name)
+        source = df if config['type'] == 'entry' else signal_df
+        cases.append(_measure(group, name, len(df), lambda frame: strategy(frame, None), source.copy, repeat))
+    return cases
+
+
+def bench_engines(df: pd.DataFrame, repeat: int, max_backtrader_bars: int) -> List[dict]:
+    """计时 backtrader 回测、向量化回测与结果落库"""
+    from backend.backtest_center.backtest_core.backtest_system import BacktestSystem, record_backtest_results
+    from backend.backtest_center.backtest_core.result_store import backtest_result_store
+    from backend.backtest_center.backtest_core.vectorized_engine import run_vectorized_backtest
+    from backend.backtest_center.models.backtest_result import BacktestResults
+    from backend.backtest_center.utils.event_log import LOG_SILENT
+    from backend.data_object_center.st_instance import StrategyInstance
+
+    bars = len(df)
+    signal_df = add_sample_signals(df, entry_every=ENGINE_ENTRY_EVERY, stop_column=ENGINE_STOP_COLUMN)
+    cases = [_measure('engine', 'run_vectorized_backtest', bars, run_vectorized_backtest, signal_df.copy, repeat)]
+
+    if bars > max_backtrader_bars:
+        cases.append(_case('engine', 'BacktestSystem.run', bars, STATUS_SKIPPED,
+                           error=f'bars > {max_backtrader_bars}'))
+        cases.append(_case('persist', 'record_backtest_results', bars, STATUS_SKIPPED,
+                           error='depends on BacktestSystem.run'))
+        return cases
+
+    st = StrategyInstance(id=0, name='benchmark', trade_pair='BENCHMARK-USDT')
+    systems = []
+    results = []
+
+    def run_backtrader(frame):
+        system = BacktestSystem(verbosity=LOG_SILENT, event_writer=None)
+        results.append(system.run(frame, st=st))
+        systems.append(system)
+
+    cases.append(_measure('engine', 'BacktestSystem.run', bars, run_backtrader, signal_df.copy, repeat))
+    if not systems:
+        cases.append(_case('persist', 'record_backtest_results', bars, STATUS_SKIPPED,
+                           error='BacktestSystem.run failed'))
+        return cases
+
+    system, summary = systems[-1], results[-1]
+    keys = [summary['key']]
+
+    def record(key):
+        keys.append(key)
+        record_backtest_results(BacktestResults(**{**summary, 'key': key}), system.trade_records,
+                                system.equity_curve, st, key)
+
+    counter = iter(range(repeat))
+    cases.append(_measure('persist', 'record_backtest_results', bars, record,
+                          lambda: f'{BENCHMARK_KEY_PREFIX}{bars}_{next(counter)}', repeat))
+    for key in keys:
+        shutil.rmtree(backtest_result_store.key_dir(key), ignore_errors=True)
+    return cases
+
+
+def _environment() -> dict:
+    import backtrader
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'backtrader': backtrader.__version__,
+        'git_commit': commit,
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat: int = 3, seed: int = 42,
+              max_strategy_bars: int = DEFAULT_MAX_STRATEGY_BARS,
+              max_backtrader_bars: int = DEFAULT_MAX_BACKTRADER_BARS) -> dict:
+    """
+    运行全部基准
+
+    Args:
+        sizes: 合成数据长度列表
+        repeat: 每项重复次数, 取最小耗时
+        seed: 随机种子
+        max_strategy_bars: 策略计时的最大K线数
+        max_backtrader_bars: backtrader 计时的最大K线数
+
+    Returns:
+        dict: 基准结果
+    """
+    from backend.data_center.kline_data.kline_data_processor import KlineDataProcessor
+
+    cases = []
+    for bars in sizes:
+        print(f'benchmark {bars} bars ...')
+        raw = generate_ohlcv(bars, freq=SYNTHETIC_FREQ, regime_switch_prob=REGIME_SWITCH_PROB,
+                             mean_reversion=MEAN_REVERSION, seed=seed)
+        cases.extend(bench_indicators(raw, repeat))
+        df = KlineDataProcessor.add_indicator(raw.copy())
+        cases.extend(bench_strategies(df, repeat, max_strategy_bars))
+        cases.extend(bench_engines(df, repeat, max_backtrader_bars))
+    return {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'environment': _environment(),
+        'config': {
+            'sizes': list(sizes),
+            'repeat': repeat,
+            'seed': seed,
+            'freq': SYNTHETIC_FREQ,
+            'regime_switch_prob': REGIME_SWITCH_PROB,
+            'mean_reversion': MEAN_REVERSION,
+            'max_strategy_bars': max_strategy_bars,
+            'max_backtrader_bars': max_backtrader_bars,
+        },
+        'cases': cases,
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """
+    与基线结果对比, 返回耗时超过 基线*(1+tolerance) 的项
+
+    Returns:
+        List[dict]: 回退项, 包含基线耗时、当前耗时与比值
+    """
+    baseline_cases = {(c['group'], c['name'], c['bars']): c for c in baseline.get('cases', [])
+                      if c['status'] == STATUS_OK}
+    regressions = []
+    for case in report['cases']:
+        base = baseline_cases.get((case['group'], case['name'], case['bars']))
+        if case['status'] != STATUS_OK or base is None or base['best_seconds'] <= 0:
+            continue
+        ratio = case['best_seconds'] / base['best_seconds']
+        if ratio > 1 + tolerance:
+            regressions.append({
+                'group': case['group'],
+                'name': case['name'],
+                'bars': case['bars'],
+                'baseline_seconds': base['best_seconds'],
+                'current_seconds': case['best_seconds'],
+                'ratio': ratio,
+            })
+    return regressions
+
+
+def _isolate_database(work_dir: str) -> None:
+    """把正式库复制到临时目录, 并通过 TRADE_DB_PATH 让本进程使用副本"""
+    if os.getenv('TRADE_DB_PATH'):
+        return
+    from backend._utils import DatabaseUtils
+    db_copy = os.path.join(work_dir, 'trade_db.db')
+    source = DatabaseUtils.get_db_path()
+    if os.path.exists(source):
+        shutil.copyfile(source, db_copy)
+    os.environ['TRADE_DB_PATH'] = db_copy
+
+
+def _print_report(report: dict) -> None:
+    for case in report['cases']:
+        if case['status'] == STATUS_OK:
+            print(f"{case['bars']:>9} {case['group']:<16} {case['name']:<40} "
+                  f"{case['best_seconds']:>10.4f}s {case['us_per_bar']:>10.2f}us/bar")
+        else:
+            print(f"{case['bars']:>9} {case['group']:<16} {case['name']:<40} {case['status']}: {case['error']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='回测链路基准测试')
+    parser.add_argument('--sizes', type=str, default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='合成数据长度, 逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-strategy-bars', type=int, default=DEFAULT_MAX_STRATEGY_BARS)
+    parser.add_argument('--max-backtrader-bars', type=int, default=DEFAULT_MAX_BACKTRADER_BARS)
+    parser.add_argument('--output', type=str, default=None, help='结果json路径, 默认写入 benchmark_center/results')
+    parser.add_argument('--baseline', type=str, default=None, help='基线结果json, 用于检测性能回退')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的耗时增长比例')
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='backtest_benchmark_')
+    try:
+        _isolate_database(work_dir)
+        # 数据库副本可能是旧表结构, 与服务启动时一样先升级
+        from backend.data_object_center.init_db import migrate_db
+        migrate_db()
+        report = run_suite(sizes=[int(s) for s in args.sizes.split(',') if s], repeat=args.repeat,
+                           seed=args.seed, max_strategy_bars=args.max_strategy_bars,
+                           max_backtrader_bars=args.max_backtrader_bars)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR,
+                              f"backtest_benchmark_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    _print_report(report)
+    print(f'results written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        for item in regressions:
+            print(f"REGRESSION {item['bars']} {item['group']} {item['name']}: "
+                  f"{item['baseline_seconds']:.4f}s -> {item['current_seconds']:.4f}s (x{item['ratio']:.2f})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
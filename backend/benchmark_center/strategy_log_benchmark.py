@@ -0,0 +1,88 @@
+"""
+StrategyForBacktest 事件日志开销基准
+
+对比三种模式下 cerebro.run() 的逐K线耗时:
+- legacy:   每个事件立即格式化并print, stop() 回溯整个数据序列统计信号 (旧实现)
+- buffered: 事件写入内存缓冲, 回测结束后统一输出
+- silent:   LOG_SILENT, 热循环不记录任何事件
+
+用法: python -m backend.benchmark_center.strategy_log_benchmark --bars 100000 --output result.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+
+import backtrader as bt
+
+from backend.backtest_center.data_feeds.signal_data import SignalData
+from backend.backtest_center.strategy_for_backtest import StrategyForBacktest
+from backend.backtest_center.utils.event_log import LOG_DEBUG, LOG_SILENT, format_event
+from backend.benchmark_center.synthetic_data import add_sample_signals, generate_ohlcv
+
+
+class LegacyLoggingStrategy(StrategyForBacktest):
+    """模拟旧实现: 事件即时格式化输出, stop() 回溯数据统计信号"""
+
+    def record_event(self, event: int, a=0.0, b=0.0, c=0.0, d=0.0):
+        print(f'{self.datas[0].datetime.date(0).isoformat()} {format_event(event, a, b, c, d)}')
+
+    def stop(self):
+        entry_signals = 0
+        for i in range(0, len(self.data0)):
+            if self.entry_sig[0 - i] == 1:
+                entry_signals += 1
+        self.entry_signal_count = entry_signals
+        super().stop()
+
+
+def _run_once(df, strategy_cls, verbosity: int) -> dict:
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(100000.0)
+    cerebro.broker.setcommission(commission=0.001)
+    cerebro.addstrategy(strategy_cls, verbosity=verbosity)
+    cerebro.adddata(SignalData(dataname=df, datetime='datetime', open='open', high='high', low='low',
+                               close='close', volume='volume', entry_sig='entry_sig',
+                               entry_price='entry_price', sell_sig='sell_sig', sell_price='sell_price'))
+    # 输出重定向到空设备, 只统计格式化与写入本身的开销
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        results = cerebro.run()
+        run_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        events = results[0].event_log.flush(print)
+        flush_seconds = time.perf_counter() - start
+    return {'run_seconds': run_seconds, 'flush_seconds': flush_seconds, 'events': events}
+
+
+def run_benchmark(n_bars: int, repeat: int = 3, seed: int = 42) -> dict:
+    df = add_sample_signals(generate_ohlcv(n_bars, seed=seed))
+    modes = {
+        'legacy': (LegacyLoggingStrategy, LOG_DEBUG),
+        'buffered': (StrategyForBacktest, LOG_DEBUG),
+        'silent': (StrategyForBacktest, LOG_SILENT),
+    }
+    results = {}
+    for name, (strategy_cls, verbosity) in modes.items():
+        # 取多次运行的最小值, 降低噪声
+        runs = [_run_once(df, strategy_cls, verbosity) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['run_seconds'])
+        best['us_per_bar'] = best['run_seconds'] / n_bars * 1e6
+        results[name] = best
+    results['removed_us_per_bar'] = results['legacy']['us_per_bar'] - results['silent']['us_per_bar']
+    return {'bars': n_bars, 'repeat': repeat, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='StrategyForBacktest 事件日志开销基准')
+    parser.add_argument('--bars', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='结果json文件路径')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.bars, args.repeat)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,106 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_START = '2020-01-01 00:00:00'
+DEFAULT_FREQ = '4h'
+
+
+# 行情状态: (名称, 单根K线漂移, 波动率倍数)
+DEFAULT_REGIMES = (
+    ('range', 0.0, 1.0),
+    ('bull', 0.0003, 1.2),
+    ('bear', -0.0003, 1.5),
+    ('high_vol', 0.0, 3.0),
+)
+
+
+def generate_regimes(n_bars: int, switch_prob: float, n_regimes: int,
+                     rng: np.random.Generator) -> np.ndarray:
+    """
+    生成行情状态序列, 每根K线以 switch_prob 的概率切换到另一个随机状态
+
+    Returns:
+        np.ndarray: 每根K线的状态下标
+    """
+    if switch_prob <= 0 or n_regimes <= 1:
+        return np.zeros(n_bars, dtype=np.int64)
+    switches = rng.random(n_bars) < switch_prob
+    switches[0] = False
+    # 每次切换时在其余状态中随机选择, 用累加偏移保证与上一状态不同
+    offsets = np.where(switches, rng.integers(1, n_regimes, size=n_bars), 0)
+    return np.cumsum(offsets) % n_regimes
+
+
+def generate_ohlcv(n_bars: int, start: str = DEFAULT_START, freq: str = DEFAULT_FREQ,
+                   start_price: float = 30000.0, volatility: float = 0.01,
+                   regime_switch_prob: float = 0.0, regimes=DEFAULT_REGIMES,
+                   mean_reversion: float = 0.0, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    生成随机游走的OHLCV数据, 列结构与 kline_data 下的csv一致
+
+    Args:
+        n_bars: K线数量
+        start: 起始时间
+        freq: K线周期
+        start_price: 起始价格
+        volatility: 单根K线收益率标准差
+        regime_switch_prob: 每根K线切换行情状态的概率, 为0时为单一随机游走
+        regimes: 行情状态定义, 见 DEFAULT_REGIMES
+        mean_reversion: 对数价格向起始价回归的速度, 为0时为纯随机游走; 长序列建议设置,
+            避免百万根K线后价格漂移到不合理的量级
+        seed: 随机种子
+
+    Returns:
+        pd.DataFrame: datetime, open, high, low, close, volume
+    """
+    rng = np.random.default_rng(seed)
+    regime = generate_regimes(n_bars, regime_switch_prob, len(regimes), rng)
+    drift = np.array([r[1] for r in regimes])[regime]
+    vol = volatility * np.array([r[2] for r in regimes])[regime]
+    shocks = drift + rng.standard_normal(n_bars) * vol
+    if mean_reversion > 0:
+        # AR(1): x_t = (1 - k) * x_{t-1} + e_t, 用 ewm 的递推实现以避免逐根循环
+        scaled = shocks / mean_reversion
+        # ewm 的首项不参与加权, 直接取 e_0
+        scaled[0] = shocks[0]
+        log_deviation = pd.Series(scaled).ewm(alpha=mean_reversion, adjust=False).mean().to_numpy()
+    else:
+        log_deviation = np.cumsum(shocks)
+    close = start_price * np.exp(log_deviation)
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    # 影线长度与波动率同量级
+    wick = np.abs(rng.standard_normal((2, n_bars))) * vol * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.maximum(np.minimum(open_, close) - wick[1], close * 0.01)
+    volume = rng.lognormal(mean=5.0, sigma=0.5, size=n_bars)
+    return pd.DataFrame({
+        'datetime': pd.date_range(start=start, periods=n_bars, freq=freq),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+    })
+
+
+def add_sample_signals(df: pd.DataFrame, entry_every: int = 20, stop_ratio: float = 0.97,
+                       stop_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    添加固定间隔的入场信号和止损价, 用于不依赖具体策略的回测基准
+
+    Args:
+        df: OHLCV数据
+        entry_every: 每隔多少根K线产生一次入场信号
+        stop_ratio: 未指定 stop_column 时, 止损价相对收盘价的比例
+        stop_column: 作为止损价的指标列, 如 sma20
+    """
+    df = df.copy()
+    df['entry_sig'] = (np.arange(len(df)) % entry_every == 0).astype(np.int64)
+    df['entry_price'] = df['close']
+    df['sell_sig'] = 0
+    df['sell_price'] = df[stop_column] if stop_column else df['close'] * stop_ratio
+    return df
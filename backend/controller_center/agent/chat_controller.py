@@ -3,6 +3,7 @@ from sse_starlette.sse import EventSourceResponse
 import asyncio
 from backend._utils import SSEManager, LogConfig
 from backend.service_center.agent.chat_service import stream_llm
+from backend.strategy_center.atom_strategy.strategy_registry import registry
 from pydantic import BaseModel
 from pathlib import Path
 import re, datetime
@@ -84,7 +85,9 @@ async def adopt(body: AdoptSchema):
     filename = f"{func_name}.py"
     path = target_dir / filename
     path.write_text(code, encoding="utf-8")
-    return {"path": str(path)}
+    # 覆盖已加载的策略时重新导入, 新文件写入清单, 无需重启服务
+    reload_result = registry.reload_changed(persist_manifest=True)
+    return {"path": str(path), "reload": reload_result}
 
 
 # -------------------- 评估任务 Mock --------------------
@@ -1,9 +1,15 @@
 import json
+import os
+from typing import Optional
 
 from fastapi import APIRouter
+from fastapi.responses import FileResponse
+from sse_starlette.sse import EventSourceResponse
 import logging
 
-from backend.controller_center.backtest.backtest_request import BackTestRunRequest
+from backend._utils import SSEManager
+from backend.controller_center.backtest.backtest_request import BackTestRunRequest, BackTestJobCancelRequest, \
+    PortfolioBackTestRequest, BackTestExportRequest, SpotConfigBackTestRequest, BackTestCompareRequest
 from backend.controller_center.backtest.backtest_service import *
 
 # 创建路由器实例
@@ -74,6 +80,52 @@ def get_backtest_detail(key: str):
         }
 
 
+@router.get("/get_monte_carlo")
+def get_monte_carlo(key: str, simulations: int = 10000, method: str = "bootstrap", skip_prob: float = 0.1):
+    try:
+        monte_carlo_result = BacktestService.get_monte_carlo(key, simulations=simulations, method=method,
+                                                             skip_prob=skip_prob)
+        return {
+            "success": True,
+            "data": monte_carlo_result
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.get("/get_equity_curve")
+def get_equity_curve(key: str, max_points: Optional[int] = None):
+    try:
+        curve = BacktestService.get_equity_curve(key, max_points=max_points)
+        return {
+            "success": True,
+            "data": curve
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.post("/compare_backtests")
+def compare_backtests(request: BackTestCompareRequest):
+    try:
+        return {
+            "success": True,
+            "data": BacktestService.compare_backtests(request.keys, baseline=request.baseline,
+                                                      max_points=request.max_points)
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
 @router.get("/list_key")
 def list_key(strategy_id: int, symbol: str):
     try:
@@ -95,7 +147,32 @@ def list_key(strategy_id: int, symbol: str):
 def run_backtest(request: BackTestRunRequest):
     try:
         print(request.strategy_id)
-        run_result = BacktestService.run_backtest(request.strategy_id)
+        run_result = BacktestService.run_backtest(request.strategy_id, force_refresh=request.force_refresh,
+                                                  filter_time_frame=request.filter_time_frame,
+                                                  engine=request.engine,
+                                                  intrabar_time_frame=request.intrabar_time_frame,
+                                                  export_format=request.export_format,
+                                                  leverage=request.leverage,
+                                                  apply_filters=request.apply_filters)
+        return {
+            "success": True,
+            "data": run_result
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.post("/run_portfolio_backtest")
+def run_portfolio_backtest(request: PortfolioBackTestRequest):
+    try:
+        run_result = BacktestService.run_portfolio_backtest(request.strategy_ids,
+                                                            max_gross_exposure=request.max_gross_exposure,
+                                                            max_open_positions=request.max_open_positions,
+                                                            filter_time_frame=request.filter_time_frame,
+                                                            apply_filters=request.apply_filters)
         return {
             "success": True,
             "data": run_result
@@ -107,6 +184,143 @@ def run_backtest(request: BackTestRunRequest):
         }
 
 
+@router.post("/backtest_spot_configs")
+def backtest_spot_configs(request: SpotConfigBackTestRequest):
+    try:
+        results = BacktestService.backtest_spot_configs(request.ccy, config_ids=request.config_ids,
+                                                        configs=request.configs, start=request.start,
+                                                        end=request.end, initial_usdt=request.initial_usdt,
+                                                        initial_qty=request.initial_qty)
+        return {
+            "success": True,
+            "data": results
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.post("/submit_backtest")
+async def submit_backtest(request: BackTestRunRequest):
+    try:
+        job_id = BacktestService.submit_backtest_job(request.strategy_id, force_refresh=request.force_refresh,
+                                                     filter_time_frame=request.filter_time_frame,
+                                                     engine=request.engine,
+                                                     intrabar_time_frame=request.intrabar_time_frame,
+                                                     export_format=request.export_format,
+                                                     leverage=request.leverage,
+                                                     apply_filters=request.apply_filters)
+        return {
+            "success": True,
+            "data": {"job_id": job_id}
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.get("/get_backtest_job")
+def get_backtest_job(job_id: str):
+    try:
+        job = BacktestService.get_backtest_job(job_id)
+        return {
+            "success": True,
+            "data": job
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.get("/backtest_job_stream/{job_id}")
+async def backtest_job_stream(job_id: str):
+    """SSE 订阅回测进度, 任务已结束或通道已被消费时只推送最终状态"""
+    try:
+        # 先校验任务存在, 不存在时不建立SSE连接
+        BacktestService.get_backtest_job(job_id)
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+    async def event_generator():
+        if SSEManager.get_queue(job_id) is None:
+            job = BacktestService.get_backtest_job(job_id)
+            yield {"event": "result", "data": json.dumps({
+                "status": job['status'], "key": job['key'], "error": job['error']})}
+            yield {"event": "end", "data": "{}"}
+            return
+        async for msg in SSEManager.generator(job_id):
+            yield msg
+    return EventSourceResponse(event_generator())
+
+
+@router.post("/cancel_backtest_job")
+def cancel_backtest_job(request: BackTestJobCancelRequest):
+    try:
+        canceled = BacktestService.cancel_backtest_job(request.job_id)
+        return {
+            "success": canceled,
+            "message": "" if canceled else "job is running or finished"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.post("/export_backtest")
+def export_backtest(request: BackTestExportRequest):
+    """后台导出回测结果文件, 通过 get_export_status 查询进度"""
+    try:
+        status = BacktestService.export_backtest(request.key, request.format)
+        return {
+            "success": True,
+            "data": status
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.get("/get_export_status")
+def get_export_status(key: str):
+    try:
+        status = BacktestService.get_export_status(key)
+        return {
+            "success": True,
+            "data": status
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
+@router.get("/download_export")
+def download_export(key: str, name: str = 'trades', format: str = 'csv'):
+    """下载已导出的文件, name 为 trades / equity / summary"""
+    try:
+        path = BacktestService.get_export_file(key, name, format)
+        return FileResponse(path, filename=f"{key}_{os.path.basename(path)}")
+    except Exception as e:
+        return {
+            "success": False,
+            "message": str(e)
+        }
+
+
 if __name__ == '__main__':
     # list_backtest()
     result = run_backtest(strategy_id=8)
@@ -1,5 +1,47 @@
+from typing import Any, Dict, List, Optional
+
 from pydantic import BaseModel
 
 
 class BackTestRunRequest(BaseModel):
     strategy_id: int
+    force_refresh: bool = False
+    apply_filters: bool = False  # 是否执行策略实例配置的过滤策略
+    filter_time_frame: Optional[str] = None  # 过滤策略周期, 为空时与策略周期相同, 需同时指定 apply_filters
+    engine: str = 'backtrader'  # backtrader / vectorized
+    intrabar_time_frame: Optional[str] = None  # 止损成交模拟使用的低周期, 仅 vectorized 引擎
+    export_format: Optional[str] = None  # 回测完成后后台导出结果文件: csv / parquet, 为空不导出
+    leverage: Optional[float] = None  # 按逐仓永续合约回测的杠杆倍数, 仅 vectorized 引擎, 为空按现货撮合
+
+
+class PortfolioBackTestRequest(BaseModel):
+    strategy_ids: List[int]
+    max_gross_exposure: float = 1.0  # 总持仓市值占组合权益比例上限
+    max_open_positions: Optional[int] = None  # 最大同时持仓数
+    apply_filters: bool = False
+    filter_time_frame: Optional[str] = None
+
+
+class BackTestJobCancelRequest(BaseModel):
+    job_id: str
+
+
+class BackTestCompareRequest(BaseModel):
+    keys: List[str]
+    baseline: Optional[str] = None  # 指标差值的基准key, 默认第一个
+    max_points: Optional[int] = 1000  # 返回曲线的最大点数
+
+
+class BackTestExportRequest(BaseModel):
+    key: str
+    format: str = 'csv'  # csv / parquet
+
+
+class SpotConfigBackTestRequest(BaseModel):
+    ccy: str
+    config_ids: Optional[List[int]] = None  # 为空时回测该币种全部限价/止损配置
+    configs: Optional[List[Dict[str, Any]]] = None  # 未保存的候选配置, 传入时忽略 config_ids
+    start: Optional[str] = None
+    end: Optional[str] = None
+    initial_usdt: float = 10000.0
+    initial_qty: Optional[float] = None  # 初始持币数量, 为空时按开始日开盘价买入 initial_usdt
@@ -1,4 +1,15 @@
+import os
+from typing import Optional
+
 from backend.backtest_center.backtest_main import *
+from backend.backtest_center.backtest_core.result_store import backtest_result_store
+from backend.backtest_center.backtest_core.spot_rule_backtest import run_spot_config_backtest
+from backend.backtest_center.backtest_core.backtest_job_manager import backtest_job_manager
+from backend.backtest_center.backtest_core.result_exporter import backtest_result_exporter, check_export_format, \
+    FORMAT_CSV
+from backend.backtest_center.analysis.monte_carlo import run_monte_carlo, METHOD_BOOTSTRAP
+from backend.backtest_center.analysis.backtest_comparison import compare_backtests, DEFAULT_MAX_POINTS
+from backend.backtest_center.analyzers.equity_curve import downsample_equity_curve, equity_curve_to_dict
 from backend.data_object_center.backtest_record import BacktestRecord
 from backend.data_object_center.backtest_result import BacktestResult
 from backend.data_object_center.symbol_instance import SymbolInstance
@@ -37,8 +48,19 @@ class BacktestService:
     #                            'BTC-USDT_ST8_202412020017', 'BTC-USDT_ST8_202412012312']}
 
     @staticmethod
-    def run_backtest(st_instance_id):
-        return backtest_main(st_instance_id)
+    def run_backtest(st_instance_id, force_refresh: bool = False, filter_time_frame: Optional[str] = None,
+                     engine: str = ENGINE_BACKTRADER, intrabar_time_frame: Optional[str] = None,
+                     export_format: Optional[str] = None, leverage: Optional[float] = None,
+                     apply_filters: bool = False):
+        if export_format:
+            check_export_format(export_format)
+        result = backtest_main(st_instance_id, force_refresh=force_refresh, filter_time_frame=filter_time_frame,
+                               engine=engine, intrabar_time_frame=intrabar_time_frame, leverage=leverage,
+                               apply_filters=apply_filters)
+        # 导出在后台线程执行, 接口不等待
+        if export_format and result.get('key'):
+            backtest_result_exporter.submit(result['key'], export_format)
+        return result
     # {'success': True,
     #  'data': {'initial_value': 100000.0, 'final_value': 101801.6119191148, 'total_return': 0.017855752178952206,
     #           'annual_return': 0.013361783830799084, 'sharpe_ratio': -0.11011698955825451,
@@ -47,9 +69,37 @@ class BacktestService:
     #           'win_rate': 36.470588235294116, 'total_entry_signals': 113, 'total_sell_signals': 77,
     #           'key': 'BTC双布林带策略_ST8_202412042237'}}
 
+    @staticmethod
+    def submit_backtest_job(st_instance_id, force_refresh: bool = False, filter_time_frame: Optional[str] = None,
+                            engine: str = ENGINE_BACKTRADER, intrabar_time_frame: Optional[str] = None,
+                            export_format: Optional[str] = None, leverage: Optional[float] = None,
+                            apply_filters: bool = False) -> str:
+        return backtest_job_manager.submit(st_instance_id, force_refresh=force_refresh,
+                                           filter_time_frame=filter_time_frame, engine=engine,
+                                           intrabar_time_frame=intrabar_time_frame, export_format=export_format,
+                                           leverage=leverage, apply_filters=apply_filters)
+
+    @staticmethod
+    def get_backtest_job(job_id: str):
+        job = backtest_job_manager.get(job_id)
+        if job is None:
+            raise KeyError(f"Backtest job {job_id} not found")
+        return job
+
+    @staticmethod
+    def cancel_backtest_job(job_id: str) -> bool:
+        return backtest_job_manager.cancel(job_id)
+
     @staticmethod
     def list_record_by_key(key: str):
-        return BacktestRecord.list_by_key(key)
+        record_list = BacktestRecord.list_by_key(key)
+        # 批量写入的记录不保存摘要字符串, 读取时由同一行的成交价格与数量生成
+        for record in record_list:
+            if record['transaction_result'] is None and record['transaction_price'] is not None:
+                record['transaction_result'] = (f"Price: {record['transaction_price']}, "
+                                                f"Size: {record['transaction_size']}, "
+                                                f"PnL: {record['transaction_pnl']}")
+        return record_list
         # {'success': True, 'data': [
         #     {'id': 784, 'back_test_result_key': 'BTC-USDT_ST8_202412022210', 'transaction_time': '2024-01-01',
         #      'transaction_result': 'Price: 42283.58, Size: -0.04692738269092875, PnL: -15.742259797498917',
@@ -72,6 +122,73 @@ class BacktestService:
     #           'gmt_create': '2024-12-02 22:10:34', 'gmt_modified': '2024-12-02 22:10:34'}}
 
 
+    @staticmethod
+    def load_trade_pnl(key: str) -> list:
+        """获取回测的逐笔平仓收益, 优先读取列式文件"""
+        trades = backtest_result_store.load_trades(key)
+        if trades is not None:
+            pnl = trades['pnl']
+            return pnl[pnl != 0].tolist()
+        return [record['transaction_pnl'] for record in BacktestRecord.list_by_key(key)]
+
+    @staticmethod
+    def get_monte_carlo(key: str, simulations: int = 10000, method: str = METHOD_BOOTSTRAP,
+                        skip_prob: float = 0.1):
+        pnl = BacktestService.load_trade_pnl(key)
+        return run_monte_carlo(pnl, initial_value=INITIAL_CASH, simulations=simulations,
+                               method=method, skip_prob=skip_prob).to_dict()
+
+
+    @staticmethod
+    def get_equity_curve(key: str, max_points: Optional[int] = None):
+        curve = backtest_result_store.load_equity_curve(key)
+        if curve is None:
+            raise KeyError(f"Equity curve of {key} not found")
+        return equity_curve_to_dict(downsample_equity_curve(curve, max_points))
+
+    @staticmethod
+    def compare_backtests(keys: list, baseline: Optional[str] = None,
+                          max_points: Optional[int] = DEFAULT_MAX_POINTS) -> dict:
+        return compare_backtests(keys, summaries=BacktestResult.list_by_keys(keys), baseline=baseline,
+                                 max_points=max_points)
+
+    @staticmethod
+    def run_portfolio_backtest(st_instance_ids, max_gross_exposure: float = 1.0,
+                               max_open_positions: Optional[int] = None,
+                               filter_time_frame: Optional[str] = None, apply_filters: bool = False) -> dict:
+        return portfolio_backtest_main(st_instance_ids, max_gross_exposure=max_gross_exposure,
+                                       max_open_positions=max_open_positions,
+                                       filter_time_frame=filter_time_frame, apply_filters=apply_filters)
+
+    @staticmethod
+    def backtest_spot_configs(ccy: str, config_ids: Optional[list] = None, configs: Optional[list] = None,
+                              start: Optional[str] = None, end: Optional[str] = None,
+                              initial_usdt: float = 10000.0, initial_qty: Optional[float] = None) -> list:
+        return run_spot_config_backtest(ccy, config_ids=config_ids, configs=configs, start=start, end=end,
+                                        initial_usdt=initial_usdt, initial_qty=initial_qty)
+
+    @staticmethod
+    def export_backtest(key: str, fmt: str = FORMAT_CSV) -> dict:
+        """提交后台导出任务, 返回当前导出状态"""
+        backtest_result_exporter.submit(key, fmt)
+        return backtest_result_exporter.get_status(key)
+
+    @staticmethod
+    def get_export_status(key: str) -> dict:
+        status = backtest_result_exporter.get_status(key)
+        if status is None:
+            raise KeyError(f"Export of {key} not found")
+        return status
+
+    @staticmethod
+    def get_export_file(key: str, name: str, fmt: str = FORMAT_CSV) -> str:
+        """已导出文件的路径, 未导出或导出未完成时报错"""
+        path = backtest_result_exporter.export_path(key, name, fmt)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Export file {os.path.basename(path)} of {key} not found")
+        return path
+
+
 if __name__ == '__main__':
     result = BacktestService.get_backtest_detail('BTC-USDT_ST8_202412022210')
     print({
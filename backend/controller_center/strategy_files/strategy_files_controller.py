@@ -4,6 +4,8 @@ from datetime import datetime
 import os
 from typing import List
 
+from backend.strategy_center.atom_strategy.strategy_registry import registry
+
 router = APIRouter()
 
 
@@ -73,6 +75,17 @@ async def update_strategy_file_content(folder: str, filename: str, content: dict
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content['content'])
 
-        return {"message": "File updated successfully"}
+        # 已加载的策略立即重新导入, 导入失败时继续使用修改前的代码
+        reload_result = registry.reload_changed(persist_manifest=True)
+        return {"message": "File updated successfully", "reload": reload_result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reload")
+async def reload_strategy_files():
+    """重新加载源文件有变化的策略模块"""
+    try:
+        return registry.reload_changed(persist_manifest=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, delete, select, Float
+from sqlalchemy import Column, Integer, String, delete, select, Float, text
 from sqlalchemy.ext.declarative import declarative_base
 
 from backend._utils import DatabaseUtils
@@ -15,6 +15,8 @@ class BacktestRecord(Base):
     transaction_time = Column(String, comment='交易时间')
     transaction_result = Column(String, comment='交易结果')
     transaction_pnl = Column(Float(precision=2), comment='交易收益')
+    transaction_price = Column(Float, comment='成交价格')
+    transaction_size = Column(Float, comment='成交数量')
 
     def to_dict(self):
         return {
@@ -22,7 +24,9 @@ class BacktestRecord(Base):
             'back_test_result_key': self.back_test_result_key,
             'transaction_time': self.transaction_time,
             'transaction_result': self.transaction_result,
-            'transaction_pnl': self.transaction_pnl
+            'transaction_pnl': self.transaction_pnl,
+            'transaction_price': self.transaction_price,
+            'transaction_size': self.transaction_size
         }
 
     @classmethod
@@ -32,10 +36,21 @@ class BacktestRecord(Base):
 
     @classmethod
     def list_by_key(cls, back_test_result_key: str) -> list:
-        stmt = select(cls).where(cls.back_test_result_key == back_test_result_key)
+        stmt = select(cls).where(cls.back_test_result_key == back_test_result_key).order_by(cls.id)
         records = session.execute(stmt).scalars().all()
         return [record.to_dict() for record in records]
 
+    @classmethod
+    def ensure_columns(cls):
+        """旧库的 backtest_record 表缺少成交价格与数量列时补齐, 由 init_db.migrate_db 在启动时调用"""
+        existing = {row[1] for row in session.execute(text(f"PRAGMA table_info({cls.__tablename__})"))}
+        if not existing:
+            return
+        for name in ('transaction_price', 'transaction_size'):
+            if name not in existing:
+                session.execute(text(f"ALTER TABLE {cls.__tablename__} ADD COLUMN {name} REAL"))
+        session.commit()
+
     @classmethod
     def get_by_id(cls, id: int):
         stmt = select(cls).where(cls.id == id)
@@ -62,12 +77,31 @@ class BacktestRecord(Base):
         session.commit()
         return result
 
+    @classmethod
+    def bulk_insert(cls, data_list: list) -> int:
+        """一次事务内批量插入回测交易记录"""
+        if not data_list:
+            return 0
+        try:
+            session.bulk_insert_mappings(cls, data_list)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return len(data_list)
+
     @classmethod
     def delete_by_id(cls, id: int):
         stmt = delete(cls).where(cls.id == id)
         session.execute(stmt)
         session.commit()
 
+    @classmethod
+    def delete_by_key(cls, back_test_result_key: str):
+        stmt = delete(cls).where(cls.back_test_result_key == back_test_result_key)
+        session.execute(stmt)
+        session.commit()
+
     @classmethod
     def delete_all(cls):
         stmt = delete(cls)
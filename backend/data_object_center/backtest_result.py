@@ -1,8 +1,8 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Float, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, text
 
 from backend._utils import DatabaseUtils
 
@@ -27,6 +27,22 @@ class BacktestResult(Base):
     profit_total_count = Column(Integer, comment='总收益')
     profit_average = Column(Integer, comment='平均收益')
     profit_rate = Column(Integer, comment='收益率')
+    # 绩效指标, 见 backtest_center.analysis.performance_metrics
+    final_value = Column(Float, comment='最终权益')
+    total_return = Column(Float, comment='总收益率(对数)')
+    annual_return = Column(Float, comment='年化收益率')
+    cagr = Column(Float, comment='复合年化收益率')
+    volatility = Column(Float, comment='年化波动率')
+    sharpe_ratio = Column(Float, comment='夏普比率')
+    sortino_ratio = Column(Float, comment='索提诺比率')
+    calmar_ratio = Column(Float, comment='卡玛比率')
+    max_drawdown = Column(Float, comment='最大回撤(%)')
+    max_drawdown_amount = Column(Float, comment='最大回撤金额')
+    max_drawdown_duration = Column(Float, comment='最长回撤天数')
+    win_rate = Column(Float, comment='胜率(%)')
+    profit_factor = Column(Float, comment='盈亏比')
+    expectancy = Column(Float, comment='单笔期望收益')
+    exposure = Column(Float, comment='持仓时间占比')
     gmt_create = Column(String, nullable=False, comment='生成时间')
     gmt_modified = Column(String, nullable=False, comment='更新时间')
 
@@ -46,6 +62,7 @@ class BacktestResult(Base):
             'profit_total_count': self.profit_total_count,
             'profit_average': self.profit_average,
             'profit_rate': self.profit_rate,
+            **{name: getattr(self, name) for name in METRIC_COLUMNS},
             'gmt_create': self.gmt_create,
             'gmt_modified': self.gmt_modified
         }
@@ -65,6 +82,12 @@ class BacktestResult(Base):
         stmt = select(cls).where(cls.back_test_result_key == key)
         return session.execute(stmt).scalar_one_or_none().to_dict()
 
+    @classmethod
+    def list_by_keys(cls, keys: list) -> dict:
+        """一次查询多个回测的汇总记录, 返回 key -> to_dict()"""
+        results = session.scalars(select(cls).where(cls.back_test_result_key.in_(keys))).all()
+        return {str(result.back_test_result_key): result.to_dict() for result in results}
+
     @classmethod
     def insert_or_update(cls, data: dict):
         # 检查是否已存在相同 strategy_id 的记录
@@ -106,6 +129,24 @@ class BacktestResult(Base):
         ).all()
         return [str(result.back_test_result_key) for result in results]
 
+    @classmethod
+    def ensure_metric_columns(cls):
+        """旧库的 backtest_result 表缺少指标列时补齐, 由 init_db.migrate_db 在启动时调用"""
+        existing = {row[1] for row in session.execute(text(f"PRAGMA table_info({cls.__tablename__})"))}
+        if not existing:
+            return
+        for name in METRIC_COLUMNS:
+            if name not in existing:
+                session.execute(text(f"ALTER TABLE {cls.__tablename__} ADD COLUMN {name} REAL"))
+        session.commit()
+
+
+METRIC_COLUMNS = (
+    'final_value', 'total_return', 'annual_return', 'cagr', 'volatility', 'sharpe_ratio', 'sortino_ratio',
+    'calmar_ratio', 'max_drawdown', 'max_drawdown_amount', 'max_drawdown_duration', 'win_rate',
+    'profit_factor', 'expectancy', 'exposure',
+)
+
 
 if __name__ == '__main__':
     result = BacktestResult.list_key_by_strategy_and_symbol('8', 'BTC-USDT')
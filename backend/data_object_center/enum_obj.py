@@ -204,6 +204,14 @@ class EnumExecSource(Enum):
     AUTO = "auto"
 
 
+class EnumBacktestJobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELED = "canceled"
+
+
 if __name__ == '__main__':
     # 使用示例
     print(EnumSubType.get_description('275'))  # 输出: 价差交易平空
@@ -3,10 +3,17 @@ from backend.data_object_center.strategy_instance import StrategyInstance
 from backend.data_object_center.backtest_result import BacktestResult
 from backend.data_object_center.backtest_record import BacktestRecord
 
+def migrate_db():
+    """升级旧库的表结构, 服务与调度器启动时调用, 也可以单独执行: python -m backend.data_object_center.init_db"""
+    BacktestResult.ensure_metric_columns()
+    BacktestRecord.ensure_columns()
+
+
 def init_db():
     """初始化数据库，创建所有表"""
     # 创建所有表
     Base.metadata.create_all(engine)
+    migrate_db()
     
     # 添加测试数据
     session = Session()
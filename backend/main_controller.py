@@ -12,6 +12,7 @@ from backend.controller_center.balance.balance_controller import router as balan
 from backend.controller_center.backtest.backtest_controller import router as backtest_router
 from backend.controller_center.strategy_files.strategy_files_controller import router as strategy_files_router
 from backend.controller_center.record.record_controller import router as record_router
+from backend.data_object_center.init_db import migrate_db
 import uvicorn
 
 
@@ -40,6 +41,11 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def upgrade_db():
+    migrate_db()
+
+
 @app.get("/")
 async def read_root():
     return {"message": "Hello, FastAPI!", "environment": settings.ENV}
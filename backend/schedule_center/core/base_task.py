@@ -104,6 +104,8 @@ class BaseTask(ABC):
 
             return result
 
+        return wrapper
+
     def execute_chain(self) -> TaskResult:
         self.logger.info(f"Starting execution of task: {self.name}")
 
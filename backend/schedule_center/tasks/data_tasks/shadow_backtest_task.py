@@ -0,0 +1,41 @@
+from backend.schedule_center.core.base_task import BaseTask, TaskResult, TaskConfig
+
+
+class ShadowBacktestTask(BaseTask):
+    """数据刷新后增量更新所有生效策略实例的影子回测"""
+
+    def __init__(self, name: str = "shadow_backtest"):
+        config = TaskConfig(
+            timeout=600,
+            max_retries=1,
+            retry_delay=30,
+            required_success=False
+        )
+        super().__init__(name, config)
+
+    def execute(self) -> TaskResult:
+        try:
+            # 在任务内导入, 调度器启动时不加载回测依赖
+            from backend.backtest_center.backtest_core.incremental import refresh_shadow_backtests
+
+            self.logger.info("开始更新影子回测...")
+            summaries = refresh_shadow_backtests()
+            failed = [summary for summary in summaries if summary.get('error')]
+            self.logger.info(f"影子回测更新完成: {len(summaries) - len(failed)} 成功, {len(failed)} 失败")
+            return TaskResult(
+                success=not failed,
+                message="影子回测更新完成" if not failed else f"{len(failed)} 个策略实例影子回测失败",
+                data={"summaries": summaries}
+            )
+        except Exception as e:
+            self.logger.error(f"影子回测更新失败: {str(e)}", exc_info=True)
+            return TaskResult(
+                success=False,
+                message=f"影子回测更新失败: {str(e)}"
+            )
+
+
+if __name__ == '__main__':
+    task = ShadowBacktestTask()
+    result = task.execute()
+    print(result.to_dict())
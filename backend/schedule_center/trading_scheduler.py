@@ -4,8 +4,10 @@ from apscheduler.triggers.cron import CronTrigger
 from backend.schedule_center.monitoring.schedule_monitor import SchedulerMonitor
 from backend.schedule_center.core.task_chain import TaskChain
 from backend.schedule_center.tasks.data_tasks.kline_data_fetch_task import TradeDataFetchTask
-from backend.schedule_center.tasks.trade_tasks.spot_main_task import SpotMainTask
+from backend.schedule_center.tasks.data_tasks.shadow_backtest_task import ShadowBacktestTask
 from backend.schedule_center.tasks.trade_tasks.swap_main_task import SwapMainTask
+from backend.strategy_center.atom_strategy.strategy_registry import registry
+from backend.data_object_center.init_db import migrate_db
 import logging
 
 
@@ -33,18 +35,27 @@ class TradingScheduler:
         # 创建任务
         data_fetch_task = TradeDataFetchTask()
 
-        spot_main_task = SpotMainTask()
-
-        # 创建任务链
-        timing_task_chain = TaskChain("morning_tasks", [spot_main_task])
+        # 早上的现货下单任务链暂不调度: 之前 BaseTask.with_retry 没有返回包装函数, 任务链从未真正执行过,
+        # 修复后调度它会开始实盘下单, 需单独评审后再启用
+        # spot_main_task = SpotMainTask()
+        # timing_task_chain = TaskChain("morning_tasks", [spot_main_task])
+        # self.scheduler.add_job(
+        #     timing_task_chain.execute,
+        #     CronTrigger(hour=8, minute=0, second=0),
+        #     id='morning_chain',
+        #     name='Morning Trading Tasks',
+        #     misfire_grace_time=300  # 5分钟的容错时间
+        # )
 
-        # 添加到调度器
+        # 影子回测: 先刷新K线数据, 刷新成功后只回测新增K线
+        shadow_backtest_task = ShadowBacktestTask()
+        shadow_task_chain = TaskChain("shadow_backtest_tasks", [data_fetch_task, shadow_backtest_task])
         self.scheduler.add_job(
-            timing_task_chain.execute,
-            CronTrigger(hour=8, minute=0, second=0),
-            id='morning_chain',
-            name='Morning Trading Tasks',
-            misfire_grace_time=300  # 5分钟的容错时间
+            shadow_task_chain.execute,
+            CronTrigger(hour=8, minute=30, second=0),
+            id='shadow_backtest',
+            name='Shadow Backtests',
+            misfire_grace_time=600
         )
 
         # # 添加到调度器
@@ -106,14 +117,29 @@ class TradingScheduler:
             self.logger.error(f"Failed to setup periodic tasks: {str(e)}")
             raise
 
+    def setup_strategy_reload(self):
+        """策略文件热加载: 每5秒检查策略源文件, 只重新导入有变化的模块, 不中断策略循环"""
+        self.scheduler.add_job(
+            registry.reload_changed,
+            CronTrigger(second='*/5'),
+            id='strategy_reload',
+            name='Strategy Hot Reload',
+            max_instances=1
+        )
+        self.logger.info("Strategy hot reload task scheduled successfully")
+
     def start(self):
         """启动调度器"""
         try:
             self.logger.info("Starting trading scheduler...")
+            # 升级旧库的表结构
+            migrate_db()
             # 设置早上八点的定时任务
             self.setup_timing_tasks()
             # 设置周期执行的调度任务
             self.setup_periodic_tasks()
+            # 策略文件修改后自动重新加载
+            self.setup_strategy_reload()
 
             # 启动调度器
             self.scheduler.start()
@@ -12,11 +12,8 @@ SYSTEM_PROMPT = """
 from backend.strategy_center.atom_strategy.strategy_imports import *
 # 将项目根目录添加到Python解释器的搜索路径中
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-marketDataAPI = MarketData.MarketAPI(flag=EnumTradeType.PRODUCT.value)
-publicDataAPI = PublicData.PublicAPI(flag=EnumTradeType.PRODUCT.value)
-okx = OKXAPIWrapper()
-price_collector = OKXTickerService()
-tv = KlineDataCollector()
+# 下单时才创建, 导入策略模块不连接交易所
+price_collector = LazyClient(create_price_collector)
 ```
 注意！重要！ 这些内容要完全保持一致
 
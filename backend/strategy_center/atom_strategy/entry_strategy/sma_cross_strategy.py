@@ -1,11 +1,8 @@
 from backend.strategy_center.atom_strategy.strategy_imports import *
 # 将项目根目录添加到Python解释器的搜索路径中
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-marketDataAPI = MarketData.MarketAPI(flag=EnumTradeType.PRODUCT.value)
-publicDataAPI = PublicData.PublicAPI(flag=EnumTradeType.PRODUCT.value)
-okx = OKXAPIWrapper()
-price_collector = OKXTickerService()
-tv = KlineDataCollector()
+# 下单时才创建, 导入策略模块不连接交易所
+price_collector = LazyClient(create_price_collector)
 
 @registry.register(name="sma_cross_strategy", desc="SMA10 and SMA20 Cross Strategy", side="both", type="entry_exit")
 def sma_cross_strategy(df: pd.DataFrame, stIns: Optional[StrategyInstance]):
@@ -14,69 +11,50 @@ def sma_cross_strategy(df: pd.DataFrame, stIns: Optional[StrategyInstance]):
     else:
         return sma_cross_strategy_live(df, stIns)
 
-def sma_cross_strategy_backtest(df: pd.DataFrame):
-    # Initialize signal columns
-    df['entry_sig'] = 0
-    df['entry_price'] = 0
-    df['exit_sig'] = 0
-    df['exit_price'] = 0
-
-    # Calculate SMAs
-    df['SMA10'] = df['close'].rolling(window=10).mean()
-    df['SMA20'] = df['close'].rolling(window=20).mean()
-
-    # Create conditions for signals
-    buy_condition = (df['SMA10'].shift(1) < df['SMA20'].shift(1)) & (df['SMA10'] > df['SMA20'])
-    sell_condition = (df['SMA10'].shift(1) > df['SMA20'].shift(1)) & (df['SMA10'] < df['SMA20'])
-
-    # Debug information
-    df['debug_buy_condition'] = buy_condition
-    df['debug_sell_condition'] = sell_condition
+SMA_CROSS_SERIES = ('close', 'close_sma10', 'close_sma20', 'close_sma10@1', 'close_sma20@1')
 
-    # Set buy signals
-    df.loc[buy_condition, 'entry_sig'] = 1
-    df.loc[buy_condition, 'entry_price'] = df.loc[buy_condition, 'close']
 
-    # Set sell signals
-    df.loc[sell_condition, 'exit_sig'] = 1
-    df.loc[sell_condition, 'exit_price'] = df.loc[sell_condition, 'close']
+def sma_cross_strategy_backtest(df: pd.DataFrame):
+    """返回写入信号列的新DataFrame, 均线由共用的派生序列计算, 不向传入数据写入临时列"""
+    cols = SeriesFrame(df).compute(SMA_CROSS_SERIES)
+    sma10, sma20 = cols['close_sma10'], cols['close_sma20']
 
-    # Clean up temporary columns
-    df.drop(['debug_buy_condition', 'debug_sell_condition'], axis=1, inplace=True)
+    # Create conditions for signals
+    buy_condition = (cols['close_sma10@1'] < cols['close_sma20@1']) & (sma10 > sma20)
+    sell_condition = (cols['close_sma10@1'] > cols['close_sma20@1']) & (sma10 < sma20)
 
-    return df
+    out = df.copy(deep=False)
+    out['entry_sig'] = buy_condition.astype(np.int64)
+    out['entry_price'] = np.where(buy_condition, cols['close'], 0.0)
+    out['exit_sig'] = sell_condition.astype(np.int64)
+    out['exit_price'] = np.where(sell_condition, cols['close'], 0.0)
+    return out
 
 def sma_cross_strategy_live(df: pd.DataFrame, stIns: StrategyInstance) -> StrategyExecuteResult:
     res = StrategyExecuteResult()
-    if not df.empty:
-        df['signal'] = 'no_sig'
-        
-        # Calculate SMAs for the most recent data
-        if len(df) >= 20:  # Ensure enough data for 20 periods
-            df['SMA10'] = df['close'].rolling(window=10).mean()
-            df['SMA20'] = df['close'].rolling(window=20).mean()
-            
-            # Check for buy signal
-            if df.iloc[-2]['SMA10'] < df.iloc[-2]['SMA20'] and df.iloc[-1]['SMA10'] > df.iloc[-1]['SMA20']:
-                df.loc[df.index[-1], 'signal'] = EnumSide.BUY.value
+    # Ensure enough data for 20 periods
+    if not df.empty and len(df) >= 20:
+        # 最后两根K线(含未收盘K线)上的均线
+        cols = SeriesFrame.window(df, SMA_CROSS_SERIES)
+        sma10, sma20 = cols['close_sma10'], cols['close_sma20']
+        side = None
 
-            # Check for sell signal
-            elif df.iloc[-2]['SMA10'] > df.iloc[-2]['SMA20'] and df.iloc[-1]['SMA10'] < df.iloc[-1]['SMA20']:
-                df.loc[df.index[-1], 'signal'] = EnumSide.SELL.value
+        # Check for buy signal
+        if cols['close_sma10@1'][-1] < cols['close_sma20@1'][-1] and sma10[-1] > sma20[-1]:
+            side = EnumSide.BUY
+
+        # Check for sell signal
+        elif cols['close_sma10@1'][-1] > cols['close_sma20@1'][-1] and sma10[-1] < sma20[-1]:
+            side = EnumSide.SELL
+
+        if side is not None:
+            return process_signal(df, stIns, res, side, exit_price=cols['close_sma20@1'][-1])
 
-            # If buy signal is generated
-            if df.iloc[-1]['signal'] == EnumSide.BUY.value:
-                return process_signal(df, stIns, res, EnumSide.BUY)
-            
-            # If sell signal is generated
-            elif df.iloc[-1]['signal'] == EnumSide.SELL.value:
-                return process_signal(df, stIns, res, EnumSide.SELL)
-    
     print("sma_cross_strategy_live#execute result: no signal")
     res.signal = False
     return res
 
-def process_signal(df, stIns, res, side):
+def process_signal(df, stIns, res, side, exit_price):
     # Check if loss_per_trans is valid
     if stIns.loss_per_trans is None or stIns.loss_per_trans <= 0:
         print(f"sma_cross_strategy_live#execute result: loss_per_trans ({stIns.loss_per_trans}) is invalid, no signal")
@@ -115,7 +93,7 @@ def process_signal(df, stIns, res, side):
     res.signal = True
     res.side = side.value
     res.pos_side = EnumPosSide.LONG.value if side == EnumSide.BUY else EnumPosSide.SHORT.value
-    res.exit_price = str(df.iloc[-2]['SMA20'])
+    res.exit_price = str(exit_price)
     res.interval = stIns.time_frame
     res.st_inst_id = stIns.id
     print(f"sma_cross_strategy_live#execute result: {stIns.trade_pair} position is: {position}")
@@ -1,14 +1,11 @@
 import os
 import sys
 from typing import Optional
+import numpy as np
 import pandas as pd
 from backend.data_object_center.st_instance import StrategyInstance
 from backend.data_object_center.enum_obj import EnumTradeType, EnumSide, EnumPosSide
-from backend.service_center.okx_service.okx_ticker_service import OKXTickerService
 from backend.strategy_center.strategy_result import StrategyExecuteResult
-from backend.data_center.kline_data.kline_data_collector import KlineDataCollector
 from backend.strategy_center.atom_strategy.strategy_registry import registry
-import okx.PublicData as PublicData
-import okx.MarketData as MarketData
-from backend.api_center.okx_api.okx_main import OKXAPIWrapper
-from backend.strategy_center.atom_strategy.strategy_utils import StrategyUtils
+from backend.strategy_center.atom_strategy.strategy_series import SeriesFrame
+from backend.strategy_center.atom_strategy.strategy_utils import StrategyUtils, LazyClient, create_price_collector
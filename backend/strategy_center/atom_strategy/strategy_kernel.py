@@ -0,0 +1,166 @@
+"""
+回测与实盘共用的策略计算核
+
+策略只需在数组上定义一次信号(每根K线是否满足条件), 框架负责两种模式:
+
+- 回测(stIns 为空): 在全部历史上计算, 入场策略写入 entry_sig/entry_price, 过滤策略把不满足条件的 entry_sig 置0
+- 实盘: 只取最后一根已收盘K线(df.iloc[-2], 最后一行为未收盘K线)及其前 lookback-1 根计算该K线的值,
+  同一交易对与周期下同一根K线的结果缓存复用, 10秒轮询中重复执行时不再计算
+
+信号函数必须是因果的: 第i根K线的值只依赖第 i-lookback+1..i 根K线, 这样尾部窗口与全量计算的结果一致。
+cols 为 strategy_series.SeriesFrame, requires 中声明的派生序列由其计算并在同一数据上的策略之间共用,
+所需K线数由 requires 自动推算, 与 lookback 取较大值。
+
+    @registry.register_kernel(name="xxx_entry", desc="...", side="long", type="entry",
+                              requires=('close', 'upper_band1', 'close@1', 'upper_band1@1'), live_result=build_order)
+    def xxx_entry(cols):
+        return (cols['close'] > cols['upper_band1']) & (cols['close@1'] < cols['upper_band1@1'])
+"""
+import functools
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.strategy_center.atom_strategy.strategy_series import SeriesFrame, plan_lookback
+from backend.strategy_center.strategy_result import StrategyExecuteResult
+
+# 实盘数据最后一行为未收盘K线, 信号在倒数第二行(最后一根已收盘K线)上计算
+LIVE_SIGNAL_OFFSET = 2
+
+KERNEL_TYPE_ENTRY = 'entry'
+KERNEL_TYPE_FILTER = 'filter'
+
+
+@dataclass
+class StrategyKernel:
+    """
+    策略计算核
+
+    signal_fn: 序列名 -> 只读float64数组(SeriesFrame), 返回逐K线的bool数组
+    lookback: 计算一根K线所需的K线数(含该K线), 未声明 requires 时使用
+    live_result: 入场策略实盘满足信号时生成下单结果, 签名 (df, stIns) -> StrategyExecuteResult
+    requires: 信号函数用到的序列名, 用于推算所需K线数与共用计算
+    """
+    name: str
+    type: str
+    signal_fn: Callable[[Dict[str, np.ndarray]], np.ndarray]
+    lookback: int = 1
+    live_result: Optional[Callable] = None
+    requires: Tuple[str, ...] = ()
+
+    @functools.cached_property
+    def total_lookback(self) -> int:
+        """计算一根K线信号实际所需的K线数"""
+        return max(self.lookback, plan_lookback(self.requires))
+
+    def columns(self, df: pd.DataFrame, start: int = 0, stop: Optional[int] = None) -> SeriesFrame:
+        return SeriesFrame(df, start, stop)
+
+    def compute(self, df: pd.DataFrame, frame: Optional[SeriesFrame] = None) -> np.ndarray:
+        """全部历史上的信号, frame 为同一数据上共用的序列"""
+        return np.asarray(self.signal_fn(frame if frame is not None else self.columns(df)), dtype=bool)
+
+    def compute_at(self, df: pd.DataFrame, index: int, frame: Optional[SeriesFrame] = None) -> bool:
+        """
+        只用第 index 根K线及其前 total_lookback-1 根计算该K线的信号
+
+        传入的 frame 必须结束于第 index 根K线, 且至少包含 total_lookback 根K线
+        """
+        if frame is None:
+            frame = self.columns(df, max(0, index - self.total_lookback + 1), index + 1)
+        return bool(np.asarray(self.signal_fn(frame), dtype=bool)[-1])
+
+    def run_backtest(self, df: pd.DataFrame, frame: Optional[SeriesFrame] = None) -> pd.DataFrame:
+        """返回写入信号列的新DataFrame, 不修改传入的数据"""
+        mask = self.compute(df, frame)
+        out = df.copy(deep=False)
+        if self.type == KERNEL_TYPE_ENTRY:
+            out['entry_sig'] = mask.astype(np.int64)
+            out['entry_price'] = np.where(mask, df['close'].to_numpy(dtype=np.float64), 0.0)
+        elif 'entry_sig' in df.columns:
+            out['entry_sig'] = np.where(mask, df['entry_sig'].to_numpy(), 0)
+        return out
+
+    def evaluate_live(self, df: pd.DataFrame, cache_key: Optional[Tuple] = None,
+                      frame: Optional[SeriesFrame] = None) -> bool:
+        """最后一根已收盘K线上的信号, 传入 cache_key 时按K线时间缓存; frame 须结束于该K线"""
+        index = len(df) - LIVE_SIGNAL_OFFSET
+        if index < 0:
+            return False
+        if cache_key is None:
+            return self.compute_at(df, index, frame)
+        bar_time = str(df['datetime'].iloc[index])
+        cached = kernel_cache.get(self.name, cache_key, bar_time)
+        if cached is not None:
+            return cached
+        value = self.compute_at(df, index, frame)
+        kernel_cache.put(self.name, cache_key, bar_time, value)
+        return value
+
+
+class KernelCache:
+    """实盘信号缓存: (策略, 交易对与周期) -> 最近一根已计算K线的时间与结果"""
+
+    def __init__(self):
+        self._values: Dict[Tuple[str, Tuple], Tuple[str, bool]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key: Tuple, bar_time: str) -> Optional[bool]:
+        entry = self._values.get((name, key))
+        if entry is not None and entry[0] == bar_time:
+            return entry[1]
+        return None
+
+    def put(self, name: str, key: Tuple, bar_time: str, value: bool) -> None:
+        with self._lock:
+            self._values[(name, key)] = (bar_time, value)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """清除某个策略(为空时全部)的缓存, 策略代码变更后调用"""
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                for cache_key in [k for k in self._values if k[0] == name]:
+                    del self._values[cache_key]
+
+
+def live_cache_key(stIns) -> Tuple:
+    return stIns.trade_pair, stIns.time_frame
+
+
+def live_frame(df: pd.DataFrame, lookback: int) -> SeriesFrame:
+    """实盘信号K线(最后一根已收盘K线)结束的尾部序列, 同一交易对与周期上的策略共用"""
+    stop = max(0, len(df) - LIVE_SIGNAL_OFFSET + 1)
+    return SeriesFrame(df, max(0, stop - lookback), stop)
+
+
+def build_kernel_strategy(kernel: StrategyKernel) -> Callable:
+    """
+    生成注册到 StrategyRegistry 的策略函数, 签名与其他策略相同 (df, stIns)
+
+    入场策略实盘返回 StrategyExecuteResult, 过滤策略实盘返回bool
+    """
+
+    def strategy(df: pd.DataFrame, stIns=None):
+        if stIns is None:
+            return kernel.run_backtest(df)
+        signal = not df.empty and kernel.evaluate_live(df, live_cache_key(stIns))
+        if kernel.type == KERNEL_TYPE_FILTER:
+            return signal
+        if signal and kernel.live_result is not None:
+            return kernel.live_result(df, stIns)
+        res = StrategyExecuteResult()
+        res.signal = signal
+        print(f"{kernel.name}#execute result: {'signal' if signal else 'no signal'}")
+        return res
+
+    functools.update_wrapper(strategy, kernel.signal_fn)
+    strategy._kernel = kernel
+    return strategy
+
+
+kernel_cache = KernelCache()
@@ -0,0 +1,167 @@
+"""
+策略实例的入场、过滤、退出策略流水线
+
+计算核策略声明的派生序列合并后按依赖排序(plan), 在同一个 SeriesFrame 上每个序列只计算一次, 各策略共用;
+计算核只返回信号, 由流水线一次性写入新的DataFrame, 传入的K线数据不会被修改。
+未改写为计算核的策略仍按 (df, stIns) 调用, 回测时在流水线自己的副本上执行。
+
+    pipeline = StrategyPipeline.from_instance(st)
+    df = pipeline.run_backtest(kline_df)                  # 回测
+    result = pipeline.evaluate_live(kline_df, st)         # 实盘, 入场信号且全部过滤通过时 result.signal 为True
+
+同一交易对与周期上的多个实例共用 live_group_frame 与 signals 字典, 每个入场与过滤策略只计算一次。
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.strategy_center.atom_strategy.strategy_kernel import KERNEL_TYPE_ENTRY, StrategyKernel, \
+    live_cache_key, live_frame
+from backend.strategy_center.atom_strategy.strategy_registry import registry
+from backend.strategy_center.atom_strategy.strategy_series import SeriesFrame, plan_series
+from backend.strategy_center.strategy_result import StrategyExecuteResult
+
+
+def parse_filter_codes(filter_st_code: Optional[str]) -> List[str]:
+    """逗号分隔的过滤策略code"""
+    return [code.strip() for code in (filter_st_code or '').split(',') if code.strip()]
+
+
+class StrategyPipeline:
+
+    def __init__(self, entry_code: Optional[str], filter_codes: Sequence[str] = (), exit_code: Optional[str] = None):
+        self.entry_code = entry_code
+        self.filter_codes = list(filter_codes)
+        self.exit_code = exit_code
+        self.entry = registry.get_strategy(entry_code) if entry_code else None
+        self.filters = [registry.get_strategy(code) for code in self.filter_codes]
+        self.exit = registry.get_strategy(exit_code) if exit_code else None
+
+    @classmethod
+    def from_instance(cls, st, filter_codes: Optional[Sequence[str]] = None) -> 'StrategyPipeline':
+        """filter_codes 为空时使用实例配置的全部过滤策略"""
+        if filter_codes is None:
+            filter_codes = parse_filter_codes(st.filter_st_code)
+        return cls(st.entry_st_code, filter_codes, st.exit_st_code)
+
+    @staticmethod
+    def kernel_of(strategy: Optional[Callable]) -> Optional[StrategyKernel]:
+        return getattr(strategy, '_kernel', None)
+
+    def kernels(self) -> List[StrategyKernel]:
+        strategies = [self.entry] + self.filters + [self.exit]
+        return [kernel for kernel in map(self.kernel_of, strategies) if kernel is not None]
+
+    def plan(self) -> List[str]:
+        """全部计算核所需序列的计算顺序, 每个序列只出现一次"""
+        return plan_series([name for kernel in self.kernels() for name in kernel.requires])
+
+    @property
+    def lookback(self) -> int:
+        """实盘计算信号K线所需的K线数"""
+        return max((kernel.total_lookback for kernel in self.kernels()), default=1)
+
+    def filter_mask(self, df: pd.DataFrame, frame: Optional[SeriesFrame] = None) -> np.ndarray:
+        """全部过滤策略在每根K线上是否通过"""
+        frame = frame if frame is not None else SeriesFrame(df).compute(self.plan())
+        passed = np.ones(len(df), dtype=bool)
+        legacy = [strategy for strategy in self.filters if self.kernel_of(strategy) is None]
+        for strategy in self.filters:
+            kernel = self.kernel_of(strategy)
+            if kernel is not None:
+                passed &= kernel.compute(df, frame)
+        if legacy:
+            # 未改写的过滤策略只会把不满足条件的 entry_sig 置0, 在全部置1的副本上执行得到通过条件
+            probe = df.copy()
+            probe['entry_sig'] = 1
+            for strategy in legacy:
+                probe = strategy(probe, None)
+            passed &= probe['entry_sig'].to_numpy() == 1
+        return passed
+
+    def run_backtest(self, df: pd.DataFrame, filter_mask: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        回测信号: 入场 -> 过滤 -> 退出, 返回新的DataFrame
+
+        Args:
+            df: K线数据, 不会被修改
+            filter_mask: 已按基础周期对齐的过滤结果(如高周期过滤), 传入时不再执行过滤策略
+        """
+        frame = SeriesFrame(df).compute(self.plan())
+        legacy = any(self.kernel_of(strategy) is None for strategy in [self.entry, self.exit] if strategy)
+        # 未改写的策略会在传入的DataFrame上原地写列, 只有这时才复制数据
+        out = df.copy(deep=legacy)
+
+        entry_kernel = self.kernel_of(self.entry)
+        if entry_kernel is not None and entry_kernel.type == KERNEL_TYPE_ENTRY:
+            mask = entry_kernel.compute(df, frame)
+            out['entry_sig'] = mask.astype(np.int64)
+            out['entry_price'] = np.where(mask, frame['close'], 0.0)
+        elif self.entry is not None:
+            out = self.entry(out, None)
+
+        if filter_mask is None and self.filters:
+            filter_mask = self.filter_mask(df, frame)
+        if filter_mask is not None and 'entry_sig' in out.columns:
+            out['entry_sig'] = np.where(filter_mask, out['entry_sig'].to_numpy(), 0)
+
+        if self.exit is not None:
+            out = self.exit(out, None)
+        return out
+
+    def evaluate_live(self, df: pd.DataFrame, stIns, frame: Optional[SeriesFrame] = None,
+                      signals: Optional[Dict[str, bool]] = None) -> Optional[StrategyExecuteResult]:
+        """
+        实盘: 最后一根已收盘K线上的入场信号, 出现信号时再检查过滤策略, 全部通过才生成下单结果
+
+        Args:
+            frame: 同一交易对与周期上共用的尾部序列(strategy_kernel.live_frame), 为空时按本流水线所需K线数创建
+            signals: 同一交易对与周期上共用的 策略code -> 信号, 多个实例使用同一策略时只计算一次
+        """
+        if self.entry is None or df.empty:
+            return None
+        frame = frame if frame is not None else live_frame(df, self.lookback)
+
+        if self.kernel_of(self.entry) is None:
+            # 未改写的入场策略按实例计算仓位, 不能在实例之间共用
+            result = self.entry(df.copy(), stIns)
+            if not result or not result.signal:
+                return result
+            if not self.filters_pass_live(df, stIns, frame, signals):
+                result.signal = False
+            return result
+
+        result = StrategyExecuteResult()
+        result.signal = self._live_signal(self.entry_code, self.entry, df, stIns, frame, signals)
+        if result.signal and not self.filters_pass_live(df, stIns, frame, signals):
+            result.signal = False
+        live_result = self.kernel_of(self.entry).live_result
+        if result.signal and live_result is not None:
+            return live_result(df, stIns)
+        return result
+
+    def filters_pass_live(self, df: pd.DataFrame, stIns, frame: Optional[SeriesFrame] = None,
+                          signals: Optional[Dict[str, bool]] = None) -> bool:
+        """全部过滤策略在最后一根已收盘K线上是否通过, 遇到不通过的即停止"""
+        frame = frame if frame is not None else live_frame(df, self.lookback)
+        return all(self._live_signal(code, strategy, df, stIns, frame, signals)
+                   for code, strategy in zip(self.filter_codes, self.filters))
+
+    def _live_signal(self, code: str, strategy: Callable, df: pd.DataFrame, stIns, frame: SeriesFrame,
+                     signals: Optional[Dict[str, bool]]) -> bool:
+        if signals is not None and code in signals:
+            return signals[code]
+        kernel = self.kernel_of(strategy)
+        if kernel is not None:
+            value = kernel.evaluate_live(df, live_cache_key(stIns), frame)
+        else:
+            value = bool(strategy(df.copy(), stIns))
+        if signals is not None:
+            signals[code] = value
+        return value
+
+
+def live_group_frame(df: pd.DataFrame, pipelines: Sequence[StrategyPipeline]) -> SeriesFrame:
+    """同一交易对与周期上多条流水线共用的尾部序列, 覆盖其中最长的所需K线数"""
+    return live_frame(df, max((pipeline.lookback for pipeline in pipelines), default=1))
@@ -1,71 +1,332 @@
+import ast
+import hashlib
 import importlib
+import importlib.util
 import inspect
+import json
 import os
-from typing import Callable, Dict, Optional, List
+import sys
+import threading
+from typing import Callable, Dict, Optional, List, Tuple
 import pandas as pd
 import logging
 
 logger = logging.getLogger(__name__)
 
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+# 策略清单: name -> desc/side/type/module, 由 build_manifest 扫描源码生成
+MANIFEST_PATH = os.path.join(STRATEGY_DIR, 'strategy_manifest.json')
+STRATEGY_PACKAGE = 'backend.strategy_center.atom_strategy'
+REGISTER_DECORATORS = ('register', 'register_kernel')
+MANIFEST_FIELDS = ('name', 'desc', 'side', 'type')
+
+
+def _module_path(file_path: str) -> str:
+    relative = os.path.relpath(file_path, STRATEGY_DIR)[:-3]
+    return '.'.join([STRATEGY_PACKAGE] + relative.split(os.sep))
+
+
+def scan_strategy_sources(directory: str = STRATEGY_DIR) -> Dict[str, Dict[str, str]]:
+    """
+    不导入模块, 解析源码中 @registry.register / @registry.register_kernel 装饰器得到策略清单
+
+    同名策略以后扫描到的为准, 与按文件顺序导入时后注册覆盖先注册一致
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('__'))
+        for file in sorted(files):
+            if not file.endswith('.py') or file.startswith('__'):
+                continue
+            file_path = os.path.join(root, file)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    tree = ast.parse(f.read(), filename=file_path)
+            except (OSError, SyntaxError) as e:
+                logger.error(f"Failed to parse {file_path}: {str(e)}")
+                continue
+            for node in ast.walk(tree):
+                if not isinstance(node, ast.FunctionDef):
+                    continue
+                for decorator in node.decorator_list:
+                    if not (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)
+                            and decorator.func.attr in REGISTER_DECORATORS):
+                        continue
+                    fields = {kw.arg: kw.value.value for kw in decorator.keywords
+                              if kw.arg in MANIFEST_FIELDS and isinstance(kw.value, ast.Constant)}
+                    if 'name' not in fields:
+                        continue
+                    if fields['name'] in manifest:
+                        logger.warning(f"Duplicate strategy {fields['name']} in {file_path}")
+                    entry = {field: fields.get(field, '') for field in MANIFEST_FIELDS}
+                    entry['module'] = _module_path(file_path)
+                    manifest[fields['name']] = entry
+    return manifest
+
+
+def _file_state(path: str) -> Tuple[str, float, str]:
+    """(路径, 修改时间, 内容sha1)"""
+    mtime = os.path.getmtime(path)
+    with open(path, 'rb') as f:
+        return path, mtime, hashlib.sha1(f.read()).hexdigest()
+
+
+def _sources_signature(directory: str = STRATEGY_DIR) -> Tuple:
+    """目录下所有策略源文件的 (路径, 修改时间), 用于判断是否有新增、删除或修改的文件"""
+    signature = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('__'))
+        for file in sorted(files):
+            if file.endswith('.py') and not file.startswith('__'):
+                path = os.path.join(root, file)
+                try:
+                    signature.append((path, os.path.getmtime(path)))
+                except OSError:
+                    continue
+    return tuple(signature)
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, Dict[str, str]]:
+    """读取策略清单, 清单不存在时扫描源码"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {entry['name']: entry for entry in json.load(f)}
+    except FileNotFoundError:
+        logger.warning(f"Strategy manifest {path} not found, scanning sources")
+        return scan_strategy_sources()
+
+
+def build_manifest(path: str = MANIFEST_PATH) -> List[Dict[str, str]]:
+    """扫描源码重新生成策略清单文件, 新增或修改策略注册信息后执行"""
+    entries = list(scan_strategy_sources().values())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    return entries
+
 
 class StrategyRegistry:
+    """
+    策略注册表
+
+    策略列表来自静态清单, 不导入任何策略模块; get_strategy 第一次取某个策略时才导入其所在模块,
+    模块导入时通过 register 装饰器登记函数
+
+    热加载: reload_changed 找出源文件内容变化的已加载模块, 只重新导入这些模块, 在新的模块对象中执行成功后
+    一次性替换策略函数表; 执行失败时保留原函数。正在执行的策略继续使用替换前的函数
+    """
     _instance = None
     _strategies: Dict[str, Callable] = {}
-    _strategies_config: List[Dict[str, str]] = []
+    _manifest: Dict[str, Dict[str, str]] = {}
+    # 已加载策略模块 -> 加载时源文件的 (路径, 修改时间, sha1)
+    _sources: Dict[str, Tuple[str, float, str]] = {}
+    _sources_signature: Tuple = ()
+    # 重新导入模块期间注册的策略先放在这里, 模块执行成功后再整体替换
+    _staging: Optional[Dict[str, Tuple[Callable, Dict[str, str]]]] = None
+    _lock = threading.RLock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            # 获取 atom_strategy 目录的绝对路径
-            base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            strategy_dir = os.path.join(base_path, 'strategy_center', 'atom_strategy')
-            cls._instance._load_strategies(strategy_dir)
+            cls._manifest = load_manifest()
+            cls._sources_signature = _sources_signature()
         return cls._instance
 
-    def _load_strategies(self, directory: str):
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith('.py') and not file.startswith('__'):
-                    file_path = os.path.join(root, file)
-                    self._load_module(file_path)
-
-    def _load_module(self, file_path: str):
-        try:
-            module_name = os.path.basename(file_path)[:-3]
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            if spec and spec.loader:
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-
-                for name, obj in inspect.getmembers(module):
-                    if inspect.isfunction(obj):
-                        if hasattr(obj, '_strategy_name'):
-                            self._strategies[obj._strategy_name] = obj
-                            logger.info(f"Loaded strategy: {obj._strategy_name} from {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to load {file_path}: {str(e)}")
-
     @classmethod
     def register(cls, name: str, desc: str, type: str, side: str):
         def decorator(func):
+            entry = {"name": name, "desc": desc, "side": side, "type": type, "module": func.__module__}
+            if cls._staging is not None:
+                cls._staging[name] = (func, entry)
+                return func
             cls._strategies[name] = func
-            cls._strategies_config.append(
-                {
-                    "name": name,
-                    "desc": desc,
-                    "side": side,
-                    "type": type
-                }
-            )
+            cls._track_source(func.__module__)
+            if name not in cls._manifest:
+                # 清单之外的策略(如新生成尚未重建清单的文件)导入后同样可列出
+                cls._manifest[name] = entry
             return func
 
         return decorator
 
+    @classmethod
+    def register_kernel(cls, name: str, desc: str, type: str, side: str, lookback: int = 1,
+                        live_result: Optional[Callable] = None, requires: Tuple[str, ...] = ()):
+        """
+        注册计算核策略, 被装饰的函数只定义数组上的信号, 回测与实盘分支由 strategy_kernel 生成
+
+        Args:
+            lookback: 计算一根K线信号所需的K线数(含该K线)
+            live_result: 入场策略实盘出现信号时生成下单结果 (df, stIns) -> StrategyExecuteResult
+            requires: 信号函数用到的序列名(K线列、strategy_series 中的派生序列或 '名称@n' 平移序列)
+        """
+        from backend.strategy_center.atom_strategy.strategy_kernel import StrategyKernel, build_kernel_strategy
+
+        def decorator(func):
+            kernel = StrategyKernel(name=name, type=type, signal_fn=func, lookback=lookback,
+                                    live_result=live_result, requires=tuple(requires))
+            return cls.register(name=name, desc=desc, type=type, side=side)(build_kernel_strategy(kernel))
+
+        return decorator
+
+    @classmethod
+    def get_kernel(cls, name: str):
+        """计算核策略返回 StrategyKernel, 其他策略返回None"""
+        return getattr(cls.get_strategy(name), '_kernel', None)
+
     @classmethod
     def get_strategy(cls, name: str) -> Callable:
-        if name not in cls._strategies:
-            raise KeyError(f"Strategy {name} not found")
-        return cls._strategies[name]
+        strategy = cls._strategies.get(name)
+        if strategy is None:
+            strategy = cls._import_strategy(name)
+        return strategy
+
+    @classmethod
+    def _import_strategy(cls, name: str) -> Callable:
+        """导入清单中策略所在模块, 清单中没有时重新扫描源码查找"""
+        with cls._lock:
+            if name in cls._strategies:
+                return cls._strategies[name]
+            entry = cls._manifest.get(name)
+            if entry is None:
+                entry = scan_strategy_sources().get(name)
+                if entry is None:
+                    raise KeyError(f"Strategy {name} not found")
+                cls._manifest[name] = entry
+            importlib.import_module(entry['module'])
+            if name not in cls._strategies:
+                raise KeyError(f"Strategy {name} not registered by {entry['module']}")
+            logger.info(f"Loaded strategy: {name} from {entry['module']}")
+            return cls._strategies[name]
+
+    @classmethod
+    def has_strategy(cls, name: str) -> bool:
+        return name in cls._strategies or name in cls._manifest
+
+    @classmethod
+    def get_source_hash(cls, name: str) -> str:
+        """
+        返回策略所在源文件内容的sha1，用于回测缓存等场景判断策略代码是否变更
+
+        已加载的模块返回加载时的sha1, 与正在运行的代码一致; 文件修改后重新加载前不会变化
+        """
+        strategy = cls.get_strategy(name)
+        source = cls._sources.get(strategy.__module__)
+        if source is not None:
+            return source[2]
+        source_file = inspect.getsourcefile(inspect.unwrap(strategy))
+        with open(source_file, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @classmethod
+    def _track_source(cls, module_name: str) -> None:
+        if module_name in cls._sources:
+            return
+        source_file = getattr(sys.modules.get(module_name), '__file__', None)
+        if source_file:
+            try:
+                cls._sources[module_name] = _file_state(source_file)
+            except OSError:
+                pass
+
+    @classmethod
+    def reload_module(cls, module_name: str) -> List[str]:
+        """
+        重新导入单个策略模块并替换其注册的策略, 返回模块中注册的策略名
+
+        模块在新的模块对象中执行, 失败时抛出异常且原模块与策略不受影响; 成功后该模块原有策略从注册表移除,
+        替换为新注册的策略, 并清除这些策略的实盘信号缓存
+        """
+        with cls._lock:
+            module = sys.modules.get(module_name)
+            source = cls._sources.get(module_name)
+            source_file = source[0] if source else getattr(module, '__file__', None)
+            if source_file is None:
+                spec = importlib.util.find_spec(module_name)
+                source_file = spec.origin if spec else None
+            if source_file is None:
+                raise KeyError(f"Strategy module {module_name} not found")
+
+            state = _file_state(source_file)
+            spec = importlib.util.spec_from_file_location(module_name, source_file)
+            new_module = importlib.util.module_from_spec(spec)
+            cls._staging = {}
+            try:
+                spec.loader.exec_module(new_module)
+                staged = cls._staging
+            finally:
+                cls._staging = None
+
+            old_names = {name for name, func in cls._strategies.items() if func.__module__ == module_name}
+            strategies = {name: func for name, func in cls._strategies.items() if name not in old_names}
+            manifest = {name: entry for name, entry in cls._manifest.items()
+                        if entry.get('module') != module_name or name in staged}
+            for name, (func, entry) in staged.items():
+                strategies[name] = func
+                manifest[name] = entry
+
+            sys.modules[module_name] = new_module
+            parent, _, child = module_name.rpartition('.')
+            if parent in sys.modules:
+                setattr(sys.modules[parent], child, new_module)
+            cls._sources[module_name] = state
+            cls._manifest = manifest
+            cls._strategies = strategies
+
+        cls._invalidate_caches(old_names | set(staged))
+        logger.info(f"Reloaded strategy module {module_name}: {sorted(staged)}")
+        return sorted(staged)
+
+    @classmethod
+    def reload_changed(cls, persist_manifest: bool = False) -> Dict[str, object]:
+        """
+        检查策略源文件, 重新导入内容有变化的已加载模块, 并按源码刷新清单(新增的策略文件可被列出和按需加载)
+
+        Args:
+            persist_manifest: 同时重写 strategy_manifest.json, 进程重启后仍能列出新增策略
+
+        Returns:
+            dict: reloaded 为重新加载的策略名, failed 为 模块 -> 错误信息
+        """
+        reloaded, failed = [], {}
+        with cls._lock:
+            signature = _sources_signature()
+            if signature == cls._sources_signature and not persist_manifest:
+                return {'reloaded': reloaded, 'failed': failed}
+            for module_name, (path, mtime, digest) in list(cls._sources.items()):
+                try:
+                    state = _file_state(path)
+                except OSError:
+                    continue
+                if state[2] == digest:
+                    cls._sources[module_name] = state
+                    continue
+                try:
+                    reloaded.extend(cls.reload_module(module_name))
+                except Exception as e:
+                    failed[module_name] = f'{type(e).__name__}: {e}'
+                    logger.error(f"Failed to reload strategy module {module_name}: {failed[module_name]}")
+            cls._refresh_manifest()
+            cls._sources_signature = signature
+            if persist_manifest:
+                build_manifest()
+        return {'reloaded': reloaded, 'failed': failed}
+
+    @classmethod
+    def _refresh_manifest(cls) -> None:
+        """按源码更新未加载策略的清单项, 已加载策略以实际注册信息为准"""
+        manifest = scan_strategy_sources()
+        for name in cls._strategies:
+            if name in cls._manifest:
+                manifest[name] = cls._manifest[name]
+        cls._manifest = manifest
+
+    @staticmethod
+    def _invalidate_caches(names) -> None:
+        if not names:
+            return
+        from backend.strategy_center.atom_strategy.strategy_kernel import kernel_cache
+        for name in names:
+            kernel_cache.invalidate(name)
 
     @classmethod
     def execute_strategy(cls, df: pd.DataFrame, strategy_name: str) -> pd.DataFrame:
@@ -76,35 +337,22 @@ class StrategyRegistry:
             logger.error(f"Strategy execution failed: {str(e)}")
             raise
 
-    @classmethod
-    def _auto_register_strategies(cls):
-        for name, func in inspect.getmembers(cls, predicate=inspect.isfunction):
-            if hasattr(func, 'strategy_name'):
-                cls._strategies[func.strategy_name] = func
-                logger.info(f"Automatically registered strategy: {func.strategy_name}")
-
     @classmethod
     def print_registered_strategies(cls):
-        if cls._strategies:
+        if cls._manifest:
             print("Registered strategies:")
-            for name in cls._strategies:
+            for name in cls._manifest:
                 print(f"- {name}")
         else:
             print("No strategies registered")
 
     def list_strategies(self) -> list:
-        return self._strategies_config
+        return [{field: entry.get(field, '') for field in MANIFEST_FIELDS} for entry in self._manifest.values()]
 
 
 registry = StrategyRegistry()
 
-# 确保在导入其他模块前先创建实例
-from backend.strategy_center.atom_strategy.entry_strategy.dbb_entry_strategy import *
-from backend.strategy_center.atom_strategy.exit_strategy.dbb_exit_strategy import *
-from backend.strategy_center.atom_strategy.filter_strategy.sma_diff_increasing_filter_strategy import *
-from backend.strategy_center.atom_strategy.filter_strategy.sma_perfect_order_filter_strategy import *
-
-
 if __name__ == '__main__':
-    # registry = StrategyRegistry(directory='backend/strategy_center/atom_strategy')
-    print(registry.list_strategies())
+    # python -m backend.strategy_center.atom_strategy.strategy_registry 重新生成策略清单
+    for strategy_entry in build_manifest():
+        print(strategy_entry)
@@ -0,0 +1,177 @@
+"""
+策略派生序列
+
+策略声明所需的序列名(requires), 由 SeriesFrame 按依赖关系计算并缓存, 同一份K线数据上每个序列只计算一次,
+入场、过滤、退出策略共用; 序列均为只读数组, 策略不能修改共享数据, 也不再向DataFrame写入临时列。
+
+序列名:
+- K线数据中的列名, 如 'close'、'sma20'
+- derived_series 注册的派生序列, 如 'sma10_sma20_diff'
+- '<序列名>@n' 表示向后平移n根K线, 如 'close@1' 为上一根K线的收盘价
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LAG_SEPARATOR = '@'
+
+
+def prev(values: np.ndarray, n: int = 1) -> np.ndarray:
+    """向后平移n根K线, 与 Series.shift(n) 一致, 开头补NaN"""
+    shifted = np.empty(values.shape[0], dtype=np.float64)
+    shifted[:n] = np.nan
+    shifted[n:] = values[:values.shape[0] - n]
+    return shifted
+
+
+@dataclass(frozen=True)
+class DerivedSeries:
+    """
+    派生序列
+
+    fn: 按 inputs 顺序接收输入数组, 返回同长度的数组
+    window: 计算一个值所需的输入K线数(含当前K线), 如10日均线为10
+    """
+    name: str
+    inputs: Tuple[str, ...]
+    fn: Callable[..., np.ndarray]
+    window: int = 1
+
+
+series_registry: Dict[str, DerivedSeries] = {}
+
+
+def derived_series(name: str, inputs: Iterable[str], window: int = 1):
+    """注册派生序列, 被装饰的函数必须是因果的: 第i个值只依赖输入的第 i-window+1..i 个值"""
+
+    def decorator(fn):
+        series_registry[name] = DerivedSeries(name=name, inputs=tuple(inputs), fn=fn, window=window)
+        return fn
+
+    return decorator
+
+
+def split_lag(name: str) -> Tuple[str, int]:
+    """'close@1' -> ('close', 1), 没有平移时为0"""
+    base, sep, lag = name.rpartition(LAG_SEPARATOR)
+    if sep and lag.isdigit():
+        return base, int(lag)
+    return name, 0
+
+
+def series_inputs(name: str) -> Tuple[str, ...]:
+    base, lag = split_lag(name)
+    if lag:
+        return (base,)
+    spec = series_registry.get(name)
+    return spec.inputs if spec else ()
+
+
+def plan_series(names: Iterable[str]) -> List[str]:
+    """
+    按依赖关系排序: 输入在前, 每个序列只出现一次
+
+    Raises:
+        ValueError: 派生序列之间存在循环依赖
+    """
+    order: List[str] = []
+    state: Dict[str, bool] = {}
+
+    def visit(name: str, path: Tuple[str, ...]):
+        if state.get(name):
+            return
+        if name in state:
+            raise ValueError(f"Derived series cycle: {' -> '.join(path + (name,))}")
+        state[name] = False
+        for input_name in series_inputs(name):
+            visit(input_name, path + (name,))
+        state[name] = True
+        order.append(name)
+
+    for series_name in names:
+        visit(series_name, ())
+    return order
+
+
+def series_lookback(name: str) -> int:
+    """计算某根K线上该序列的值所需的K线数(含该K线)"""
+    base, lag = split_lag(name)
+    if lag:
+        return series_lookback(base) + lag
+    spec = series_registry.get(name)
+    if spec is None:
+        return 1
+    return spec.window - 1 + max((series_lookback(input_name) for input_name in spec.inputs), default=1)
+
+
+def plan_lookback(names: Iterable[str]) -> int:
+    """一组序列所需的最大K线数, 同时校验依赖关系"""
+    return max((series_lookback(name) for name in plan_series(names)), default=1)
+
+
+class SeriesFrame(dict):
+    """
+    K线数据 [start, stop) 区间上按名称取得的只读float64数组
+
+    原始列在第一次使用时才转换, 派生序列与平移序列按依赖计算后缓存, 同一个 SeriesFrame 上只计算一次
+    """
+
+    def __init__(self, df: pd.DataFrame, start: int = 0, stop: Optional[int] = None):
+        super().__init__()
+        self._df = df
+        self._start = start
+        self._stop = stop
+
+    @classmethod
+    def window(cls, df: pd.DataFrame, names: Iterable[str], stop: Optional[int] = None,
+               lookback: int = 1) -> 'SeriesFrame':
+        """只覆盖计算第 stop-1 根K线所需的尾部区间, 实盘只需最后一个值时使用"""
+        stop = len(df) if stop is None else stop
+        lookback = max(lookback, plan_lookback(names))
+        return cls(df, max(0, stop - lookback), stop)
+
+    def __missing__(self, name: str) -> np.ndarray:
+        base, lag = split_lag(name)
+        if lag:
+            values = prev(self[base], lag)
+        elif name in series_registry:
+            spec = series_registry[name]
+            values = np.asarray(spec.fn(*[self[input_name] for input_name in spec.inputs]), dtype=np.float64)
+        else:
+            values = self._df[name].to_numpy(dtype=np.float64)[self._start:self._stop]
+        values.flags.writeable = False
+        self[name] = values
+        return values
+
+    def compute(self, names: Iterable[str]) -> 'SeriesFrame':
+        """按依赖顺序预先计算所需序列"""
+        for name in plan_series(names):
+            self[name]
+        return self
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    return pd.Series(values).rolling(window=window).mean().to_numpy()
+
+
+@derived_series('close_sma10', inputs=('close',), window=10)
+def close_sma10(close: np.ndarray) -> np.ndarray:
+    """收盘价10周期均线, 由收盘价计算(K线数据中的 sma10 为保留两位小数的值)"""
+    return _rolling_mean(close, 10)
+
+
+@derived_series('close_sma20', inputs=('close',), window=20)
+def close_sma20(close: np.ndarray) -> np.ndarray:
+    return _rolling_mean(close, 20)
+
+
+@derived_series('close_sma50', inputs=('close',), window=50)
+def close_sma50(close: np.ndarray) -> np.ndarray:
+    return _rolling_mean(close, 50)
+
+
+@derived_series('sma10_sma20_diff', inputs=('sma10', 'sma20'))
+def sma10_sma20_diff(sma10: np.ndarray, sma20: np.ndarray) -> np.ndarray:
+    return sma10 - sma20
@@ -1,6 +1,34 @@
+import threading
+from typing import Callable
+
 import pandas as pd
 
 
+class LazyClient:
+    """
+    第一次访问属性时才由 factory 创建的客户端
+
+    策略模块在模块级持有行情/交易客户端, 用此包装后导入模块(注册表加载、回测)不会连接交易所
+    """
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, item):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return getattr(self._client, item)
+
+
+def create_price_collector():
+    from backend.service_center.okx_service.okx_ticker_service import OKXTickerService
+    return OKXTickerService()
+
+
 class StrategyUtils:
     @staticmethod
     def find_kline_index_by_time(df: pd.DataFrame, target_time):
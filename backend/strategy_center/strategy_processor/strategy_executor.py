@@ -5,9 +5,11 @@ from backend.strategy_center.strategy_result import StrategyExecuteResult
 from backend.api_center.okx_api.okx_main import OKXAPIWrapper
 from backend._utils import DatabaseUtils, SymbolFormatUtils
 from backend.service_center.okx_service.trade_swap import TradeSwapManager
-from backend.strategy_center.atom_strategy.entry_strategy.dbb_entry_strategy import registry
+from backend.strategy_center.atom_strategy.strategy_pipeline import StrategyPipeline, live_group_frame
+from backend.strategy_center.atom_strategy.strategy_series import SeriesFrame
 from backend.data_center.kline_data.kline_data_collector import *
 import pandas as pd
+from typing import Dict, List, Optional, Tuple
 
 
 class StrategyExecutor:
@@ -30,48 +32,59 @@ class StrategyExecutor:
         if not instance_list:
             print("StrategyExecutor@main_task, no strategy instances found.")
             return
-        for instance in instance_list:
-            print("StrategyExecutor@main_task, processing strategy for {}".format(instance.trade_pair))
-            self._process_strategy(instance)
+        for (trade_pair, time_frame), instances in _group_instances(instance_list).items():
+            print(f"StrategyExecutor@main_task, processing {len(instances)} strategies for {trade_pair} {time_frame}")
+            self._process_group(instances)
 
-    def _process_strategy(self, st_instance: 'StrategyInstance'):
-        """处理单个策略实例"""
+    def _process_group(self, instances: List['StrategyInstance']):
+        """
+        处理同一交易对与周期的策略实例
+
+        K线只读取一次, 派生序列只计算一次, 每个不同的入场与过滤策略只计算一次, 信号分发给各实例
+        """
+        try:
+            df = self._get_data_frame(instances[0])
+        except Exception as e:
+            print(f"StrategyExecutor@_process_group Error loading data for {instances[0].trade_pair}: {e}")
+            return
+        pipelines = []
+        for instance in instances:
+            try:
+                pipelines.append((instance, StrategyPipeline.from_instance(instance)))
+            except Exception as e:
+                print(f"StrategyExecutor@_process_group Error building pipeline for {instance.name}: {e}")
+        if not pipelines:
+            return
+        frame = live_group_frame(df, [pipeline for _, pipeline in pipelines])
+        signals: Dict[str, bool] = {}
+        for instance, pipeline in pipelines:
+            self._process_strategy(instance, df, pipeline, frame, signals)
+        print(f"StrategyExecutor@_process_group, {len(pipelines)} strategies for {instances[0].trade_pair}, "
+              f"signals: {signals}")
+
+    def _process_strategy(self, st_instance: 'StrategyInstance', df: DataFrame, pipeline: StrategyPipeline,
+                          frame: SeriesFrame, signals: Dict[str, bool]):
+        """处理单个策略实例, 入场与过滤信号取自同组共用的计算结果"""
         try:
             print(f"StrategyExecutor@_process_strategy, processing strategy for {st_instance.trade_pair}")
-            # 1.入场策略
-            df = self._get_data_frame(st_instance)
-            entry_result = self._execute_entry_strategy(df, st_instance)
-            if not entry_result:
-                print(f"StrategyExecutor@_process_strategy entry result {st_instance.trade_pair} failed.")
+            # 1.入场与过滤策略: 入场出现信号后才检查过滤策略, 全部通过才下单
+            entry_result = pipeline.evaluate_live(df, st_instance, frame, signals)
+            print(f"StrategyExecutor@_process_strategy, result for {st_instance.name} is: "
+                  f"{entry_result.signal if entry_result else None}")
+            if not _check_trading_signals(entry_result):
                 return
 
-            # 2.过滤策略
-            filter_result = self._execute_filter_strategy(df, st_instance)
-            entry_result.signal = filter_result
-
             entry_result.symbol = st_instance.trade_pair
             entry_result.st_inst_id = st_instance.id
-            print(f"StrategyExecutor@_process_strategy, filter result is {entry_result.signal} for {st_instance.trade_pair}")
-
-            if not entry_result.signal:
-                return
-            # 3.下单
+            # 2.下单
             trade_result = self.okx_algo_order_service.place_order_by_st_result(entry_result)
-            # 4.保存交易记录
+            # 3.保存交易记录
             self.okx_algo_order_service.save_execute_algo_order_result(
                 st_execute_result=entry_result, place_order_result=trade_result)
 
         except Exception as e:
             print(f"StrategyExecutor@_process_strategy Error processing strategy: {e}")
 
-    @staticmethod
-    def _execute_entry_strategy(df: DataFrame, st_instance: 'StrategyInstance') -> 'StrategyExecuteResult' | None:
-        entry_strategy = registry.get_strategy(st_instance.entry_st_code)
-        entry_result = entry_strategy(df, st_instance)
-        print(f"StrategyExecutor@_execute_entry_strategy result for {st_instance.name} is: "
-              f"{entry_result.signal if entry_result else None}")
-        return entry_result
-
     def _execute_trade(self, st_result: 'StrategyExecuteResult'):
         """执行交易操作"""
         try:
@@ -98,26 +111,13 @@ class StrategyExecutor:
         df = pd.read_csv(f"{file_abspath}")
         return df
 
-    @staticmethod
-    def _execute_filter_strategy(df: pd.DataFrame, st_instance: 'StrategyInstance'):
-        filter_result = True
-        if st_instance.filter_st_code:
-            filter_strategy_list = st_instance.filter_st_code.split(',')
-            if len(filter_strategy_list) > 1:
-                for filter_strategy_code in filter_strategy_list:
-                    filter_strategy = registry.get_strategy(filter_strategy_code)
-                    current_filter_result = filter_strategy(df, st_instance)
-                    # 如果任何一个过滤策略返回False，将filter_result设为False
-                    if not current_filter_result:
-                        filter_result = False
-                        break
-            else:
-                filter_result = False
-            print(f"StrategyExecutor@_execute_filter_strategy , "
-                  f"filter result for {st_instance.name} is: {filter_result}")
-            return filter_result
-        else:
-            return filter_result
+
+def _group_instances(instance_list: List['StrategyInstance']) -> Dict[Tuple[str, str], List['StrategyInstance']]:
+    """按 (交易对, 周期) 分组, 保持实例原有顺序"""
+    groups: Dict[Tuple[str, str], List['StrategyInstance']] = {}
+    for instance in instance_list:
+        groups.setdefault((instance.trade_pair, instance.time_frame), []).append(instance)
+    return groups
 
 
 def _setup_logging():